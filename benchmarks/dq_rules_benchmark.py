@@ -0,0 +1,54 @@
+"""
+Compares per-record and vectorized execution of the Python data quality rules.
+
+Usage:
+    python benchmarks/dq_rules_benchmark.py --rows 1000000 --chunk-size 50000
+"""
+import argparse
+import io
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'lambda', 'data-quality-checker'))
+
+from rules.quality_rules import get_python_rules, get_batch_rules, VALID_PRODUCT_CATEGORIES
+from rules.engine import check_csv_stream, check_csv_stream_vectorized
+
+
+def make_csv(rows, error_rate):
+    """Builds an in-memory CSV with roughly 'error_rate' violating rows per rule."""
+    rng = random.Random(42)
+    lines = ['id,product_category,price']
+    for i in range(rows):
+        category = 'Toys' if rng.random() < error_rate else rng.choice(VALID_PRODUCT_CATEGORIES)
+        price = '-1' if rng.random() < error_rate else f'{rng.uniform(1, 500):.2f}'
+        lines.append(f'{i},"{category}",{price}')
+    return ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+def run(label, check, rules, payload, chunk_size):
+    start = time.perf_counter()
+    records, collector = check(io.BytesIO(payload), rules, chunk_size=chunk_size)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<12} {records:>10} rows {elapsed:8.3f} s {records / elapsed:>14,.0f} rows/s "
+          f"{collector.total:>8} errors")
+    return collector.total
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--chunk-size', type=int, default=50000)
+    parser.add_argument('--error-rate', type=float, default=0.01)
+    args = parser.parse_args()
+
+    payload = make_csv(args.rows, args.error_rate)
+    print(f"Checking {args.rows} rows ({len(payload) / 1e6:.1f} MB) with {len(get_python_rules())} rules")
+
+    record_errors = run('per-record', check_csv_stream, get_python_rules(), payload, args.chunk_size)
+    batch_errors = run('vectorized', check_csv_stream_vectorized, get_batch_rules(), payload, args.chunk_size)
+
+    if record_errors != batch_errors:
+        sys.exit(f"Error counts differ: per-record={record_errors}, vectorized={batch_errors}")
@@ -0,0 +1,100 @@
+"""
+Compares the SageMaker inference handler's request paths on a fitted k-means
+model: the CSV path (text/csv in, JSON out) against application/x-npy,
+application/x-recordio-protobuf and JSON Lines (same type in and out), per
+request latency (input_fn + predict_fn + output_fn) and throughput; then
+concurrent one-row requests with and without the micro-batcher. Checks that
+every path returns the same clusters.
+
+Usage:
+    python benchmarks/inference_benchmark.py --requests 500 --rows 100 --features 20
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from sklearn.cluster import KMeans
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'sagemaker', 'scripts'))
+
+import inference
+
+
+def make_requests(data, requests, rows):
+    """Builds the request bodies of every content type for the same rows."""
+    batches = [data[i * rows:(i + 1) * rows] for i in range(requests)]
+    return batches, {
+        'csv': ('text/csv', 'application/json',
+                ['\n'.join(','.join(repr(v) for v in row) for row in batch.tolist()) for batch in batches]),
+        'npy': ('application/x-npy', 'application/x-npy', [inference.encode_npy(batch) for batch in batches]),
+        'recordio': ('application/x-recordio-protobuf', 'application/x-recordio-protobuf',
+                     [inference.encode_recordio_protobuf(batch) for batch in batches]),
+        'jsonlines': ('application/jsonlines', 'application/jsonlines',
+                      ['\n'.join(json.dumps(row) for row in batch.tolist()) for batch in batches]),
+    }
+
+
+def run_path(label, model, content_type, accept, bodies, rows):
+    latencies, predictions = [], []
+    start = time.perf_counter()
+    for body in bodies:
+        request_start = time.perf_counter()
+        prediction = inference.predict_fn(inference.input_fn(body, content_type), model)
+        inference.output_fn(prediction, accept)
+        latencies.append(time.perf_counter() - request_start)
+        predictions.append(prediction)
+    elapsed = time.perf_counter() - start
+    p50, p99 = np.percentile(latencies, [50, 99]) * 1000
+    print(f"{label:<10} p50 {p50:7.2f} ms  p99 {p99:7.2f} ms  {len(bodies) * rows / elapsed:>12,.0f} rows/s")
+    return np.concatenate(predictions)
+
+
+def run_concurrent(label, predict, data, threads):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        predictions = list(executor.map(lambda i: predict(data[i:i + 1]), range(len(data))))
+    elapsed = time.perf_counter() - start
+    print(f"{label:<10} {len(data):>6} one-row requests, {threads} threads {elapsed:8.3f} s "
+          f"{len(data) / elapsed:>10,.0f} requests/s")
+    return np.concatenate(predictions)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--rows', type=int, default=100, help='Rows per request')
+    parser.add_argument('--features', type=int, default=20)
+    parser.add_argument('--clusters', type=int, default=5)
+    parser.add_argument('--concurrent-requests', type=int, default=5000)
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--batch-rows', type=int, default=256)
+    parser.add_argument('--batch-wait-ms', type=float, default=2.0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    data = rng.random((max(args.requests * args.rows, args.concurrent_requests), args.features))
+    model = KMeans(n_clusters=args.clusters, n_init=1, random_state=0).fit(data[:10000])
+    expected = model.predict(data)
+
+    batches, paths = make_requests(data, args.requests, args.rows)
+    print(f"{args.requests} requests of {args.rows} rows x {args.features} features")
+    for label, (content_type, accept, bodies) in paths.items():
+        predictions = run_path(label, model, content_type, accept, bodies, args.rows)
+        mismatches = int((predictions != expected[:len(predictions)]).sum())
+        if mismatches and label != 'recordio':
+            sys.exit(f"{label} predictions differ from the model's in {mismatches} rows")
+        if mismatches:
+            # RecordIO carries float32 features; points on a cluster boundary may flip
+            print(f"{'':<10} {mismatches} float32 boundary differences")
+
+    concurrent_data = data[:args.concurrent_requests]
+    direct = run_concurrent('direct', model.predict, concurrent_data, args.threads)
+    batcher = inference.MicroBatcher(model.predict, args.batch_rows, args.batch_wait_ms / 1000)
+    batched = run_concurrent('batched', batcher.predict, concurrent_data, args.threads)
+    print(f"{'':<10} {batcher.batches} predict calls for {batcher.requests_served} requests")
+    if not (direct == batched).all():
+        sys.exit("Micro-batched predictions differ from direct predictions")
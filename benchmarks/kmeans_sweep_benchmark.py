@@ -0,0 +1,63 @@
+"""
+Times train.py's k sweep (sweep.run_sweep) over synthetic Parquet shards with
+one worker (sequential) and with one worker per core, reports the speedup,
+and checks that both runs score every k identically and that the sweep picks
+the number of clusters the data was generated with. The speedup is bounded by
+the number of cores (and by the slowest k).
+
+Usage:
+    python benchmarks/kmeans_sweep_benchmark.py --rows 200000 --clusters 6 --k-values 2-12
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'sagemaker', 'scripts'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from kmeans_training_benchmark import write_shards
+from shards import ShardReader
+from sweep import parse_k_values, run_sweep
+
+
+def timed_sweep(data_dir, k_values, training_mode, workers, batch_size):
+    reader = ShardReader(data_dir, batch_size=batch_size)
+    start = time.perf_counter()
+    with tempfile.TemporaryDirectory() as work_dir:
+        results, best_k, _ = run_sweep(reader, k_values, work_dir, training_mode=training_mode,
+                                       max_workers=workers, random_state=0)
+    return time.perf_counter() - start, results, best_k
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--shards', type=int, default=4)
+    parser.add_argument('--features', type=int, default=16)
+    parser.add_argument('--clusters', type=int, default=6)
+    parser.add_argument('--k-values', type=str, default='2-12')
+    parser.add_argument('--training-mode', type=str, default='full', choices=['full', 'streaming'])
+    parser.add_argument('--batch-size', type=int, default=65536)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    k_values = parse_k_values(args.k_values)
+    with tempfile.TemporaryDirectory() as data_dir:
+        write_shards(data_dir, args.rows, args.shards, args.features, args.clusters)
+        print(f"{args.rows} rows x {args.features} features, {len(k_values)} values of k, "
+              f"{args.training_mode} mode, {os.cpu_count()} CPU(s)")
+        sequential_seconds, sequential, _ = timed_sweep(data_dir, k_values, args.training_mode, 1, args.batch_size)
+        parallel_seconds, parallel, best_k = timed_sweep(
+            data_dir, k_values, args.training_mode, args.workers, args.batch_size)
+
+    print(parallel.to_string(index=False))
+    print(f"sequential (1 worker)  {sequential_seconds:8.2f} s")
+    print(f"parallel ({args.workers} workers) {parallel_seconds:8.2f} s  speedup {sequential_seconds / parallel_seconds:.2f}x")
+    if not np.allclose(sequential[['inertia', 'silhouette']], parallel[['inertia', 'silhouette']], equal_nan=True):
+        sys.exit("Parallel sweep scores differ from the sequential sweep")
+    if best_k != args.clusters:
+        sys.exit(f"Sweep picked k={best_k}, the data has {args.clusters} clusters")
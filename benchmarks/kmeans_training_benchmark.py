@@ -0,0 +1,97 @@
+"""
+Compares full-batch KMeans training with streaming MiniBatchKMeans training
+(partial_fit over bounded batches) on synthetic user features written as
+Parquet shards, like the ml-data-prep Glue job writes them. Each mode runs in
+a fresh process and reports its fit time, peak memory and the inertia of the
+fitted model over all rows (computed the same way for every mode).
+
+Usage:
+    python benchmarks/kmeans_training_benchmark.py --rows 2000000 --shards 8 --features 16
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'sagemaker', 'scripts'))
+
+from shards import ShardReader
+
+MODES = {
+    'full-float64': ('full', 'float64'),
+    'full-float32': ('full', 'float32'),
+    'streaming-float32': ('streaming', 'float32'),
+}
+
+
+def write_shards(data_dir, rows, shards, features, clusters, seed=0):
+    """Writes blobs around 'clusters' centers, with an identifier and a text column to be skipped."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    rng = np.random.default_rng(seed)
+    centers = rng.uniform(-10, 10, (clusters, features))
+    rows_per_shard = rows // shards
+    for shard in range(shards):
+        labels = rng.integers(0, clusters, rows_per_shard)
+        values = centers[labels] + rng.normal(0, 1.5, (rows_per_shard, features))
+        columns = {'user_id': np.arange(shard * rows_per_shard, (shard + 1) * rows_per_shard)}
+        columns.update({f'feature_{i}': values[:, i] for i in range(features)})
+        columns['gender'] = np.where(labels % 2, 'F', 'M')
+        pq.write_table(pa.table(columns), os.path.join(data_dir, f'part-{shard:05d}.snappy.parquet'))
+
+
+def run_mode(mode, data_dir, clusters, batch_size, epochs):
+    """Runs in the worker process: fits, then reports time, peak RSS and inertia as JSON."""
+    from train import fit_full, fit_streaming, streaming_inertia
+    training_mode, dtype = MODES[mode]
+    reader = ShardReader(data_dir, batch_size=batch_size, dtype=dtype)
+    start = time.perf_counter()
+    if training_mode == 'full':
+        model = fit_full(reader, clusters, random_state=0)
+    else:
+        model = fit_streaming(reader, clusters, epochs, random_state=0)
+    fit_seconds = time.perf_counter() - start
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(json.dumps({'fit_seconds': fit_seconds, 'peak_mb': peak_mb,
+                      'inertia': streaming_inertia(model, reader, epochs)}))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=2000000)
+    parser.add_argument('--shards', type=int, default=8)
+    parser.add_argument('--features', type=int, default=16)
+    parser.add_argument('--clusters', type=int, default=8)
+    parser.add_argument('--batch-size', type=int, default=65536)
+    parser.add_argument('--epochs', type=int, default=3)
+    parser.add_argument('--worker', choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument('--data-dir', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_mode(args.worker, args.data_dir, args.clusters, args.batch_size, args.epochs)
+        sys.exit(0)
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        write_shards(data_dir, args.rows, args.shards, args.features, args.clusters)
+        size_mb = sum(os.path.getsize(os.path.join(data_dir, name)) for name in os.listdir(data_dir)) / 1024 ** 2
+        print(f"{args.rows} rows x {args.features} features in {args.shards} Parquet shards ({size_mb:.0f} MB)")
+        results = {}
+        for mode in MODES:
+            output = subprocess.run(
+                [sys.executable, __file__, '--worker', mode, '--data-dir', data_dir,
+                 '--clusters', str(args.clusters), '--batch-size', str(args.batch_size), '--epochs', str(args.epochs)],
+                capture_output=True, text=True, check=True
+            ).stdout
+            results[mode] = json.loads(output.strip().splitlines()[-1])
+
+    reference = results['full-float64']['inertia']
+    for mode, result in results.items():
+        print(f"{mode:<18} fit {result['fit_seconds']:8.2f} s  peak RSS {result['peak_mb']:8.0f} MB  "
+              f"inertia {result['inertia']:.6g} ({(result['inertia'] / reference - 1) * 100:+.2f}%)")
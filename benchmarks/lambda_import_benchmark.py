@@ -0,0 +1,87 @@
+"""
+Measures the cold-start import cost of each Lambda handler with
+'python -X importtime' (best of several fresh interpreters, the shared layer
+on the path like /opt/python) and fails when a handler exceeds its budget or
+loads a module that must stay lazy (pandas, numpy, simple_salesforce, ...).
+
+Usage:
+    python benchmarks/lambda_import_benchmark.py --runs 5
+    python benchmarks/lambda_import_benchmark.py --budget-scale 2   # slower machines
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+LAYER_PATH = os.path.join(ROOT, 'lambda', 'shared', 'python')
+
+# Per handler: import budget in milliseconds (module-level boto3 client
+# creation included), and modules only the code paths that need them may import
+HANDLERS = {
+    'csv-processor': {'budget_ms': 600, 'lazy': ['pandas', 'numpy', 'sqlite3']},
+    'data-quality-checker': {'budget_ms': 500, 'lazy': ['pandas', 'numpy']},
+    'salesforce-integration': {'budget_ms': 500, 'lazy': ['pandas', 'numpy', 'simple_salesforce', 'requests']},
+}
+
+IMPORT_TIME_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+def parse_import_times(stderr):
+    """Returns [(module, depth, self_us, cumulative_us)] from -X importtime output."""
+    modules = []
+    for line in stderr.splitlines():
+        match = IMPORT_TIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            modules.append((name, (len(indent) - 1) // 2, int(self_us), int(cumulative_us)))
+    return modules
+
+
+def measure(handler):
+    """Imports a handler in a fresh interpreter; returns (total ms, imported modules, children)."""
+    env = dict(os.environ, PYTHONPATH=LAYER_PATH)
+    env.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import lambda_function'],
+        cwd=os.path.join(ROOT, 'lambda', handler), env=env, capture_output=True, text=True
+    )
+    if result.returncode:
+        sys.exit(f"Importing the {handler} handler failed:\n{result.stderr[-2000:]}")
+    modules = parse_import_times(result.stderr)
+    handler_index = next(i for i, module in enumerate(modules) if module[0] == 'lambda_function')
+    # -X importtime prints children before their parent
+    children = []
+    for name, depth, _, cumulative_us in reversed(modules[:handler_index]):
+        if depth == 0:
+            break
+        if depth == 1:
+            children.append((name, cumulative_us / 1000))
+    return modules[handler_index][3] / 1000, {module[0] for module in modules}, children
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--budget-scale', type=float, default=1.0, help='Multiplies every budget')
+    parser.add_argument('--top', type=int, default=5, help='Heaviest direct imports listed per handler')
+    args = parser.parse_args()
+
+    failures = []
+    for handler, limits in HANDLERS.items():
+        runs = [measure(handler) for _ in range(args.runs)]
+        total_ms, imported, children = min(runs, key=lambda run: run[0])
+        budget_ms = limits['budget_ms'] * args.budget_scale
+        eager = [module for module in limits['lazy'] if module in imported]
+        status = 'ok' if total_ms <= budget_ms and not eager else 'FAIL'
+        print(f"{handler:<24} {total_ms:8.1f} ms (budget {budget_ms:6.0f} ms) {len(imported):>5} modules  {status}")
+        for name, cumulative_ms in sorted(children, key=lambda child: -child[1])[:args.top]:
+            print(f"    {name:<40} {cumulative_ms:8.1f} ms")
+        if total_ms > budget_ms:
+            failures.append(f"{handler}: {total_ms:.1f} ms over its {budget_ms:.0f} ms budget")
+        if eager:
+            failures.append(f"{handler}: imports {', '.join(eager)} at load time")
+
+    if failures:
+        sys.exit("Import budget exceeded:\n  " + "\n  ".join(failures))
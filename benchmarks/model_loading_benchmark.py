@@ -0,0 +1,101 @@
+"""
+Compares how the inference handler's model loading scales over the worker
+processes of one endpoint instance (Linux: memory read from /proc/<pid>/smaps_rollup):
+  load     - every worker copies the model in with a plain joblib.load (previous behaviour)
+  mmap     - every worker memory-maps the model's arrays (joblib.load(mmap_mode='r'))
+  preload  - the master memory-maps it once before forking; workers inherit it
+Each worker loads the model, predicts a batch (touching all centroids) and
+reports its startup time, its private memory (USS) and its proportional share
+of shared memory (PSS). A synthetic k-means model with many centroids stands
+in for a large model.
+
+Usage:
+    python benchmarks/model_loading_benchmark.py --workers 4 --clusters 20000 --features 512
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+import joblib
+import numpy as np
+from sklearn.cluster import KMeans
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'sagemaker', 'scripts'))
+
+os.environ['INFERENCE_PRELOAD_MODEL'] = 'false'   # Preloading is driven explicitly below
+import inference
+
+
+def make_model(model_dir, clusters, features):
+    """Fits a small k-means, then swaps in 'clusters' random centroids."""
+    rng = np.random.default_rng(0)
+    model = KMeans(n_clusters=2, n_init=1, random_state=0).fit(rng.random((100, features)))
+    model.cluster_centers_ = rng.random((clusters, features))
+    model.n_clusters = clusters
+    joblib.dump(model, os.path.join(model_dir, inference.MODEL_FILE), compress=0)
+    return rng.random((256, features))
+
+
+def memory_kb():
+    """Returns (USS, PSS) of this process in kB."""
+    values = {}
+    with open('/proc/self/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[1].isdigit():
+                values[parts[0].rstrip(':')] = int(parts[1])
+    return values.get('Private_Clean', 0) + values.get('Private_Dirty', 0), values.get('Pss', 0)
+
+
+def worker(mode, model_dir, data, results):
+    start = time.perf_counter()
+    if mode == 'load':
+        model = inference.load_model(model_dir, mmap_mode=None)
+    else:
+        model = inference.model_fn(model_dir)   # 'preload': inherited from the master
+    startup = time.perf_counter() - start
+    predictions = inference.predict_fn(data, model)
+    uss, pss = memory_kb()
+    results.put((startup, uss, pss, predictions.tolist()))
+
+
+def run(mode, model_dir, data, workers):
+    inference._preloaded_models.clear()
+    context = multiprocessing.get_context('fork')
+    baseline_uss, _ = memory_kb()
+    if mode == 'preload':
+        inference.preload_model(model_dir)
+    results = context.Queue()
+    processes = [context.Process(target=worker, args=(mode, model_dir, data, results)) for _ in range(workers)]
+    for process in processes:
+        process.start()
+    reports = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    startups, usses, psses, predictions = zip(*reports)
+    print(f"{mode:<8} startup {np.mean(startups) * 1000:8.1f} ms/worker  "
+          f"private {np.mean(usses) / 1024:8.1f} MB/worker  "
+          f"total PSS {sum(psses) / 1024:8.1f} MB ({workers} workers, master USS {baseline_uss / 1024:.0f} MB)")
+    return predictions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--clusters', type=int, default=20000)
+    parser.add_argument('--features', type=int, default=512)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as model_dir:
+        data = make_model(model_dir, args.clusters, args.features)
+        size_mb = os.path.getsize(os.path.join(model_dir, inference.MODEL_FILE)) / 1024 ** 2
+        print(f"Model file: {size_mb:.1f} MB ({args.clusters} x {args.features} centroids)")
+        outputs = {mode: run(mode, model_dir, data, args.workers) for mode in ('load', 'mmap', 'preload')}
+
+    reference = outputs['load'][0]
+    for mode, predictions in outputs.items():
+        if any(prediction != reference for prediction in predictions):
+            sys.exit(f"{mode} predictions differ from plain loading")
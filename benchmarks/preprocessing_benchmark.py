@@ -0,0 +1,146 @@
+"""
+Compares the streaming preprocessing stage (preprocessing.py: one statistics
+pass with partial_fit, one transform pass writing float32 Parquet shards)
+with loading every user record at once and transforming it in memory
+(StandardScaler.fit_transform + pd.get_dummies, without writing anything), on
+synthetic ml-data-prep output. Each mode runs in a fresh process and reports its time and peak
+memory. Then checks that the streamed statistics match the in-memory ones and
+that inference.py, given the packaged transformer, turns raw records into the
+same feature rows the training shards hold.
+
+Usage:
+    python benchmarks/preprocessing_benchmark.py --rows 2000000 --shards 8
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+SCRIPTS_DIR = os.path.join(os.path.dirname(__file__), '..', 'sagemaker', 'scripts')
+sys.path.insert(0, SCRIPTS_DIR)
+
+from features import NUMERIC_COLUMNS, TRANSFORMER_FILE
+
+CATEGORIES = ['books', 'electronics', 'fashion', 'garden', 'grocery', 'health', 'home', 'sports', 'toys']
+
+
+def write_records(data_dir, rows, shards, seed=0):
+    """Writes user records shaped like the ml-data-prep output, with some missing values."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    rng = np.random.default_rng(seed)
+    rows_per_shard = rows // shards
+    for shard in range(shards):
+        n = rows_per_shard
+        dates = np.datetime64('2025-01-01') + rng.integers(0, 600, n).astype('timedelta64[D]')
+        table = pa.table({
+            'user_id': np.arange(shard * n, (shard + 1) * n),
+            'age': pa.array(rng.integers(18, 80, n), mask=rng.random(n) < 0.02),
+            'gender': pa.array(rng.choice(['F', 'M'], n), mask=rng.random(n) < 0.05),
+            'total_spend': rng.gamma(2.0, 150.0, n),
+            'last_purchase_date': pa.array(dates, type=pa.date32(), mask=rng.random(n) < 0.03),
+            'product_category': rng.choice(CATEGORIES, n),
+        })
+        pq.write_table(table, os.path.join(data_dir, f'part-{shard:05d}.snappy.parquet'))
+
+
+def in_memory(data_dir, as_of):
+    """The previous approach: every record in one DataFrame, fit_transform in memory."""
+    from sklearn.preprocessing import StandardScaler
+    records = pd.concat([pd.read_parquet(os.path.join(data_dir, name)) for name in sorted(os.listdir(data_dir))])
+    records['days_since_last_purchase'] = (pd.Timestamp(as_of) - pd.to_datetime(records['last_purchase_date'])).dt.days
+    numeric = list(NUMERIC_COLUMNS) + ['days_since_last_purchase']
+    scaler = StandardScaler()
+    scaled = scaler.fit_transform(records[numeric])
+    features = np.hstack([np.nan_to_num(scaled), pd.get_dummies(records[['gender', 'product_category']]).to_numpy(float)])
+    return {'rows': len(features), 'mean': scaler.mean_.tolist(), 'var': scaler.var_.tolist()}
+
+
+def run_mode(mode, data_dir, output_dir, as_of, batch_size):
+    start = time.perf_counter()
+    if mode == 'in-memory':
+        result = in_memory(data_dir, as_of)
+    else:
+        # What preprocessing.py's main block runs
+        import joblib
+        from preprocessing import fit_transformer, write_features
+        from shards import list_shards
+        shards = list_shards(data_dir)
+        transformer = fit_transformer(shards, batch_size, as_of)
+        result = {'rows': sum(
+            write_features(transformer, path, os.path.join(output_dir, f'part-{index:05d}.parquet'), batch_size)
+            for index, path in enumerate(shards)
+        )}
+        joblib.dump(transformer, os.path.join(output_dir, TRANSFORMER_FILE))
+    result['seconds'] = time.perf_counter() - start
+    result['peak_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(json.dumps(result))
+
+
+def check_serving(data_dir, output_dir):
+    """inference.py must turn the raw records into the feature rows of the training shards."""
+    import joblib
+    from sklearn.cluster import KMeans
+    os.environ['INFERENCE_PRELOAD_MODEL'] = 'false'
+    import inference
+    shard = pd.read_parquet(os.path.join(output_dir, 'part-00000.parquet')).head(1000)
+    features = shard.drop(columns='user_id').to_numpy()
+    model_dir = os.path.join(output_dir, 'model')
+    os.makedirs(model_dir)
+    joblib.dump(KMeans(n_clusters=5, n_init=1, random_state=0).fit(features), os.path.join(model_dir, inference.MODEL_FILE))
+    os.replace(os.path.join(output_dir, TRANSFORMER_FILE), os.path.join(model_dir, TRANSFORMER_FILE))
+    model = inference.model_fn(model_dir)
+    records = pd.read_parquet(os.path.join(data_dir, sorted(os.listdir(data_dir))[0])).head(1000)
+    body = records.to_parquet()
+    served = inference.model_input(inference.input_fn(body, inference.PARQUET), model)
+    if not np.array_equal(served, features):
+        sys.exit("Serving features differ from the training features")
+    json_body = records.drop(columns='user_id').astype({'last_purchase_date': str}).to_json(orient='records')
+    predictions = inference.predict_fn(inference.input_fn(json_body, inference.JSON), model)
+    if not np.array_equal(predictions, model.predict(features)):
+        sys.exit("JSON record predictions differ from the training features' predictions")
+    print(f"Serving: {len(records)} raw records (Parquet and JSON) transformed like the training shards")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=2000000)
+    parser.add_argument('--shards', type=int, default=8)
+    parser.add_argument('--batch-size', type=int, default=65536)
+    parser.add_argument('--as-of', type=str, default='2026-09-01')
+    parser.add_argument('--worker', choices=['in-memory', 'streaming'], help=argparse.SUPPRESS)
+    parser.add_argument('--data-dir', help=argparse.SUPPRESS)
+    parser.add_argument('--output-dir', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_mode(args.worker, args.data_dir, args.output_dir, args.as_of, args.batch_size)
+        sys.exit(0)
+
+    with tempfile.TemporaryDirectory() as data_dir, tempfile.TemporaryDirectory() as output_dir:
+        write_records(data_dir, args.rows, args.shards)
+        print(f"{args.rows} user records in {args.shards} Parquet shards")
+        results = {}
+        for mode in ('in-memory', 'streaming'):
+            output = subprocess.run(
+                [sys.executable, __file__, '--worker', mode, '--data-dir', data_dir, '--output-dir', output_dir,
+                 '--as-of', args.as_of, '--batch-size', str(args.batch_size)],
+                capture_output=True, text=True, check=True
+            ).stdout
+            results[mode] = json.loads(output.strip().splitlines()[-1])
+            print(f"{mode:<10} {results[mode]['rows']} rows {results[mode]['seconds']:8.2f} s  "
+                  f"peak RSS {results[mode]['peak_mb']:8.0f} MB")
+
+        import joblib
+        scaler = joblib.load(os.path.join(output_dir, TRANSFORMER_FILE)).scaler
+        if not (np.allclose(scaler.mean_, results['in-memory']['mean'])
+                and np.allclose(scaler.var_, results['in-memory']['var'])):
+            sys.exit("Streamed statistics differ from the in-memory ones")
+        check_serving(data_dir, output_dir)
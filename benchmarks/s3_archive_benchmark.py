@@ -0,0 +1,83 @@
+"""
+Compares per-file copy+delete moves with batched S3Archiver moves against the
+in-memory fake S3 (with a simulated per-request latency), and checks that the
+archiver moves every object intact, including multipart copies of objects
+above the single-copy limit (scaled down for the fake).
+
+Usage:
+    python benchmarks/s3_archive_benchmark.py --files 500 --latency 0.01
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'lambda', 'csv-processor'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'tests'))
+
+from fakes.fake_s3 import FakeS3Backend
+from utils.s3_archive import S3Archiver, archive_key
+
+BUCKET = 'bench-bucket'
+MAX_COPY_SIZE = 64 * 1024        # Stands in for the 5 GB CopyObject limit
+PART_SIZE = 5 * 1024 ** 2        # S3 minimum part size
+
+
+def make_objects(files, large_files):
+    objects = {(BUCKET, f'incoming/file-{i}.csv'): f'id,value\n{i},{i * 2}\n'.encode() for i in range(files)}
+    for i in range(large_files):
+        objects[(BUCKET, f'incoming/large-{i}.csv')] = bytes([i % 256]) * (PART_SIZE + MAX_COPY_SIZE)
+    return objects
+
+
+def move_per_file(s3, s3_paths, directory):
+    """The previous behaviour: one copy and one delete request per file, in sequence."""
+    failed = {}
+    for s3_path in s3_paths:
+        bucket, _, key = s3_path.replace('s3://', '', 1).partition('/')
+        try:
+            s3.copy_object(Bucket=bucket, Key=archive_key(key, directory), CopySource={'Bucket': bucket, 'Key': key})
+            s3.delete_object(Bucket=bucket, Key=key)
+        except Exception as e:
+            failed[s3_path] = str(e)
+    return failed
+
+
+def run(label, move, objects, latency):
+    s3 = FakeS3Backend(objects, max_copy_size=MAX_COPY_SIZE, latency=latency)
+    s3_paths = [f's3://{bucket}/{key}' for bucket, key in objects]
+    start = time.perf_counter()
+    failed = move(s3, s3_paths)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<10} {len(s3_paths):>6} files {elapsed:8.3f} s {s3.api_call_count():>8} requests "
+          f"{len(failed):>4} failed")
+    return s3, failed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--files', type=int, default=500)
+    parser.add_argument('--large-files', type=int, default=2)
+    parser.add_argument('--latency', type=float, default=0.01, help='Simulated seconds per request')
+    parser.add_argument('--workers', type=int, default=16)
+    args = parser.parse_args()
+
+    objects = make_objects(args.files, args.large_files)
+    sizes = {f's3://{bucket}/{key}': len(data) for (bucket, key), data in objects.items()}
+
+    _, per_file_failed = run('per-file', lambda s3, paths: move_per_file(s3, paths, 'processed'),
+                             objects, args.latency)
+    archiver_s3, archiver_failed = run(
+        'archiver',
+        lambda s3, paths: S3Archiver(s3, max_workers=args.workers, multipart_threshold=MAX_COPY_SIZE,
+                                     part_size=PART_SIZE).move(paths, 'processed', sizes)[1],
+        objects, args.latency)
+
+    print(f"per-file failures (objects above the copy limit): {len(per_file_failed)}")
+    if archiver_failed:
+        sys.exit(f"Archiver failed to move: {archiver_failed}")
+    for (bucket, key), data in objects.items():
+        if (bucket, key) in archiver_s3.objects:
+            sys.exit(f"Source not deleted: {key}")
+        if archiver_s3.objects.get((bucket, archive_key(key, 'processed'))) != data:
+            sys.exit(f"Moved object differs: {key}")
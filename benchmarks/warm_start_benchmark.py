@@ -0,0 +1,97 @@
+"""
+Compares a full k-means retrain with a warm-started one (train.py
+--warm-start) on a second "week" of synthetic user features. The cluster
+centers move slightly between weeks, and a fraction of the users are new or
+changed; those users form the 'changed' channel. Reports the fit time, the
+inertia over every row, the centroid drift and the segment stability: the
+share of users whose segment ID is the one the previous model gives them.
+A last run moves the centers far enough to check that the drift threshold
+falls back to a full retrain.
+
+Usage:
+    python benchmarks/warm_start_benchmark.py --rows 1000000 --clusters 8 --features 16
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import joblib
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'sagemaker', 'scripts'))
+
+from shards import ShardReader
+from train import fit_full, streaming_inertia
+from warm_start import MODEL_FILE, align_clusters, try_warm_start
+
+
+def write_week(data_dir, centers, labels, rng, shards=4):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    os.makedirs(data_dir)
+    values = centers[labels] + rng.normal(0, 1.5, (len(labels), centers.shape[1]))
+    for shard, rows in enumerate(np.array_split(values, shards)):
+        pq.write_table(pa.table({f'feature_{i}': rows[:, i] for i in range(rows.shape[1])}),
+                       os.path.join(data_dir, f'part-{shard:05d}.snappy.parquet'))
+    return values.astype(np.float32)
+
+
+def stability(model, previous, data):
+    return float((model.predict(data) == previous.predict(data)).mean())
+
+
+def run(label, fit, reader, previous, data):
+    start = time.perf_counter()
+    model, detail = fit()
+    fit_seconds = time.perf_counter() - start
+    print(f"{label:<22} fit {fit_seconds:7.2f} s  inertia {streaming_inertia(model, reader, 0):.6g}  "
+          f"stable segments {stability(model, previous, data) * 100:6.2f}%  {detail}")
+    return model
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--features', type=int, default=16)
+    parser.add_argument('--clusters', type=int, default=8)
+    parser.add_argument('--changed-fraction', type=float, default=0.05)
+    parser.add_argument('--sample-fraction', type=float, default=0.1)
+    parser.add_argument('--weekly-shift', type=float, default=0.3, help='Center shift between weeks')
+    parser.add_argument('--drifted-shift', type=float, default=15.0, help='Center shift of the drifted week')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    centers = rng.uniform(-10, 10, (args.clusters, args.features))
+    labels = rng.integers(0, args.clusters, args.rows)
+    with tempfile.TemporaryDirectory() as work_dir:
+        write_week(os.path.join(work_dir, 'week1'), centers, labels, rng)
+        previous = fit_full(ShardReader(os.path.join(work_dir, 'week1')), args.clusters, random_state=0)
+        model_dir = os.path.join(work_dir, 'model')
+        os.makedirs(model_dir)
+        joblib.dump(previous, os.path.join(model_dir, MODEL_FILE), compress=0)
+
+        for week, shift in (('week2', args.weekly_shift), ('week3-drifted', args.drifted_shift)):
+            moved = centers + rng.normal(0, shift / np.sqrt(args.features), centers.shape)
+            changed = rng.random(args.rows) < args.changed_fraction
+            week_labels = np.where(changed, rng.integers(0, args.clusters, args.rows), labels)
+            data = write_week(os.path.join(work_dir, week), moved, week_labels, rng)
+            changed_dir = os.path.join(work_dir, f'{week}-changed')
+            write_week(changed_dir, moved, week_labels[changed], np.random.default_rng(1), shards=1)
+            reader = ShardReader(os.path.join(work_dir, week))
+            print(f"{week}: {args.rows} rows x {args.features} features, {int(changed.sum())} changed")
+
+            run('full retrain', lambda: (fit_full(reader, args.clusters, random_state=0), ''), reader, previous, data)
+            run('full retrain, aligned', lambda: (
+                align_clusters(fit_full(reader, args.clusters, random_state=0), previous.cluster_centers_), ''
+            ), reader, previous, data)
+
+            def warm():
+                model, _, report = try_warm_start(model_dir, reader, ShardReader(changed_dir), args.clusters,
+                                                  args.sample_fraction, random_state=0)
+                if model is None:
+                    model = align_clusters(fit_full(reader, args.clusters, random_state=0, first_epoch=1),
+                                           previous.cluster_centers_)
+                return model, f"{report['mode']} (max drift {report.get('max_drift', float('nan')):.3f})"
+            run('warm start', warm, reader, previous, data)
@@ -5,174 +5,396 @@ from awsglue.utils import getResolvedOptions
 from awsglue.context import GlueContext
 from pyspark.context import SparkContext
 from awsglue.job import Job
+from awsglue.dynamicframe import DynamicFrame
+from pyspark.sql import functions as F
+from pyspark.sql.window import Window
+from functools import reduce
+import json
 import time
-from botocore.exceptions import ClientError
+
+# Shared Redshift Data API client (adaptive-backoff polling, batched statements)
+# IMPORTANT: For Glue, ensure 'redshift_data.py', 'schema_cache.py', 'manifest.py',
+# 'type_inference.py', 'ledger.py', 's3_archive.py' and 'merge_sql.py' (from
+# lambda/csv-processor/utils) are added to the Job's 'Python files' in Glue Job configuration.
+from redshift_data import RedshiftDataClient
+from schema_cache import SchemaCache, S3SchemaStore, DEFAULT_TTL_SECONDS
+from manifest import resolve_source_files, split_s3_path
+from type_inference import (
+    TypeInferrer,
+    infer_types,
+    SAMPLING_MODES,
+    DEFAULT_SAMPLE_SIZE,
+    DEFAULT_TYPE,
+)
+from ledger import (
+    IngestionLedger,
+    S3LedgerStore,
+    SQLiteLedgerStore,
+    describe_file,
+    schema_version,
+)
+from s3_archive import S3Archiver, DEFAULT_MAX_WORKERS
+from merge_sql import MERGE_STRATEGIES, build_merge_statements
 
 # --- Helper Functions ---
 
 
-def get_redshift_columns(
-    redshift_data_client, cluster_id, database, db_user, table_name
-):
-    """Queries Redshift's information schema to get existing column names."""
-    query = f"""SELECT column_name, data_type FROM information_schema.columns 
-               WHERE table_name = '{table_name.lower()}' ORDER BY ordinal_position;"""
-    try:
-        response = redshift_data_client.execute_statement(
-            ClusterIdentifier=cluster_id, Database=database, DbUser=db_user, Sql=query
+def get_optional_arg(name, default):
+    """Returns an optional job argument, or 'default' when it was not passed."""
+    if f"--{name}" in sys.argv:
+        return getResolvedOptions(sys.argv, [name])[name]
+    return default
+
+
+def get_table_columns_cached(redshift, schema_cache, table_name, csv_columns):
+    """
+    Returns the columns of a table, from the schema cache when the cached schema
+    already contains every CSV column (schema sync is then a no-op). Otherwise
+    the schema is read from Redshift, since another run may have changed it.
+    """
+    cached_columns = schema_cache.get(table_name)
+    if cached_columns:
+        cached_names = {col[0] for col in cached_columns}
+        if all(col in cached_names for col in csv_columns):
+            print(f"Using cached schema for table: {table_name}")
+            return cached_columns
+
+    existing_columns = redshift.get_table_columns(table_name)
+    if existing_columns:
+        schema_cache.put(table_name, existing_columns)
+    return existing_columns
+
+
+def move_files(archiver, source_files, directory):
+    """
+    Moves files (manifest entries) to a directory of their bucket in one batch:
+    concurrent server-side copies, then batched deletes. A failed move is
+    reported but does not fail the file.
+    """
+    if not source_files:
+        return
+    moved, failed = archiver.move(
+        [source_file["s3_path"] for source_file in source_files],
+        directory,
+        sizes={
+            source_file["s3_path"]: source_file["size"]
+            for source_file in source_files
+            if source_file.get("size") is not None
+        },
+    )
+    for dest_path in moved.values():
+        print(f"File moved to {directory} directory: {dest_path}")
+    for s3_path, error in failed.items():
+        print(f"Failed to move file {s3_path} to {directory} directory: {error}")
+
+
+def file_location(s3_path):
+    """Returns (bucket_name, source_key, file_name) of an S3 file path."""
+    bucket_name, source_key = split_s3_path(s3_path)
+    return bucket_name, source_key, source_key.split("/")[-1]
+
+
+def read_headers(s3_client, source_files):
+    """
+    Reads the header row of every file.
+    Returns (readable files, their column lists, unreadable files).
+    """
+    readable_files, headers, unreadable_files = [], [], []
+    for source_file in source_files:
+        bucket_name, source_key, _ = file_location(source_file["s3_path"])
+        try:
+            obj = s3_client.get_object(Bucket=bucket_name, Key=source_key)
+            headers.append(pd.read_csv(obj["Body"], nrows=0).columns.tolist())
+            obj["Body"].close()  # Only the header was needed
+            readable_files.append(source_file)
+        except Exception as e:
+            print(f"ERROR: Failed to read file {source_file['s3_path']}. Reason: {str(e)}")
+            unreadable_files.append(source_file)
+    return readable_files, headers, unreadable_files
+
+
+def infer_column_types(s3_client, source_files, columns, type_inference):
+    """
+    Infers the Redshift types of 'columns' from the data of every file (streamed
+    from S3 in chunks), merged with monotonic widening across files.
+    'type_inference' holds the mode, sample_size and max_workers to use.
+    Returns {column: Redshift type}; columns without any value get DEFAULT_TYPE.
+    """
+    wanted = set(columns)
+    inferrer = TypeInferrer(max_workers=type_inference["max_workers"])
+    for source_file in source_files:
+        bucket_name, source_key, _ = file_location(source_file["s3_path"])
+        obj = s3_client.get_object(Bucket=bucket_name, Key=source_key)
+        inferrer.merge(
+            infer_types(
+                obj["Body"],
+                mode=type_inference["mode"],
+                sample_size=type_inference["sample_size"],
+                usecols=lambda col: col in wanted,
+                max_workers=type_inference["max_workers"],
+            )
         )
+    inferred_types = inferrer.redshift_types()
+    return {col: inferred_types.get(col, DEFAULT_TYPE) for col in columns}
+
+
+def read_deduplicated_frame(spark, source_files, primary_key):
+    """
+    Reads every file into a single DataFrame (columns matched by name) and keeps
+    one row per primary key: rows from later files win, and within a file the
+    last row wins.
+    """
+    frames = []
+    for file_order, source_file in enumerate(source_files):
+        frames.append(
+            spark.read.option("header", "true")
+            .csv(source_file["s3_path"])
+            .withColumn("__file_order", F.lit(file_order))
+            .withColumn("__row_id", F.monotonically_increasing_id())
+        )
+    combined = reduce(
+        lambda left, right: left.unionByName(right, allowMissingColumns=True), frames
+    )
 
-        query_id = response["Id"]
-        max_attempts = 300  # 5 minutes timeout
-        attempt = 0
-
-        while attempt < max_attempts:
-            status_response = redshift_data_client.describe_statement(Id=query_id)
-            status = status_response["Status"]
+    latest_first = Window.partitionBy(primary_key).orderBy(
+        F.col("__file_order").desc(), F.col("__row_id").desc()
+    )
+    return (
+        combined.withColumn("__row_number", F.row_number().over(latest_first))
+        .where(F.col("__row_number") == 1)
+        .drop("__file_order", "__row_id", "__row_number")
+    )
 
-            if status == "FINISHED":
-                records = redshift_data_client.get_statement_result(Id=query_id)[
-                    "Records"
-                ]
-                return [
-                    (record[0]["stringValue"], record[1]["stringValue"])
-                    for record in records
-                ]
-            elif status in ["FAILED", "ABORTED"]:
-                error_msg = status_response.get("Error", "Unknown error")
-                raise Exception(f"Redshift query failed: {error_msg}")
 
-            time.sleep(1)
-            attempt += 1
+# --- Load Strategies ---
+# How a batch reaches the staging table ('load') and how staging is merged into
+# the target table ('merge'). Configurable per table through the
+# TABLE_LOAD_STRATEGIES job argument, e.g.
+#   {"users": {"load": "copy", "merge": "merge"}}
+# with LOAD_STRATEGY / MERGE_STRATEGY as defaults for other tables.
+#   load:  'jdbc' - write_dynamic_frame.from_jdbc_conf (default)
+#          'copy' - write Snappy-compressed Parquet to S3, then COPY into staging
+#                   (requires REDSHIFT_IAM_ROLE_ARN)
+#   merge: 'delete_in'   - DELETE ... WHERE pk IN (SELECT pk FROM staging) + INSERT (default)
+#          'delete_join' - DELETE ... USING staging (join-based delete) + INSERT
+#          'merge'       - a single MERGE statement (see merge_sql.py)
+LOAD_STRATEGIES = ("jdbc", "copy")
+
+# Redshift information_schema data types -> Spark SQL types for Parquet staging files
+SPARK_TYPES = {
+    "smallint": "smallint",
+    "integer": "int",
+    "bigint": "bigint",
+    "real": "float",
+    "double precision": "double",
+    "boolean": "boolean",
+    "date": "date",
+    "timestamp without time zone": "timestamp",
+    "timestamp with time zone": "timestamp",
+}
+
+
+# Type inference for new tables and columns: 'mode' is one of SAMPLING_MODES
+# ('full' reads every row, 'reservoir' a uniform sample of 'sample_size' rows,
+# 'head' the first 'sample_size' rows); columns are classified in parallel.
+DEFAULT_TYPE_INFERENCE = {"mode": "full", "sample_size": DEFAULT_SAMPLE_SIZE, "max_workers": 4}
+
+
+def resolve_type_inference(mode, sample_size, max_workers):
+    """Returns validated type inference settings."""
+    if mode not in SAMPLING_MODES:
+        raise ValueError(f"Unknown type inference mode: {mode}")
+    return {"mode": mode, "sample_size": int(sample_size), "max_workers": int(max_workers)}
+
+
+def resolve_load_strategy(target_table, table_strategies, default_load, default_merge):
+    """Returns the {'load', 'merge'} strategy configured for a table."""
+    strategy = {"load": default_load, "merge": default_merge}
+    strategy.update(table_strategies.get(target_table.lower(), {}))
+    if strategy["load"] not in LOAD_STRATEGIES:
+        raise ValueError(f"Unknown load strategy: {strategy['load']}")
+    if strategy["merge"] not in MERGE_STRATEGIES:
+        raise ValueError(f"Unknown merge strategy: {strategy['merge']}")
+    return strategy
+
+
+class PhaseTimer:
+    """Records the elapsed time of consecutive job phases."""
+
+    def __init__(self):
+        self.timings = {}
+        self._last = time.time()
+
+    def mark(self, phase):
+        now = time.time()
+        self.timings[phase] = round(now - self._last, 3)
+        self._last = now
+
+    def report(self, label):
+        total = sum(self.timings.values())
+        print(f"{label} timings (s): {self.timings}, total: {total:.3f}")
+
+
+def target_column_types_query(table_name):
+    """Returns the query of a table's column names, types and numeric precision, in column order."""
+    return f"""SELECT column_name, data_type, numeric_precision, numeric_scale
+               FROM information_schema.columns
+               WHERE table_name = '{table_name.lower()}' ORDER BY ordinal_position;"""
 
-        raise Exception("Query timeout after 5 minutes")
 
-    except redshift_data_client.exceptions.ResourceNotFoundException:
-        # Table doesn't exist yet
-        return []
+def to_spark_column_types(rows):
+    """Returns (column_name, spark_type) pairs from the rows of target_column_types_query."""
+    column_types = []
+    for column_name, data_type, precision, scale in rows:
+        if data_type == "numeric":
+            spark_type = f"decimal({precision or 18},{scale or 0})"
+        else:
+            spark_type = SPARK_TYPES.get(data_type, "string")
+        column_types.append((column_name, spark_type))
+    return column_types
+
+
+def project_to_table(df, column_types):
+    """
+    Selects the DataFrame columns in the table's column order, cast to the
+    table's types (matched case-insensitively); missing columns become NULL.
+    """
+    df_columns = {col.lower(): col for col in df.columns}
+    projected = []
+    for column_name, spark_type in column_types:
+        source = df_columns.get(column_name.lower())
+        value = F.col(f"`{source}`") if source else F.lit(None)
+        projected.append(value.cast(spark_type).alias(column_name))
+    return df.select(*projected)
+
+
+def delete_s3_prefix(s3_client, s3_path):
+    """Deletes every object under an S3 prefix (temporary staging files)."""
+    bucket_name, prefix = split_s3_path(s3_path)
+    paginator = s3_client.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=bucket_name, Prefix=prefix):
+        keys = [{"Key": obj["Key"]} for obj in page.get("Contents", [])]
+        if keys:
+            s3_client.delete_objects(Bucket=bucket_name, Delete={"Objects": keys})
+
+
+def load_staging_jdbc(glueContext, df, staging_table, database, connection_name, temp_dir):
+    """Loads the staging table through the Glue JDBC connection."""
+    dynamic_frame = DynamicFrame.fromDF(df, glueContext, "staging_frame")
+    glueContext.write_dynamic_frame.from_jdbc_conf(
+        frame=dynamic_frame,
+        catalog_connection=connection_name,
+        connection_options={
+            "dbtable": staging_table,
+            "database": database,
+        },
+        redshift_tmp_dir=temp_dir,
+    )
 
 
-def execute_redshift_query(redshift_data_client, cluster_id, database, db_user, query):
-    """Executes a SQL statement on Redshift and waits for completion."""
+def load_staging_copy(redshift, s3_client, df, staging_table, column_types, iam_role_arn, temp_dir):
+    """Writes the batch as Snappy-compressed Parquet and COPYs it into the staging table."""
+    if not iam_role_arn:
+        raise ValueError("The 'copy' load strategy requires REDSHIFT_IAM_ROLE_ARN.")
+    parquet_path = f"{temp_dir.rstrip('/')}/{staging_table}/"
+    project_to_table(df, column_types).write.mode("overwrite").option(
+        "compression", "snappy"
+    ).parquet(parquet_path)
     try:
-        response = redshift_data_client.execute_statement(
-            ClusterIdentifier=cluster_id, Database=database, DbUser=db_user, Sql=query
+        redshift.execute(
+            f"COPY {staging_table} FROM '{parquet_path}' "
+            f"IAM_ROLE '{iam_role_arn}' FORMAT AS PARQUET;"
         )
-
-        query_id = response["Id"]
-        max_attempts = 300  # 5 minutes timeout
-        attempt = 0
-
-        while attempt < max_attempts:
-            status_response = redshift_data_client.describe_statement(Id=query_id)
-            status = status_response["Status"]
-
-            if status == "FINISHED":
-                print(f"Successfully executed query: {query[:80]}...")
-                return True
-            elif status in ["FAILED", "ABORTED"]:
-                error_msg = status_response.get("Error", "Unknown error")
-                raise Exception(f"Redshift query failed: {error_msg}")
-
-            time.sleep(1)
-            attempt += 1
-
-        raise Exception("Query timeout after 5 minutes")
-
-    except ClientError as e:
-        print(f"AWS Client Error: {e}")
-        raise
+    finally:
+        delete_s3_prefix(s3_client, parquet_path)
 
 
-def infer_redshift_type(sample_values):
-    """Simple type inference for Redshift columns based on sample data."""
-    # This is a basic implementation - you might want to make it more sophisticated
-    for val in sample_values:
-        if pd.isna(val):
-            continue
+def skip_loaded_files(ledger, archiver, redshift, schema_cache, source_files, target_table):
+    """
+    Returns the files whose content was not loaded into the target table yet
+    (under its current schema version). Already loaded files are moved to the
+    processed directory without being read.
+    """
+    described_files, undescribed_files = [], []
+    for source_file in source_files:
         try:
-            int(val)
-            return "INTEGER"
-        except (ValueError, TypeError):
-            try:
-                float(val)
-                return "FLOAT"
-            except (ValueError, TypeError):
-                # Check for date patterns
-                if len(str(val)) == 10 and "-" in str(val):
-                    return "DATE"
-                elif len(str(val)) > 50:
-                    return "VARCHAR(500)"
-                else:
-                    return "VARCHAR(256)"
-    return "VARCHAR(256)"
-
-
-def move_file_to_error(bucket_name, source_key, file_name):
-    """Move file to error directory for debugging."""
-    try:
-        s3_resource = boto3.resource("s3")
-        error_key = f"error/{file_name}"
-        copy_source = {"Bucket": bucket_name, "Key": source_key}
-        s3_resource.Object(bucket_name, error_key).copy_from(CopySource=copy_source)
-        s3_resource.Object(bucket_name, source_key).delete()
-        print(f"File moved to error directory: s3://{bucket_name}/{error_key}")
-    except Exception as move_error:
-        print(f"Failed to move file to error directory: {move_error}")
-
-
-# --- Main job logic ---
-def main():
-    args = getResolvedOptions(
-        sys.argv,
-        [
-            "JOB_NAME",
-            "S3_SOURCE_PATH",
-            "REDSHIFT_CLUSTER_ID",
-            "REDSHIFT_DATABASE",
-            "REDSHIFT_USER",
-            "REDSHIFT_TABLE",
-            "PRIMARY_KEY",
-            "REDSHIFT_CONNECTION_NAME",  # Make connection name configurable
-        ],
+            described_files.append(describe_file(archiver.s3, source_file, ledger.method))
+        except Exception as e:
+            # Not skipped; loading reports the error and moves the file as usual
+            print(f"WARNING: Could not describe file {source_file['s3_path']}: {e}")
+            undescribed_files.append(source_file)
+    version = schema_version(
+        get_table_columns_cached(redshift, schema_cache, target_table, [])
     )
+    to_load, duplicates = ledger.partition(target_table, described_files, version)
+    for source_file in duplicates:
+        print(f"Skipping already loaded file: {source_file['s3_path']}")
+    move_files(archiver, duplicates, "processed")
+    if duplicates:
+        print(
+            f"Skipped {ledger.skipped_files} already loaded file(s), "
+            f"{ledger.skipped_bytes} bytes"
+        )
+    return to_load + undescribed_files
 
-    # Initialize contexts
-    sc = SparkContext()
-    glueContext = GlueContext(sc)
-    job = Job(glueContext)
-    job.init(args["JOB_NAME"], args)
 
-    # Parameters
-    s3_source_path = args["S3_SOURCE_PATH"]
-    target_table = args["REDSHIFT_TABLE"]
-    primary_key = args["PRIMARY_KEY"]
-    connection_name = args["REDSHIFT_CONNECTION_NAME"]
-    bucket_name = s3_source_path.split("/")[2]
-    source_key = "/".join(s3_source_path.split("/")[3:])
-    file_name = s3_source_path.split("/")[-1]
+def record_loaded_files(ledger, redshift, schema_cache, source_files, target_table):
+    """Records loaded files in the ledger under the table's schema version after the load."""
+    version = schema_version(
+        get_table_columns_cached(redshift, schema_cache, target_table, [])
+    )
+    for source_file in source_files:
+        # Files that could not be described have no content ID and are not recorded
+        if source_file.get("sha256" if ledger.method == "sha256" else "etag"):
+            ledger.record(target_table, source_file, version)
+
+
+# --- File processing ---
+def load_files(
+    glueContext,
+    redshift,
+    archiver,
+    schema_cache,
+    source_files,
+    target_table,
+    primary_key,
+    connection_name,
+    strategy,
+    iam_role_arn="",
+    type_inference=None,
+):
+    """
+    Loads a batch of CSV files into the target table with one staging table,
+    one write and one merge transaction, using the given load/merge strategy.
+    Returns the paths of failed files.
+    """
+    type_inference = type_inference or DEFAULT_TYPE_INFERENCE
+    timer = PhaseTimer()
+    # Latest file wins: order by S3 event time when known, else manifest order
+    source_files = sorted(source_files, key=lambda f: f.get("event_time") or "")
     staging_table = f"{target_table}_staging_{int(time.time())}"
-
-    redshift_data = boto3.client("redshift-data")
     staging_table_created = False
 
+    # 1. Read the headers; column data is only read if types must be inferred
+    s3_client = archiver.s3
+    source_files, headers, unreadable_files = read_headers(s3_client, source_files)
+    move_files(archiver, unreadable_files, "error")
+    failed_files = [source_file["s3_path"] for source_file in unreadable_files]
+    if not source_files:
+        return failed_files
+
+    timer.mark("read_headers")
+
     try:
-        print(f"Starting processing for file: {s3_source_path}")
+        print(f"Starting processing for {len(source_files)} file(s) "
+              f"(load: {strategy['load']}, merge: {strategy['merge']})")
 
-        # 1. Read sample data for type inference
-        s3_client = boto3.client("s3")
-        obj = s3_client.get_object(Bucket=bucket_name, Key=source_key)
-        sample_df = pd.read_csv(obj["Body"], nrows=100)  # Sample first 100 rows
-        csv_columns = sample_df.columns.tolist()
+        csv_columns = list(dict.fromkeys(col for header in headers for col in header))
 
         # 2. Synchronize Schema
         print("Synchronizing schema...")
-        existing_columns = get_redshift_columns(
-            redshift_data,
-            args["REDSHIFT_CLUSTER_ID"],
-            args["REDSHIFT_DATABASE"],
-            args["REDSHIFT_USER"],
-            target_table,
+        existing_columns = get_table_columns_cached(
+            redshift, schema_cache, target_table, csv_columns
         )
 
         existing_column_names = (
@@ -182,23 +404,18 @@ def main():
         if not existing_columns:
             # Table doesn't exist, create it with inferred types
             print(f"Creating new table: {target_table}")
-            column_definitions = []
-            for col in csv_columns:
-                if col in sample_df.columns:
-                    col_type = infer_redshift_type(sample_df[col].dropna().head(10))
-                else:
-                    col_type = "VARCHAR(256)"
-                column_definitions.append(f'"{col}" {col_type}')
+            inferred_types = infer_column_types(
+                s3_client, source_files, csv_columns, type_inference
+            )
+            timer.mark("type_inference")
+            column_definitions = [
+                f'"{col}" {col_type}' for col, col_type in inferred_types.items()
+            ]
 
             columns_with_types = ", ".join(column_definitions)
             create_query = f'CREATE TABLE {target_table} ({columns_with_types}, PRIMARY KEY ("{primary_key}"));'
-            execute_redshift_query(
-                redshift_data,
-                args["REDSHIFT_CLUSTER_ID"],
-                args["REDSHIFT_DATABASE"],
-                args["REDSHIFT_USER"],
-                create_query,
-            )
+            redshift.execute(create_query)
+            schema_cache.invalidate(target_table)
         else:
             # Table exists, add new columns
             new_columns = [
@@ -206,117 +423,224 @@ def main():
             ]
             if new_columns:
                 print(f"Adding new columns: {new_columns}")
-                for col in new_columns:
-                    if col in sample_df.columns:
-                        col_type = infer_redshift_type(sample_df[col].dropna().head(10))
-                    else:
-                        col_type = "VARCHAR(256)"
-                    alter_query = (
-                        f'ALTER TABLE {target_table} ADD COLUMN "{col}" {col_type};'
-                    )
-                    execute_redshift_query(
-                        redshift_data,
-                        args["REDSHIFT_CLUSTER_ID"],
-                        args["REDSHIFT_DATABASE"],
-                        args["REDSHIFT_USER"],
-                        alter_query,
-                    )
-
-        # 3. Create staging table
+                # Only the new columns are parsed and classified
+                inferred_types = infer_column_types(
+                    s3_client, source_files, new_columns, type_inference
+                )
+                timer.mark("type_inference")
+                alter_queries = [
+                    f'ALTER TABLE {target_table} ADD COLUMN "{col}" {col_type};'
+                    for col, col_type in inferred_types.items()
+                ]
+                # One batch_execute_statement call instead of one round trip per column
+                redshift.execute_batch(alter_queries)
+                schema_cache.invalidate(target_table)
+
+        timer.mark("schema_sync")
+
+        # 3. Create the staging table and read the target's column types. Both
+        # only depend on the synchronized target table, so the two statements
+        # run concurrently and are polled together.
         print(f"Creating staging table: {staging_table}")
         create_staging_query = f"CREATE TABLE {staging_table} (LIKE {target_table});"
-        execute_redshift_query(
-            redshift_data,
-            args["REDSHIFT_CLUSTER_ID"],
-            args["REDSHIFT_DATABASE"],
-            args["REDSHIFT_USER"],
-            create_staging_query,
-        )
-        staging_table_created = True
-
-        # 4. Load data into staging table
-        print(f"Loading data into staging table: {staging_table}")
-        dynamic_frame = glueContext.create_dynamic_frame.from_options(
-            connection_type="s3",
-            connection_options={"paths": [s3_source_path]},
-            format="csv",
-            format_options={"withHeader": True},
+        statement_ids = [redshift.submit(create_staging_query)]
+        staging_table_created = True  # DROP TABLE IF EXISTS also covers a failed CREATE
+        if strategy["load"] == "copy" or strategy["merge"] == "merge":
+            statement_ids.append(redshift.submit(target_column_types_query(target_table)))
+        redshift.wait_all(statement_ids)
+        column_types = []
+        if len(statement_ids) > 1:
+            column_types = to_spark_column_types(redshift.fetch_results(statement_ids[1]))
+
+        # 4. Load all files into the staging table in one write
+        print(f"Loading {len(source_files)} file(s) into staging table: {staging_table}")
+        deduplicated_df = read_deduplicated_frame(
+            glueContext.spark_session, source_files, primary_key
         )
 
-        glueContext.write_dynamic_frame.from_jdbc_conf(
-            frame=dynamic_frame,
-            catalog_connection=connection_name,
-            connection_options={
-                "dbtable": staging_table,
-                "database": args["REDSHIFT_DATABASE"],
-            },
-            redshift_tmp_dir=f"s3://{bucket_name}/temp/",
-        )
+        bucket_name = split_s3_path(source_files[0]["s3_path"])[0]
+        temp_dir = f"s3://{bucket_name}/temp/"
+        if strategy["load"] == "copy":
+            load_staging_copy(
+                redshift, s3_client, deduplicated_df, staging_table, column_types, iam_role_arn, temp_dir
+            )
+        else:
+            load_staging_jdbc(
+                glueContext,
+                deduplicated_df,
+                staging_table,
+                redshift.database,
+                connection_name,
+                temp_dir,
+            )
+        timer.mark("load_staging")
 
-        # 5. Perform the UPSERT with better transaction handling
+        # 5. Perform a single UPSERT for the whole batch
         print("Performing UPSERT operation...")
 
-        # Use single transaction for all operations
-        upsert_query = f"""
-        BEGIN;
-        DELETE FROM {target_table} 
-        WHERE "{primary_key}" IN (SELECT "{primary_key}" FROM {staging_table});
-        
-        INSERT INTO {target_table} SELECT * FROM {staging_table};
-        COMMIT;
-        """
-
-        execute_redshift_query(
-            redshift_data,
-            args["REDSHIFT_CLUSTER_ID"],
-            args["REDSHIFT_DATABASE"],
-            args["REDSHIFT_USER"],
-            upsert_query,
+        # batch_execute_statement runs the statements in a single transaction
+        redshift.execute_batch(
+            build_merge_statements(
+                strategy["merge"],
+                target_table,
+                staging_table,
+                primary_key,
+                [col[0] for col in column_types],
+            )
         )
+        timer.mark("merge")
 
         print("UPSERT completed successfully.")
+        timer.report(f"Load of {target_table}")
 
-        # 6. Move processed file to processed directory
-        s3_resource = boto3.resource("s3")
-        processed_key = f"processed/{file_name}"
-        copy_source = {"Bucket": bucket_name, "Key": source_key}
-        s3_resource.Object(bucket_name, processed_key).copy_from(CopySource=copy_source)
-        s3_resource.Object(bucket_name, source_key).delete()
-        print(f"File moved to processed directory: s3://{bucket_name}/{processed_key}")
+        # 6. Move processed files to processed directory
+        move_files(archiver, source_files, "processed")
+        timer.mark("archive")
+        return failed_files
 
     except Exception as e:
-        print(f"ERROR: Failed to process file {s3_source_path}. Reason: {str(e)}")
-        move_file_to_error(bucket_name, source_key, file_name)
+        print(f"ERROR: Failed to load {len(source_files)} file(s). Reason: {str(e)}")
+        move_files(archiver, source_files, "error")
+        failed_files.extend(source_file["s3_path"] for source_file in source_files)
 
         # Rollback any transaction that might be in progress
         try:
-            execute_redshift_query(
-                redshift_data,
-                args["REDSHIFT_CLUSTER_ID"],
-                args["REDSHIFT_DATABASE"],
-                args["REDSHIFT_USER"],
-                "ROLLBACK;",
-            )
+            redshift.execute("ROLLBACK;")
         except:
             pass  # Rollback might fail if no transaction is active
 
-        sys.exit(1)
+        return failed_files
 
     finally:
         # Clean up staging table
         if staging_table_created:
             print(f"Dropping staging table: {staging_table}")
             try:
-                execute_redshift_query(
-                    redshift_data,
-                    args["REDSHIFT_CLUSTER_ID"],
-                    args["REDSHIFT_DATABASE"],
-                    args["REDSHIFT_USER"],
-                    f"DROP TABLE IF EXISTS {staging_table};",
-                )
+                redshift.execute(f"DROP TABLE IF EXISTS {staging_table};")
             except Exception as cleanup_e:
                 print(f"Failed to drop staging table during cleanup: {cleanup_e}")
 
+
+# --- Main job logic ---
+def main():
+    args = getResolvedOptions(
+        sys.argv,
+        [
+            "JOB_NAME",
+            "REDSHIFT_CLUSTER_ID",
+            "REDSHIFT_DATABASE",
+            "REDSHIFT_USER",
+            "REDSHIFT_TABLE",
+            "PRIMARY_KEY",
+            "REDSHIFT_CONNECTION_NAME",  # Make connection name configurable
+        ],
+    )
+
+    # Initialize contexts
+    sc = SparkContext()
+    glueContext = GlueContext(sc)
+    job = Job(glueContext)
+    job.init(args["JOB_NAME"], args)
+
+    # Parameters
+    # Files to load: a manifest written by the csv-processor Lambda
+    # (S3_MANIFEST_PATH), a comma-separated list (S3_SOURCE_PATHS) or a single
+    # file (S3_SOURCE_PATH).
+    source_files = resolve_source_files(
+        source_path=get_optional_arg("S3_SOURCE_PATH", ""),
+        source_paths=get_optional_arg("S3_SOURCE_PATHS", ""),
+        manifest_path=get_optional_arg("S3_MANIFEST_PATH", ""),
+    )
+    if not source_files:
+        raise ValueError(
+            "One of S3_SOURCE_PATH, S3_SOURCE_PATHS or S3_MANIFEST_PATH is required."
+        )
+    target_table = args["REDSHIFT_TABLE"]
+    primary_key = args["PRIMARY_KEY"]
+    connection_name = args["REDSHIFT_CONNECTION_NAME"]
+    strategy = resolve_load_strategy(
+        target_table,
+        {
+            table.lower(): table_strategy
+            for table, table_strategy in json.loads(
+                get_optional_arg("TABLE_LOAD_STRATEGIES", "{}")
+            ).items()
+        },
+        get_optional_arg("LOAD_STRATEGY", "jdbc"),
+        get_optional_arg("MERGE_STRATEGY", "delete_in"),
+    )
+
+    type_inference = resolve_type_inference(
+        get_optional_arg("TYPE_INFERENCE_MODE", DEFAULT_TYPE_INFERENCE["mode"]),
+        get_optional_arg("TYPE_INFERENCE_SAMPLE_SIZE", DEFAULT_TYPE_INFERENCE["sample_size"]),
+        get_optional_arg("TYPE_INFERENCE_WORKERS", DEFAULT_TYPE_INFERENCE["max_workers"]),
+    )
+
+    redshift = RedshiftDataClient(
+        args["REDSHIFT_CLUSTER_ID"], args["REDSHIFT_DATABASE"], args["REDSHIFT_USER"]
+    )
+
+    # Schema cache shared between job runs when SCHEMA_CACHE_S3_PATH is set
+    schema_cache_s3_path = get_optional_arg("SCHEMA_CACHE_S3_PATH", "")
+    schema_cache = SchemaCache(
+        store=S3SchemaStore(schema_cache_s3_path) if schema_cache_s3_path else None,
+        ttl_seconds=int(get_optional_arg("SCHEMA_CACHE_TTL_SECONDS", DEFAULT_TTL_SECONDS)),
+    )
+
+    # One S3 client for every read and move of the run
+    archiver = S3Archiver(
+        boto3.client("s3"),
+        max_workers=int(get_optional_arg("ARCHIVE_MAX_WORKERS", DEFAULT_MAX_WORKERS)),
+    )
+
+    # Ingestion ledger: files whose content was already loaded into the table are
+    # skipped (LEDGER_S3_PATH shared between runs, or LEDGER_SQLITE_PATH locally)
+    ledger = None
+    ledger_s3_path = get_optional_arg("LEDGER_S3_PATH", "")
+    ledger_sqlite_path = get_optional_arg("LEDGER_SQLITE_PATH", "")
+    if ledger_s3_path or ledger_sqlite_path:
+        ledger = IngestionLedger(
+            S3LedgerStore(ledger_s3_path) if ledger_s3_path else SQLiteLedgerStore(ledger_sqlite_path),
+            method=get_optional_arg("LEDGER_CONTENT_ID", "etag"),
+        )
+        source_files = skip_loaded_files(
+            ledger, archiver, redshift, schema_cache, source_files, target_table
+        )
+        if not source_files:
+            print("All files were already loaded; nothing to do.")
+            print(f"Schema cache: {schema_cache.hits} hit(s), {schema_cache.misses} miss(es)")
+            job.commit()
+            return
+
+    print(f"Processing {len(source_files)} file(s) into table: {target_table}")
+    failed_files = load_files(
+        glueContext,
+        redshift,
+        archiver,
+        schema_cache,
+        source_files,
+        target_table,
+        primary_key,
+        connection_name,
+        strategy,
+        iam_role_arn=get_optional_arg("REDSHIFT_IAM_ROLE_ARN", ""),
+        type_inference=type_inference,
+    )
+
+    if ledger is not None:
+        record_loaded_files(
+            ledger,
+            redshift,
+            schema_cache,
+            [f for f in source_files if f["s3_path"] not in failed_files],
+            target_table,
+        )
+
+    print(f"Schema cache: {schema_cache.hits} hit(s), {schema_cache.misses} miss(es)")
+    if failed_files:
+        print(f"ERROR: {len(failed_files)} of {len(source_files)} file(s) failed: {failed_files}")
+        sys.exit(1)
+
     job.commit()
 
 
@@ -2,6 +2,7 @@ import sys
 from awsglue.transforms import *
 from awsglue.utils import getResolvedOptions
 from pyspark.context import SparkContext
+from pyspark.sql import functions as F
 from awsglue.context import GlueContext
 from awsglue.job import Job
 import boto3
@@ -9,9 +10,27 @@ import json
 from datetime import datetime
 
 # Import data quality rules
-# IMPORTANT: For Glue, ensure 'quality_rules.py' (or its containing 'rules' directory)
-# is added to the Job's 'Python library path' or 'Python files' in Glue Job configuration.
-from quality_rules import get_sql_rules
+# IMPORTANT: For Glue, ensure 'quality_rules.py', 'fanout.py' and 'engine.py'
+# (from lambda/data-quality-checker/rules; engine.py is imported by the 'spark'
+# Python DQ mode) are added to the Job's 'Python files' in Glue Job
+# configuration (--extra-py-files, see terraform/main.tf).
+from quality_rules import get_rule_query, get_sql_rules
+from fanout import (
+    plan_shards,
+    invoke_shards,
+    merge_shard_results,
+    split_s3_path,
+    DEFAULT_SHARD_SIZE,
+    DEFAULT_MAX_WORKERS,
+    DEFAULT_MAX_ERROR_DETAILS,
+)
+
+
+def get_optional_arg(name, default):
+    """Returns an optional job argument, or 'default' when it was not passed."""
+    if f"--{name}" in sys.argv:
+        return getResolvedOptions(sys.argv, [name])[name]
+    return default
 
 
 # Initialize Glue context
@@ -36,12 +55,173 @@ s3_input_path = args["S3_INPUT_PATH"]
 s3_error_path = args["S3_ERROR_PATH"]
 data_quality_lambda_arn = args["DATA_QUALITY_LAMBDA_ARN"]
 sns_topic_arn = args["SNS_TOPIC_ARN"]
+# Python DQ checks run on shards of the input: 'lambda' invokes the
+# data-quality-checker Lambda per shard concurrently, 'spark' runs the rules on
+# the Spark executors (requires 'engine.py' in the Job's 'Python files' too).
+python_dq_mode = get_optional_arg("PYTHON_DQ_MODE", "lambda")
+shard_size = int(get_optional_arg("DQ_SHARD_SIZE_MB", DEFAULT_SHARD_SIZE // (1024 * 1024))) * 1024 * 1024
+max_concurrency = int(get_optional_arg("DQ_MAX_CONCURRENCY", DEFAULT_MAX_WORKERS))
+max_error_details = int(get_optional_arg("DQ_MAX_ERROR_DETAILS", DEFAULT_MAX_ERROR_DETAILS))
 
+s3_client = boto3.client("s3")
 lambda_client = boto3.client("lambda")
 sns_client = boto3.client("sns")
 
 all_errors_found = []  # To collect all errors from SQL and Python checks
 
+
+# --- SQL Rule Planner ---
+# Row-level rules (those with a 'predicate') are fused: one aggregation counts
+# every rule, and one scan writes each violating row once per rule it violates.
+# Rules that only have a 'query' (e.g. aggregations) run on their own, and so
+# does each row-level rule if the fused query fails (SELECT * ... WHERE predicate).
+
+
+def plan_sql_rules(sql_rules):
+    """Splits SQL rules into fusable row-level rules and standalone query rules."""
+    row_rules, query_rules = {}, {}
+    for rule_name, rule_details in sql_rules.items():
+        if rule_details.get("predicate"):
+            row_rules[rule_name] = rule_details
+        else:
+            query_rules[rule_name] = rule_details
+    return row_rules, query_rules
+
+
+def build_fused_count_query(row_rules, view_name="temp_data"):
+    """Builds a single aggregation that counts the violations of every row-level rule."""
+    counts = ",\n    ".join(
+        f"SUM(CASE WHEN ({details['predicate']}) THEN 1 ELSE 0 END) AS `{rule_name}`"
+        for rule_name, details in row_rules.items()
+    )
+    return f"SELECT\n    {counts}\nFROM {view_name}"
+
+
+def build_fused_violations_query(row_rules, view_name="temp_data"):
+    """
+    Builds a single scan that tags each violating row with the error types it
+    violates and emits it once per violation (column 'dq_error_type').
+    """
+    tags = ", ".join(
+        f"CASE WHEN ({details['predicate']}) THEN '{details['error_type'].lower()}' END"
+        for details in row_rules.values()
+    )
+    any_violation = " OR ".join(
+        f"({details['predicate']})" for details in row_rules.values()
+    )
+    return (
+        f"SELECT *, explode(filter(array({tags}), x -> x IS NOT NULL)) AS dq_error_type "
+        f"FROM {view_name} WHERE {any_violation}"
+    )
+
+
+def sql_rule_error(rule_name, rule_details, count, error_path):
+    """Builds the error entry reported for a SQL rule with violations."""
+    return {
+        "rule_name": rule_name,
+        "error_type": rule_details["error_type"],
+        "description": rule_details["description"],
+        "count": count,
+        "error_path": error_path,
+        "source_file": s3_input_path,
+    }
+
+
+def sql_execution_error(rule_name, rule_details, e):
+    """Builds the error entry reported when a SQL rule cannot be executed."""
+    return {
+        "rule_name": rule_name,
+        "error_type": "SQL_EXECUTION_ERROR",
+        "description": f"Failed to execute SQL rule: {rule_details['description']}",
+        "details": str(e),
+        "source_file": s3_input_path,
+    }
+
+
+def run_standalone_sql_rule(rule_name, rule_details, run_timestamp):
+    """Runs a single rule query, counting and writing its result only once."""
+    error_type = rule_details["error_type"]
+    print(f"  - Running SQL Rule: {rule_name} ({rule_details['description']})")
+    try:
+        bad_records_df = spark.sql(get_rule_query(rule_details)).cache()
+        bad_count = bad_records_df.count()
+        if bad_count > 0:
+            print(f"    -> Found {bad_count} records for rule: {rule_name}")
+            # Write bad records to a specific error path
+            error_output_path = (
+                f"{s3_error_path}/{error_type.lower()}/{run_timestamp}/"
+            )
+            bad_records_df.write.mode("append").csv(error_output_path)
+            all_errors_found.append(
+                sql_rule_error(rule_name, rule_details, bad_count, error_output_path)
+            )
+        bad_records_df.unpersist()
+    except Exception as e:
+        print(f"    -> Error executing SQL rule {rule_name}: {e}")
+        all_errors_found.append(sql_execution_error(rule_name, rule_details, e))
+
+
+def run_fused_sql_rules(row_rules, run_timestamp):
+    """
+    Runs all row-level rules with two scans of the cached data: one aggregation
+    for the counts and, only if something failed, one scan selecting the
+    violating rows, written per error type.
+    """
+    print(f"  - Running {len(row_rules)} row-level SQL rules in a single scan: "
+          f"{', '.join(row_rules)}")
+    try:
+        counts = spark.sql(build_fused_count_query(row_rules)).collect()[0].asDict()
+    except Exception as e:
+        # A single broken predicate fails the fused query; run the rules one by
+        # one so the failure is reported against the right rule.
+        print(f"    -> Fused SQL rules failed ({e}), running them individually")
+        for rule_name, rule_details in row_rules.items():
+            run_standalone_sql_rule(rule_name, rule_details, run_timestamp)
+        return
+
+    failed_rules = {
+        rule_name: rule_details
+        for rule_name, rule_details in row_rules.items()
+        if (counts.get(rule_name) or 0) > 0
+    }
+    if not failed_rules:
+        return
+
+    # The violating rows are computed by one scan and cached; each error type
+    # is then written to its own '{error_type}/{run_timestamp}/' directory,
+    # the layout of the per-rule writes.
+    error_output_paths = {
+        error_type: f"{s3_error_path}/{error_type}/{run_timestamp}/"
+        for error_type in {
+            rule_details["error_type"].lower() for rule_details in failed_rules.values()
+        }
+    }
+    violations_df = spark.sql(build_fused_violations_query(failed_rules)).cache()
+    try:
+        for error_type, error_output_path in error_output_paths.items():
+            violations_df.filter(F.col("dq_error_type") == error_type).drop(
+                "dq_error_type"
+            ).write.mode("append").csv(error_output_path)
+    except Exception as e:
+        print(f"    -> Error writing bad records for fused SQL rules: {e}")
+        for rule_name, rule_details in failed_rules.items():
+            all_errors_found.append(sql_execution_error(rule_name, rule_details, e))
+        return
+    finally:
+        violations_df.unpersist()
+
+    for rule_name, rule_details in failed_rules.items():
+        print(f"    -> Found {counts[rule_name]} records for rule: {rule_name}")
+        all_errors_found.append(
+            sql_rule_error(
+                rule_name,
+                rule_details,
+                counts[rule_name],
+                error_output_paths[rule_details["error_type"].lower()],
+            )
+        )
+
+
 # --- Read data from S3 ---
 print(f"Reading data from: {s3_input_path}")
 try:
@@ -55,6 +235,7 @@ try:
     df = datasource.toDF()
     df.printSchema()
     df.show(5)
+    df.cache()  # Cached once; every SQL check below reads from memory
     df.createOrReplaceTempView("temp_data")  # Create temp view for SQL checks
 except Exception as e:
     print(f"Error reading data from S3: {e}")
@@ -71,68 +252,92 @@ except Exception as e:
 # --- Execute SQL Data Quality Rules ---
 print("Executing SQL data quality rules...")
 sql_rules = get_sql_rules()
-for rule_name, rule_details in sql_rules.items():
-    query = rule_details["query"]
-    error_type = rule_details["error_type"]
-    description = rule_details["description"]
+row_rules, query_rules = plan_sql_rules(sql_rules)
+run_timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
 
-    print(f"  - Running SQL Rule: {rule_name} ({description})")
-    try:
-        bad_records_df = spark.sql(query)
-        if bad_records_df.count() > 0:
-            print(
-                f"    -> Found {bad_records_df.count()} records for rule: {rule_name}"
-            )
-            # Write bad records to a specific error path
-            error_output_path = f"{s3_error_path}/{error_type.lower()}/{datetime.now().strftime('%Y%m%d%H%M%S')}/"
-            bad_records_df.write.mode("append").csv(error_output_path)
+if row_rules:
+    run_fused_sql_rules(row_rules, run_timestamp)
+for rule_name, rule_details in query_rules.items():
+    run_standalone_sql_rule(rule_name, rule_details, run_timestamp)
 
-            # Collect error details
-            all_errors_found.append(
-                {
-                    "rule_name": rule_name,
-                    "error_type": error_type,
-                    "description": description,
-                    "count": bad_records_df.count(),
-                    "error_path": error_output_path,
-                    "source_file": s3_input_path,
-                }
+df.unpersist()
+
+
+# --- Run Python Data Quality Rules on Shards ---
+def check_shards_on_executor(shards):
+    """Runs the Python rules for a partition of shards on a Spark executor."""
+    # Imported on the executor, where the Job's 'Python files' are available
+    from engine import check_csv_stream_vectorized, open_s3_csv, build_check_response
+    from quality_rules import get_batch_rules
+
+    executor_s3_client = boto3.client("s3")
+    batch_rules = get_batch_rules()
+    for shard in shards:
+        bucket, key = split_s3_path(shard["s3_path"])
+        try:
+            body = open_s3_csv(executor_s3_client, bucket, key, shard.get("byte_range"))
+            records_checked, collector = check_csv_stream_vectorized(
+                body,
+                batch_rules,
+                source_s3_path=shard["s3_path"],
+                max_error_details=max_error_details,
             )
-    except Exception as e:
-        print(f"    -> Error executing SQL rule {rule_name}: {e}")
-        all_errors_found.append(
-            {
-                "rule_name": rule_name,
-                "error_type": "SQL_EXECUTION_ERROR",
-                "description": f"Failed to execute SQL rule: {description}",
-                "details": str(e),
-                "source_file": s3_input_path,
+            yield build_check_response(records_checked, collector)
+        except Exception as e:
+            yield {
+                "status": "FAILED",
+                "errors_found": True,
+                "details": [
+                    {
+                        "error_type": "EXECUTOR_PROCESSING_ERROR",
+                        "description": str(e),
+                        "source_s3_path": shard["s3_path"],
+                    }
+                ],
             }
-        )
 
 
-# --- Invoke Lambda for Python Data Quality Rules ---
-print("Invoking Lambda for Python data quality rules...")
-payload = {
-    "s3_path": s3_input_path,
-    "error_s3_path": s3_error_path,  # Lambda might use this for context, though Glue handles writing
-}
-
+print(f"Running Python data quality rules (mode: {python_dq_mode})...")
 try:
-    response = lambda_client.invoke(
-        FunctionName=data_quality_lambda_arn,
-        InvocationType="RequestResponse",  # Use 'RequestResponse' to get results back
-        Payload=json.dumps(payload),
-    )
-    response_payload = json.loads(response["Payload"].read().decode("utf-8"))
+    shards = plan_shards(s3_client, s3_input_path, shard_size)
+    print(f"  - Planned {len(shards)} shards for {s3_input_path}")
+
+    if python_dq_mode == "spark":
+        shard_results = (
+            sc.parallelize(shards, max(len(shards), 1))
+            .mapPartitions(check_shards_on_executor)
+            .collect()
+        )
+    else:
+        payload = {
+            "error_s3_path": s3_error_path,  # Lambda might use this for context, though Glue handles writing
+            "max_error_details": max_error_details,
+        }
+        shard_results = invoke_shards(
+            lambda_client,
+            data_quality_lambda_arn,
+            shards,
+            base_payload=payload,
+            max_workers=max_concurrency,
+        )
+
+    response_payload = merge_shard_results(shard_results, max_error_details)
 
     if response_payload.get("status") == "FAILED" and response_payload.get(
         "errors_found"
     ):
+        error_count = response_payload.get(
+            "error_count", len(response_payload.get("details", []))
+        )
         print(
-            f"Lambda reported {len(response_payload.get('details', []))} Python data quality issues."
+            f"Python rules reported {error_count} data quality issues "
+            f"across {response_payload['shards_checked']} shards."
         )
-        # Lambda should return structured errors, append them to all_errors_found
+        if response_payload.get("details_truncated"):
+            print(
+                f"  -> Only {len(response_payload.get('details', []))} error details were returned."
+            )
+        # Shards return structured errors, append them to all_errors_found
         for error_detail in response_payload.get("details", []):
             all_errors_found.append(
                 {
@@ -142,19 +347,19 @@ try:
                         "description", "Python data quality check failed."
                     ),
                     "details": error_detail.get("details", "No specific details."),
-                    "source_file": s3_input_path,
+                    "source_file": error_detail.get("source_s3_path", s3_input_path),
                 }
             )
     else:
-        print("Lambda reported no Python data quality issues.")
+        print("Python rules reported no data quality issues.")
 
 except Exception as e:
-    print(f"Error invoking Lambda {data_quality_lambda_arn}: {e}")
+    print(f"Error running Python DQ checks for {s3_input_path}: {e}")
     all_errors_found.append(
         {
             "rule_name": "LAMBDA_INVOCATION_ERROR",
             "error_type": "LAMBDA_ERROR",
-            "description": f"Failed to invoke Lambda for Python DQ checks: {str(e)}",
+            "description": f"Failed to run Python DQ checks: {str(e)}",
             "source_file": s3_input_path,
         }
     )
@@ -1,12 +1,119 @@
-
 import sys
+import json
+import re
+import uuid
+from datetime import datetime, timezone
 from awsglue.transforms import *
 from awsglue.utils import getResolvedOptions
 from pyspark.context import SparkContext
+from pyspark.sql import functions as F
 from awsglue.context import GlueContext
 from awsglue.job import Job
 import boto3
 
+# Extraction modes:
+#   full        - extracts every active user and rewrites the whole feature
+#                 snapshot (the previous behaviour; also the first run, and any
+#                 run whose saved state no longer matches the configuration)
+#   incremental - extracts only the users whose watermark expression is at or
+#                 past the saved watermark, and merges them into the snapshot
+# The snapshot is Parquet partitioned by user_bucket (a hash of user_id), so a
+# merge rewrites only the buckets holding changed users. The watermark is the
+# MAX of the watermark expression, read in Redshift *before* the extraction:
+# rows changed during the run are at or past it and are extracted again by the
+# next run (the merge is an upsert, so that is harmless). It is saved only
+# once the snapshot is written.
+# Deactivations: an incremental run removes the users it extracts as inactive,
+# so a deactivated user only leaves the snapshot if deactivating them moves
+# the watermark expression. The default, c.last_purchase_date, does not: set
+# WATERMARK_COLUMNS to columns updated with the users table (e.g.
+# 'u.updated_at,c.updated_at') or deactivated users stay until a full run.
+# Optional job arguments:
+#   --EXTRACT_MODE       full (default) or incremental
+#   --WATERMARK_COLUMNS  comma-separated columns of the watermark expression
+#                        (default: c.last_purchase_date, see above)
+#   --SNAPSHOT_BUCKETS   number of user_bucket partitions (default: 64)
+#   --WATERMARK_S3_PATH  where the watermark state is saved
+#   --DELTA_S3_PATH      where the changed active users of a run are written
+EXTRACT_MODES = ("full", "incremental")
+DEFAULT_WATERMARK_COLUMNS = "c.last_purchase_date"
+DEFAULT_SNAPSHOT_BUCKETS = 64
+BUCKET_COLUMN = "user_bucket"
+WATERMARK_PATTERN = re.compile(r"^\d{4}-\d{2}-\d{2}([ T]\d{2}:\d{2}:\d{2}(\.\d+)?)?$")
+
+# --- Helper Functions ---
+
+
+def get_optional_arg(name, default):
+    """Returns an optional job argument, or 'default' when it was not passed."""
+    if f"--{name}" in sys.argv:
+        return getResolvedOptions(sys.argv, [name])[name]
+    return default
+
+
+def split_s3_path(s3_path):
+    bucket, _, key = s3_path.replace("s3://", "", 1).partition("/")
+    return bucket, key
+
+
+def read_state(s3, s3_path):
+    """Returns the saved watermark state, or None before the first run."""
+    bucket, key = split_s3_path(s3_path)
+    try:
+        return json.loads(s3.get_object(Bucket=bucket, Key=key)["Body"].read())
+    except s3.exceptions.NoSuchKey:
+        return None
+
+
+def delete_prefix(s3, s3_path):
+    """Deletes every object under an S3 prefix; returns how many were deleted."""
+    bucket, prefix = split_s3_path(s3_path)
+    deleted = 0
+    for page in s3.get_paginator("list_objects_v2").paginate(Bucket=bucket, Prefix=prefix):
+        keys = [{"Key": obj["Key"]} for obj in page.get("Contents", [])]   # At most 1000 per page
+        if keys:
+            response = s3.delete_objects(Bucket=bucket, Delete={"Objects": keys, "Quiet": True})
+            if response.get("Errors"):
+                raise RuntimeError(f"Could not delete objects under {s3_path}: {response['Errors'][:5]}")
+            deleted += len(keys)
+    return deleted
+
+
+def write_state(s3, s3_path, state):
+    bucket, key = split_s3_path(s3_path)
+    s3.put_object(Bucket=bucket, Key=key, Body=json.dumps(state, indent=2).encode("utf-8"),
+                  ContentType="application/json")
+
+
+def watermark_expression(columns):
+    """'c.last_purchase_date' or 'u.updated_at,c.updated_at' -> the SQL expression to track."""
+    columns = [column.strip() for column in columns.split(",") if column.strip()]
+    return columns[0] if len(columns) == 1 else f"GREATEST({', '.join(columns)})"
+
+
+def watermark_literal(value):
+    """Quotes a saved watermark for the SQL text, after checking it is a date or timestamp."""
+    if not WATERMARK_PATTERN.match(value):
+        raise ValueError(f"Invalid watermark: {value!r}")
+    return f"'{value}'"
+
+
+def read_redshift(query):
+    return glueContext.create_dynamic_frame.from_options(
+        connection_type="redshift",
+        connection_options={
+            "redshiftTmpDir": args['TEMP_S3_DIR'],
+            "useConnectionProperties": "true",
+            "connectionName": args['REDSHIFT_CONNECTION_NAME'],
+            "query": query
+        }
+    ).toDF()
+
+
+def with_bucket(df, buckets):
+    return df.withColumn(BUCKET_COLUMN, F.pmod(F.xxhash64("user_id"), F.lit(buckets)).cast("int"))
+
+
 # Get job arguments
 args = getResolvedOptions(sys.argv, [
     'JOB_NAME',
@@ -21,50 +128,124 @@ spark = glueContext.spark_session
 job = Job(glueContext)
 job.init(args['JOB_NAME'], args)
 
+snapshot_path = args['OUTPUT_S3_PATH'].rstrip("/") + "/"
+extract_mode = get_optional_arg("EXTRACT_MODE", "full")
+if extract_mode not in EXTRACT_MODES:
+    raise ValueError(f"EXTRACT_MODE must be one of {EXTRACT_MODES}, got {extract_mode!r}")
+watermark_expr = watermark_expression(get_optional_arg("WATERMARK_COLUMNS", DEFAULT_WATERMARK_COLUMNS))
+snapshot_buckets = int(get_optional_arg("SNAPSHOT_BUCKETS", DEFAULT_SNAPSHOT_BUCKETS))
+# Kept outside the snapshot prefix, which a full run overwrites
+state_path = get_optional_arg("WATERMARK_S3_PATH", snapshot_path.rstrip("/") + "_watermark.json")
+# Optional: the changed active users of an incremental run, on their own
+# (e.g. the 'changed' channel of a warm-started retrain)
+delta_path = get_optional_arg("DELTA_S3_PATH", "")
+
+s3 = boto3.client("s3")
+if extract_mode == "incremental" and not re.search(r"\bu\.", watermark_expr):
+    print(f"WARNING: the watermark {watermark_expr} has no column of public.users: "
+          "deactivated users are only removed by a full extraction")
+state = read_state(s3, state_path)
+if extract_mode == "incremental":
+    if state is None:
+        print("No saved watermark: running a full extraction")
+        extract_mode = "full"
+    elif state.get("watermark_expression") != watermark_expr or state.get("snapshot_buckets") != snapshot_buckets:
+        print(f"Watermark configuration changed since the last run ({state}): running a full extraction")
+        extract_mode = "full"
+    elif state.get("watermark") is None:
+        print("The saved watermark is empty: running a full extraction")
+        extract_mode = "full"
+
 # SQL to extract and join data from Redshift
 # This query should be customized to join user and CRM data
-sql_query = """
-SELECT 
+base_query = """
+SELECT
     u.user_id,
     u.age,
     u.gender,
     c.total_spend,
     c.last_purchase_date,
-    c.product_category
-FROM 
+    c.product_category{extra_columns}
+FROM
     public.users u
-JOIN 
+JOIN
     public.crm_data c ON u.user_id = c.user_id
-WHERE 
-    u.is_active = TRUE;
+WHERE
+    {condition};
 """
 
-# Read data from Redshift using the specified connection
-redshift_data = glueContext.create_dynamic_frame.from_options(
-    connection_type="redshift",
-    connection_options={
-        "redshiftTmpDir": args['TEMP_S3_DIR'],
-        "useConnectionProperties": "true",
-        "connectionName": args['REDSHIFT_CONNECTION_NAME'],
-        "query": sql_query
-    }
-)
-
-print(f"Data extracted from Redshift. Count: {redshift_data.count()}")
-redshift_data.printSchema()
-
-# Write the data to S3 in Parquet format for SageMaker
-# Parquet is efficient for ML workloads
-glueContext.write_dynamic_frame.from_options(
-    frame=redshift_data,
-    connection_type="s3",
-    connection_options={
-        "path": args['OUTPUT_S3_PATH'],
-        "partitionKeys": []
-    },
-    format="parquet"
-)
-
-print(f"Successfully wrote data to {args['OUTPUT_S3_PATH']}")
+# High watermark first, computed in Redshift (one row comes back)
+high_watermark = read_redshift(
+    f"SELECT MAX({watermark_expr}) AS watermark "
+    f"FROM public.users u JOIN public.crm_data c ON u.user_id = c.user_id"
+).collect()[0]["watermark"]
+if hasattr(high_watermark, "hour"):
+    high_watermark = high_watermark.strftime("%Y-%m-%d %H:%M:%S.%f")
+elif high_watermark is not None:
+    high_watermark = high_watermark.isoformat()
+
+# Spark evaluates the extraction once, while writing it: there is no count()
+# of the whole frame beforehand, which would run the full join a second time.
+if extract_mode == "full":
+    users = read_redshift(base_query.format(extra_columns="", condition="u.is_active = TRUE"))
+    users.printSchema()
+    with_bucket(users, snapshot_buckets).write.mode("overwrite").partitionBy(BUCKET_COLUMN).parquet(snapshot_path)
+    print(f"Wrote the full feature snapshot to {snapshot_path} ({snapshot_buckets} buckets)")
+    if delta_path:
+        # Every active user is new to this snapshot: the delta is the whole
+        # snapshot (copied from it, not extracted from Redshift a second time)
+        spark.read.parquet(snapshot_path).drop(BUCKET_COLUMN).write.mode("overwrite").parquet(delta_path)
+        print(f"Wrote every active user to {delta_path}")
+else:
+    # Inactive users are extracted too, so that deactivated users leave the
+    # snapshot (those whose deactivation moved the watermark, see above)
+    changed = read_redshift(base_query.format(
+        extra_columns=",\n    u.is_active",
+        condition=f"{watermark_expr} >= {watermark_literal(state['watermark'])}"
+    ))
+    changed = with_bucket(changed, snapshot_buckets).cache()   # Read from Redshift once, used three times below
+    changed_buckets = sorted(row[BUCKET_COLUMN] for row in changed.select(BUCKET_COLUMN).distinct().collect())
+    print(f"Users changed since {state['watermark']}: {len(changed_buckets)} of {snapshot_buckets} buckets touched")
+
+    active_changes = changed.where(F.col("is_active")).drop("is_active")
+    if changed_buckets:
+        # Only the touched buckets are read (partition pruning) and rewritten
+        # (dynamic partition overwrite); every other bucket is left as it is.
+        existing = spark.read.parquet(snapshot_path).where(F.col(BUCKET_COLUMN).isin(changed_buckets))
+        merged = (
+            existing.join(changed.select("user_id"), "user_id", "left_anti")
+            .unionByName(active_changes)
+        )
+        # The merge reads the partitions it overwrites: checkpoint it (to S3) first
+        checkpoint_path = f"{args['TEMP_S3_DIR'].rstrip('/')}/ml-data-prep-checkpoints/{uuid.uuid4().hex}/"
+        sc.setCheckpointDir(checkpoint_path)
+        merged = merged.checkpoint(eager=True)
+        spark.conf.set("spark.sql.sources.partitionOverwriteMode", "dynamic")
+        merged.write.mode("overwrite").partitionBy(BUCKET_COLUMN).parquet(snapshot_path)
+        print(f"Merged the changed users into buckets {changed_buckets} of {snapshot_path}")
+        # The dynamic overwrite only replaces the buckets it writes rows to: a
+        # bucket emptied entirely by deactivations would keep its previous files
+        written_buckets = {row[BUCKET_COLUMN] for row in merged.select(BUCKET_COLUMN).distinct().collect()}
+        for bucket in sorted(set(changed_buckets) - written_buckets):
+            bucket_path = f"{snapshot_path}{BUCKET_COLUMN}={bucket}/"
+            print(f"Bucket {bucket} has no active user left: deleted {delete_prefix(s3, bucket_path)} "
+                  f"object(s) under {bucket_path}")
+        print(f"Deleted {delete_prefix(s3, checkpoint_path)} checkpoint object(s) under {checkpoint_path}")
+    if delta_path:
+        # Written even when empty (and by full runs too), so that it never
+        # holds a previous run's changes
+        active_changes.drop(BUCKET_COLUMN).write.mode("overwrite").parquet(delta_path)
+        print(f"Wrote the changed active users to {delta_path}")
+    changed.unpersist()
+
+# The next run extracts from the watermark read before this extraction
+write_state(s3, state_path, {
+    "watermark": high_watermark if high_watermark is not None else (state or {}).get("watermark"),
+    "watermark_expression": watermark_expr,
+    "snapshot_buckets": snapshot_buckets,
+    "mode": extract_mode,
+    "updated_at": datetime.now(timezone.utc).isoformat(),
+})
+print(f"Watermark {high_watermark} saved to {state_path}")
 
 job.commit()
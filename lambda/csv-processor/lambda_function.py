@@ -1,40 +1,110 @@
-import boto3
 import os
 import logging
 
+from utils.manifest import files_from_event, batch_files, new_manifest_path, write_manifest
+from utils.ledger import IngestionLedger, S3LedgerStore
+from utils.s3_archive import S3Archiver
+# Shared layer: clients cached across warm invocations
+from warm_cache import get_client
+
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-glue = boto3.client('glue')
+glue = get_client('glue')
+s3 = get_client('s3')
+
+# Files started per Glue job run. Every record of the event (or of an SQS batch
+# collected over the event source's batching window) is grouped into manifests
+# of at most this many files, and one job run is started per manifest.
+MAX_FILES_PER_BATCH = int(os.environ.get('MAX_FILES_PER_BATCH', '500'))
+
+# Optional ingestion ledger shared with the Glue job (its LEDGER_S3_PATH). When
+# set, files whose content (ETag) was already loaded into LEDGER_TARGET_TABLE
+# are moved to the 'processed' directory of their bucket, as the Glue job does
+# with them, and no job run is started for them. The Glue job additionally
+# checks the table's schema version; this check accepts entries of any version.
+LEDGER_S3_PATH = os.environ.get('LEDGER_S3_PATH', '')
+LEDGER_TARGET_TABLE = os.environ.get('LEDGER_TARGET_TABLE', '')
+
+def archive_duplicates(duplicates):
+    """Moves already loaded files to 'processed/' (a failed move is only logged)."""
+    if not duplicates:
+        return
+    moved, failed = S3Archiver(s3).move(
+        [f['s3_path'] for f in duplicates],
+        'processed',
+        sizes={f['s3_path']: f['size'] for f in duplicates if f.get('size') is not None}
+    )
+    for s3_path, dest_path in moved.items():
+        logger.info(f"Skipping already loaded file: {s3_path} (moved to {dest_path})")
+    for s3_path, error in failed.items():
+        logger.warning(f"Skipping already loaded file: {s3_path} (failed to move it: {error})")
 
 def lambda_handler(event, context):
     """
-    Triggers a Glue job to process a CSV file uploaded to S3.
+    Triggers Glue job runs to process the CSV files uploaded to S3.
+    Accepts S3 notifications directly or wrapped in SQS messages.
     """
     try:
-        # Get the bucket name and key from the S3 event
-        bucket_name = event['Records'][0]['s3']['bucket']['name']
-        s3_key = event['Records'][0]['s3']['object']['key']
+        files = files_from_event(event)
+        if not files:
+            logger.info("No S3 object records found in the event.")
+            return {
+                'statusCode': 200,
+                'body': "No files to process"
+            }
+
+        skipped_files, skipped_bytes = 0, 0
+        if LEDGER_S3_PATH and LEDGER_TARGET_TABLE:
+            ledger = IngestionLedger(S3LedgerStore(LEDGER_S3_PATH, s3))
+            # Records without an ETag cannot be matched and are always loaded
+            unidentified = [f for f in files if not f['etag']]
+            files, duplicates = ledger.partition(
+                LEDGER_TARGET_TABLE, [f for f in files if f['etag']]
+            )
+            files += unidentified
+            skipped_files, skipped_bytes = ledger.skipped_files, ledger.skipped_bytes
+            archive_duplicates(duplicates)
+            if not files:
+                return {
+                    'statusCode': 200,
+                    'body': f"All {skipped_files} file(s) were already loaded",
+                    'skippedFiles': skipped_files,
+                    'skippedBytes': skipped_bytes
+                }
 
         glue_job_name = os.environ['GLUE_JOB_NAME']
+        job_run_ids = []
 
-        logger.info(f"Starting Glue job '{glue_job_name}' for file 's3://{bucket_name}/{s3_key}'")
+        for batch in batch_files(files, MAX_FILES_PER_BATCH):
+            if len(batch) == 1:
+                # A single file is passed directly, as before
+                arguments = {'--S3_SOURCE_PATH': batch[0]['s3_path']}
+            else:
+                bucket_name = batch[0]['s3_path'].split('/')[2]
+                manifest_prefix = os.environ.get('MANIFEST_S3_PREFIX', f's3://{bucket_name}/manifests/')
+                manifest_path = write_manifest(new_manifest_path(manifest_prefix), batch, s3)
+                arguments = {'--S3_MANIFEST_PATH': manifest_path}
 
-        # Start the Glue job
-        response = glue.start_job_run(
-            JobName=glue_job_name,
-            Arguments={
-                '--S3_SOURCE_PATH': f's3://{bucket_name}/{s3_key}'
-            }
-        )
+            logger.info(f"Starting Glue job '{glue_job_name}' for {len(batch)} file(s): {arguments}")
+
+            # Start the Glue job
+            response = glue.start_job_run(
+                JobName=glue_job_name,
+                Arguments=arguments
+            )
+            job_run_ids.append(response['JobRunId'])
 
-        logger.info(f"Successfully started Glue job with run ID: {response['JobRunId']}")
+            logger.info(f"Successfully started Glue job with run ID: {response['JobRunId']}")
 
         return {
             'statusCode': 200,
-            'body': f"Successfully started Glue job '{glue_job_name}'"
+            'body': f"Successfully started {len(job_run_ids)} run(s) of Glue job '{glue_job_name}' for {len(files)} file(s)",
+            'jobRunIds': job_run_ids,
+            'skippedFiles': skipped_files,
+            'skippedBytes': skipped_bytes
         }
 
     except Exception as e:
         logger.error(f"Error starting Glue job: {e}")
-        raise e
\ No newline at end of file
+        raise e
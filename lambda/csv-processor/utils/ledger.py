@@ -0,0 +1,173 @@
+# lambda/csv-processor/utils/ledger.py
+
+import hashlib
+import json
+from datetime import datetime, timezone
+
+import boto3
+
+# --- Ingestion Ledger ---
+# Records which file contents were loaded into which table, so that repeated
+# S3 events and re-uploads of byte-identical files are not loaded again.
+# An entry is keyed by target table and content ID ('etag:<ETag>', or
+# 'sha256:<digest>' when content hashes are used), and remembers the schema
+# version of the table it was loaded into: a file counts as already loaded
+# only for that same schema version, so changing the table allows a reload.
+# Stores: SQLiteLedgerStore (local stand-in), S3LedgerStore (shared between
+# runs); any object with get(key) / put(key, entry) can be plugged in.
+# Shared by the csv-processor Lambda (as 'utils.ledger') and the Glue jobs
+# (as a flat 'ledger' module added to the Job's 'Python files').
+
+CONTENT_ID_METHODS = ("etag", "sha256")
+HASH_BLOCK_SIZE = 8 * 1024 * 1024
+
+
+class SQLiteLedgerStore:
+    """Persistent store keeping the ledger in a local SQLite database."""
+
+    def __init__(self, path):
+        import sqlite3  # Only this local store needs it; the Lambda uses S3LedgerStore
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS ingestion_ledger (key TEXT PRIMARY KEY, entry TEXT NOT NULL)"
+            )
+
+    def get(self, key):
+        row = self.connection.execute(
+            "SELECT entry FROM ingestion_ledger WHERE key = ?", (key,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, key, entry):
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO ingestion_ledger (key, entry) VALUES (?, ?)",
+                (key, json.dumps(entry)),
+            )
+
+
+class S3LedgerStore:
+    """Persistent store keeping one JSON object per ledger entry under an S3 prefix."""
+
+    def __init__(self, s3_path, s3_client=None):
+        self.bucket, _, prefix = s3_path.replace("s3://", "", 1).partition("/")
+        self.prefix = prefix.rstrip("/")
+        self.s3 = s3_client or boto3.client("s3")
+
+    def _key(self, key):
+        return f"{self.prefix}/{key}.json" if self.prefix else f"{key}.json"
+
+    def get(self, key):
+        try:
+            obj = self.s3.get_object(Bucket=self.bucket, Key=self._key(key))
+        except self.s3.exceptions.NoSuchKey:
+            return None
+        return json.loads(obj["Body"].read())
+
+    def put(self, key, entry):
+        self.s3.put_object(
+            Bucket=self.bucket,
+            Key=self._key(key),
+            Body=json.dumps(entry).encode("utf-8"),
+            ContentType="application/json",
+        )
+
+
+def schema_version(columns):
+    """Returns a short fingerprint of a table's (column_name, data_type) pairs ('new' if none)."""
+    if not columns:
+        return "new"
+    text = ",".join(f"{name.lower()}:{data_type}" for name, data_type in columns)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+def content_id(source_file, method="etag"):
+    """Returns the content ID of a described manifest file entry."""
+    if method == "sha256":
+        return f"sha256:{source_file['sha256']}"
+    return f"etag:{source_file['etag'].strip(chr(34))}"
+
+
+def describe_file(s3_client, source_file, method="etag"):
+    """
+    Returns a copy of a manifest file entry with 'size' and 'etag' filled in
+    (HEAD request when the event did not carry them) and, for the 'sha256'
+    method, the digest of the content (streamed, so it reads the whole file).
+    """
+    if method not in CONTENT_ID_METHODS:
+        raise ValueError(f"Unknown content ID method: {method}")
+    described = dict(source_file)
+    bucket, _, key = source_file["s3_path"].replace("s3://", "", 1).partition("/")
+    if not described.get("etag") or described.get("size") is None:
+        head = s3_client.head_object(Bucket=bucket, Key=key)
+        described["etag"] = head["ETag"]
+        described["size"] = head["ContentLength"]
+    if method == "sha256" and not described.get("sha256"):
+        digest = hashlib.sha256()
+        body = s3_client.get_object(Bucket=bucket, Key=key)["Body"]
+        for block in iter(lambda: body.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+        described["sha256"] = digest.hexdigest()
+    return described
+
+
+class IngestionLedger:
+    """Tracks loaded file contents per target table; counts what it lets callers skip."""
+
+    def __init__(self, store, method="etag"):
+        if method not in CONTENT_ID_METHODS:
+            raise ValueError(f"Unknown content ID method: {method}")
+        self.store = store
+        self.method = method
+        self.skipped_files = 0
+        self.skipped_bytes = 0
+
+    def entry_key(self, target_table, file_content_id):
+        # Keys are usable as file names and S3 key segments
+        return f"{target_table.lower()}/{file_content_id.replace(':', '-')}"
+
+    def find(self, target_table, source_file):
+        """Returns the ledger entry of a described file, or None if it was never loaded."""
+        return self.store.get(self.entry_key(target_table, content_id(source_file, self.method)))
+
+    def is_loaded(self, target_table, source_file, version=None):
+        """
+        Whether a described file was already loaded into the table, under the
+        given schema version (or under any version when 'version' is None).
+        """
+        entry = self.find(target_table, source_file)
+        return entry is not None and version in (None, entry["schema_version"])
+
+    def partition(self, target_table, source_files, version=None):
+        """
+        Splits described files into (files to load, already loaded files) and
+        adds the already loaded ones to the skipped counters. Files with the
+        same content within the batch are loaded once.
+        """
+        to_load, duplicates, seen = [], [], set()
+        for source_file in source_files:
+            file_content_id = content_id(source_file, self.method)
+            if file_content_id in seen or self.is_loaded(target_table, source_file, version):
+                duplicates.append(source_file)
+                self.skipped_files += 1
+                self.skipped_bytes += source_file.get("size") or 0
+            else:
+                seen.add(file_content_id)
+                to_load.append(source_file)
+        return to_load, duplicates
+
+    def record(self, target_table, source_file, version):
+        """Records a described file as loaded into the table under a schema version."""
+        file_content_id = content_id(source_file, self.method)
+        self.store.put(
+            self.entry_key(target_table, file_content_id),
+            {
+                "target_table": target_table,
+                "content_id": file_content_id,
+                "schema_version": version,
+                "s3_path": source_file["s3_path"],
+                "size": source_file.get("size"),
+                "loaded_at": datetime.now(timezone.utc).isoformat(),
+            },
+        )
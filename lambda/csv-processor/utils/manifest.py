@@ -0,0 +1,107 @@
+# lambda/csv-processor/utils/manifest.py
+
+import json
+import uuid
+from datetime import datetime, timezone
+from urllib.parse import unquote_plus
+
+import boto3
+
+# --- Ingestion Manifests ---
+# A manifest lists the CSV files that one csv-to-redshift Glue job run loads:
+#   {"version": 1, "created_at": "...",
+#    "files": [{"s3_path", "size", "etag", "event_time"}, ...]}
+# Written by the csv-processor Lambda (as 'utils.manifest'), read by the Glue
+# job (as a flat 'manifest' module added to the Job's 'Python files').
+
+MANIFEST_VERSION = 1
+
+
+def split_s3_path(s3_path):
+    """Splits 's3://bucket/key' into (bucket, key)."""
+    bucket, _, key = s3_path.replace("s3://", "", 1).partition("/")
+    return bucket, key
+
+
+def iter_s3_event_records(event):
+    """
+    Yields the S3 records of a Lambda event, whether it is a direct S3
+    notification or an SQS batch whose message bodies are S3 notifications.
+    """
+    for record in event.get("Records", []):
+        if record.get("eventSource") == "aws:sqs":
+            body = json.loads(record["body"])
+            # S3 sends an 's3:TestEvent' without 'Records' when the queue is configured
+            yield from body.get("Records", [])
+        elif "s3" in record:
+            yield record
+
+
+def files_from_event(event):
+    """Returns the manifest file entries of every object in an event, without duplicates."""
+    files = {}
+    for record in iter_s3_event_records(event):
+        bucket = record["s3"]["bucket"]["name"]
+        # Keys in S3 notifications are URL-encoded (e.g. spaces as '+')
+        key = unquote_plus(record["s3"]["object"]["key"])
+        s3_path = f"s3://{bucket}/{key}"
+        files[s3_path] = {
+            "s3_path": s3_path,
+            "size": record["s3"]["object"].get("size"),
+            "etag": record["s3"]["object"].get("eTag"),
+            "event_time": record.get("eventTime"),
+        }
+    return list(files.values())
+
+
+def batch_files(files, max_files_per_batch):
+    """Splits file entries into batches of at most 'max_files_per_batch'."""
+    return [
+        files[start:start + max_files_per_batch]
+        for start in range(0, len(files), max_files_per_batch)
+    ]
+
+
+def new_manifest_path(manifest_prefix):
+    """Returns a unique manifest location under an 's3://bucket/prefix/'."""
+    timestamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    return f"{manifest_prefix.rstrip('/')}/{timestamp}-{uuid.uuid4().hex}.json"
+
+
+def write_manifest(manifest_path, files, s3_client=None):
+    """Writes a manifest listing 'files' to S3 and returns its path."""
+    s3_client = s3_client or boto3.client("s3")
+    bucket, key = split_s3_path(manifest_path)
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "files": files,
+    }
+    s3_client.put_object(
+        Bucket=bucket,
+        Key=key,
+        Body=json.dumps(manifest).encode("utf-8"),
+        ContentType="application/json",
+    )
+    return manifest_path
+
+
+def read_manifest(manifest_path, s3_client=None):
+    """Reads a manifest from S3 and returns its file entries."""
+    s3_client = s3_client or boto3.client("s3")
+    bucket, key = split_s3_path(manifest_path)
+    manifest = json.loads(s3_client.get_object(Bucket=bucket, Key=key)["Body"].read())
+    return manifest["files"]
+
+
+def resolve_source_files(source_path="", source_paths="", manifest_path="", s3_client=None):
+    """
+    Returns the file entries a job run should load, from (in order of precedence)
+    a manifest, a comma-separated list of paths, or a single path.
+    """
+    if manifest_path:
+        return read_manifest(manifest_path, s3_client)
+    paths = [path.strip() for path in source_paths.split(",") if path.strip()]
+    if not paths and source_path:
+        paths = [source_path]
+    return [{"s3_path": path, "size": None, "etag": None, "event_time": None} for path in paths]
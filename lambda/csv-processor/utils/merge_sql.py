@@ -0,0 +1,46 @@
+# lambda/csv-processor/utils/merge_sql.py
+
+# --- Staging Table Merge Statements ---
+# SQL that merges a staging table into its target table on the primary key:
+#   'delete_in'   - DELETE ... WHERE pk IN (SELECT pk FROM staging) + INSERT
+#   'delete_join' - DELETE ... USING staging (join-based delete) + INSERT
+#   'merge'       - a single MERGE statement; a table whose only column is the
+#                   primary key has nothing to update, so it is merged with
+#                   'delete_join' instead
+# The statements of one merge are meant to run as one transaction (one
+# batch_execute_statement call).
+# Shared by the csv-processor utils (as 'utils.merge_sql') and the Glue jobs
+# (as a flat 'merge_sql' module added to the Job's 'Python files').
+
+MERGE_STRATEGIES = ("delete_in", "delete_join", "merge")
+
+
+def build_merge_statements(merge_strategy, target_table, staging_table, primary_key, columns):
+    """Returns the statements that merge the staging table into the target table."""
+    update_set = ", ".join(
+        f'"{col}" = {staging_table}."{col}"'
+        for col in columns
+        if col.lower() != primary_key.lower()
+    )
+    if merge_strategy == "merge" and update_set:
+        insert_columns = ", ".join(f'"{col}"' for col in columns)
+        insert_values = ", ".join(f'{staging_table}."{col}"' for col in columns)
+        return [
+            f"""MERGE INTO {target_table} USING {staging_table}
+        ON {target_table}."{primary_key}" = {staging_table}."{primary_key}"
+        WHEN MATCHED THEN UPDATE SET {update_set}
+        WHEN NOT MATCHED THEN INSERT ({insert_columns}) VALUES ({insert_values});"""
+        ]
+
+    insert_statement = f"INSERT INTO {target_table} SELECT * FROM {staging_table};"
+    if merge_strategy in ("delete_join", "merge"):
+        return [
+            f"""DELETE FROM {target_table} USING {staging_table}
+        WHERE {target_table}."{primary_key}" = {staging_table}."{primary_key}";""",
+            insert_statement,
+        ]
+    return [
+        f"""DELETE FROM {target_table}
+        WHERE "{primary_key}" IN (SELECT "{primary_key}" FROM {staging_table});""",
+        insert_statement,
+    ]
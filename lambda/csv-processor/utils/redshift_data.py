@@ -0,0 +1,143 @@
+# lambda/csv-processor/utils/redshift_data.py
+
+import time
+
+import boto3
+
+# --- Redshift Data API Client ---
+# Shared by the csv-processor Lambda (as 'utils.redshift_data') and the Glue
+# jobs (as a flat 'redshift_data' module added to the Job's 'Python files').
+# Statements are submitted asynchronously and polled with an adaptive backoff:
+# short statements finish after a few fast polls, long ones are polled less
+# and less often instead of once per second.
+
+POLL_INITIAL_DELAY = 0.05   # Seconds before the first status check
+POLL_MAX_DELAY = 2.0        # Upper bound for the delay between status checks
+POLL_BACKOFF = 1.5          # Delay multiplier after each unfinished poll
+STATEMENT_TIMEOUT = 300     # Seconds to wait for a statement (5 minutes)
+
+FINISHED_STATUSES = ("FINISHED",)
+FAILED_STATUSES = ("FAILED", "ABORTED")
+
+
+def field_value(field):
+    """Converts a Data API field (e.g. {'stringValue': 'x'}) to a Python value."""
+    if field.get("isNull"):
+        return None
+    for key in ("stringValue", "longValue", "doubleValue", "booleanValue", "blobValue"):
+        if key in field:
+            return field[key]
+    return None
+
+
+class RedshiftDataClient:
+    """
+    Thin wrapper around the 'redshift-data' client bound to one cluster,
+    database and user.
+    """
+
+    def __init__(self, cluster_id, database, db_user, client=None,
+                 poll_initial_delay=POLL_INITIAL_DELAY, poll_max_delay=POLL_MAX_DELAY,
+                 poll_backoff=POLL_BACKOFF, timeout=STATEMENT_TIMEOUT, sleep=time.sleep):
+        self.cluster_id = cluster_id
+        self.database = database
+        self.db_user = db_user
+        self.client = client or boto3.client("redshift-data")
+        self.poll_initial_delay = poll_initial_delay
+        self.poll_max_delay = poll_max_delay
+        self.poll_backoff = poll_backoff
+        self.timeout = timeout
+        self.sleep = sleep
+        self.api_calls = 0  # Data API requests sent, for monitoring
+
+    def _connection_args(self):
+        return {
+            "ClusterIdentifier": self.cluster_id,
+            "Database": self.database,
+            "DbUser": self.db_user,
+        }
+
+    def submit(self, sql):
+        """Starts a statement without waiting for it; returns the statement ID."""
+        self.api_calls += 1
+        return self.client.execute_statement(Sql=sql, **self._connection_args())["Id"]
+
+    def submit_batch(self, sqls):
+        """Starts several statements as one transaction; returns the statement ID."""
+        self.api_calls += 1
+        return self.client.batch_execute_statement(Sqls=list(sqls), **self._connection_args())["Id"]
+
+    def wait_all(self, statement_ids):
+        """
+        Polls all statements until they finish, sharing one backoff schedule.
+        Returns their describe_statement responses in the order given.
+        """
+        pending = list(statement_ids)
+        results = {}
+        delay = self.poll_initial_delay
+        deadline = time.monotonic() + self.timeout
+
+        while pending:
+            self.sleep(delay)
+            for statement_id in list(pending):
+                self.api_calls += 1
+                status_response = self.client.describe_statement(Id=statement_id)
+                status = status_response["Status"]
+                if status in FINISHED_STATUSES:
+                    results[statement_id] = status_response
+                    pending.remove(statement_id)
+                elif status in FAILED_STATUSES:
+                    error_msg = status_response.get("Error", "Unknown error")
+                    raise Exception(f"Redshift query failed: {error_msg}")
+
+            if pending and time.monotonic() > deadline:
+                raise Exception(f"Query timeout after {self.timeout} seconds")
+            delay = min(delay * self.poll_backoff, self.poll_max_delay)
+
+        return [results[statement_id] for statement_id in statement_ids]
+
+    def wait(self, statement_id):
+        """Polls one statement until it finishes; returns its describe_statement response."""
+        return self.wait_all([statement_id])[0]
+
+    def execute(self, sql):
+        """Executes a SQL statement and waits for completion."""
+        self.wait(self.submit(sql))
+        print(f"Successfully executed query: {sql[:80]}...")
+        return True
+
+    def execute_batch(self, sqls):
+        """
+        Executes several statements with a single batch_execute_statement call.
+        They run serially in one transaction, so no BEGIN/COMMIT is needed.
+        """
+        sqls = list(sqls)
+        if not sqls:
+            return True
+        self.wait(self.submit_batch(sqls))
+        print(f"Successfully executed {len(sqls)} statements in one batch.")
+        return True
+
+    def fetch(self, sql):
+        """Executes a query and returns its rows as lists of Python values."""
+        statement_id = self.submit(sql)
+        self.wait(statement_id)
+        return self.fetch_results(statement_id)
+
+    def fetch_results(self, statement_id):
+        """Returns the rows of a finished statement (e.g. one polled by wait_all)."""
+        rows = []
+        kwargs = {"Id": statement_id}
+        while True:
+            self.api_calls += 1
+            response = self.client.get_statement_result(**kwargs)
+            rows.extend([field_value(field) for field in record] for record in response["Records"])
+            if not response.get("NextToken"):
+                return rows
+            kwargs["NextToken"] = response["NextToken"]
+
+    def get_table_columns(self, table_name):
+        """Returns (column_name, data_type) pairs of a table; empty if it doesn't exist."""
+        query = f"""SELECT column_name, data_type FROM information_schema.columns
+               WHERE table_name = '{table_name.lower()}' ORDER BY ordinal_position;"""
+        return [(row[0], row[1]) for row in self.fetch(query)]
@@ -1,9 +1,20 @@
 import boto3
 
+from utils.redshift_data import RedshiftDataClient
+
 redshift_data = boto3.client('redshift-data')
 
-def execute_redshift_query(cluster_id, database, db_user, sql_query):
-    """Executes a query on a Redshift cluster using the Data API."""
+def get_redshift_data_client(cluster_id, database, db_user):
+    """Returns a RedshiftDataClient that reuses this module's 'redshift-data' client."""
+    return RedshiftDataClient(cluster_id, database, db_user, client=redshift_data)
+
+def execute_redshift_query(cluster_id, database, db_user, sql_query, wait=False):
+    """
+    Executes a query on a Redshift cluster using the Data API and returns the
+    execute_statement response. With wait=True, blocks until the statement
+    finishes (adaptive backoff polling) and returns its describe_statement
+    response instead.
+    """
     try:
         response = redshift_data.execute_statement(
             ClusterIdentifier=cluster_id,
@@ -11,7 +22,9 @@ def execute_redshift_query(cluster_id, database, db_user, sql_query):
             DbUser=db_user,
             Sql=sql_query
         )
+        if wait:
+            return get_redshift_data_client(cluster_id, database, db_user).wait(response['Id'])
         return response
     except Exception as e:
         print(f"Error executing Redshift query: {e}")
-        raise e
\ No newline at end of file
+        raise e
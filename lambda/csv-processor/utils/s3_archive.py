@@ -0,0 +1,144 @@
+# lambda/csv-processor/utils/s3_archive.py
+
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+
+# --- S3 File Archival ---
+# Moves batches of S3 objects (e.g. loaded files to 'processed/', failed ones
+# to 'error/') with one reused client:
+#   1. server-side copies run concurrently; objects above the single-request
+#      CopyObject limit (5 GB) are copied as multipart uploads, part by part
+#      with UploadPartCopy
+#   2. sources of successful copies are deleted with DeleteObjects, up to 1000
+#      keys per request
+# A source is only deleted once its copy exists, so a failed move leaves the
+# original in place.
+# Shared by the csv-processor utils (as 'utils.s3_archive') and the Glue jobs
+# (as a flat 's3_archive' module added to the Job's 'Python files').
+
+MAX_SINGLE_COPY_BYTES = 5 * 1024 ** 3   # CopyObject limit
+MAX_DELETE_KEYS = 1000                  # DeleteObjects limit
+MAX_PARTS = 10000                       # Multipart upload limit
+MIN_PART_SIZE = 5 * 1024 ** 2
+DEFAULT_PART_SIZE = 512 * 1024 ** 2
+DEFAULT_MAX_WORKERS = 16
+
+
+def split_s3_path(s3_path):
+    """Splits 's3://bucket/key' into (bucket, key)."""
+    bucket, _, key = s3_path.replace("s3://", "", 1).partition("/")
+    return bucket, key
+
+
+def archive_key(source_key, directory):
+    """Returns the key of a file moved to a directory ('processed' -> 'processed/<file name>')."""
+    return f"{directory.strip('/')}/{source_key.split('/')[-1]}"
+
+
+def plan_parts(size, part_size=DEFAULT_PART_SIZE):
+    """Returns the (first byte, last byte) ranges of a multipart copy of 'size' bytes."""
+    part_size = max(part_size, MIN_PART_SIZE, -(-size // MAX_PARTS))
+    return [(start, min(start + part_size, size) - 1) for start in range(0, size, part_size)]
+
+
+class S3Archiver:
+    """Moves S3 objects in batches: concurrent (multipart when needed) copies, batched deletes."""
+
+    def __init__(self, s3_client=None, max_workers=DEFAULT_MAX_WORKERS,
+                 multipart_threshold=MAX_SINGLE_COPY_BYTES, part_size=DEFAULT_PART_SIZE):
+        self.s3 = s3_client or boto3.client("s3")
+        self.max_workers = max_workers
+        self.multipart_threshold = multipart_threshold
+        self.part_size = part_size
+
+    def copy(self, bucket, source_key, dest_key, size=None):
+        """Copies an object within a bucket, as a multipart copy above the threshold."""
+        if size is None:
+            size = self.s3.head_object(Bucket=bucket, Key=source_key)["ContentLength"]
+        copy_source = {"Bucket": bucket, "Key": source_key}
+        if size <= self.multipart_threshold:
+            self.s3.copy_object(Bucket=bucket, Key=dest_key, CopySource=copy_source)
+            return
+
+        upload_id = self.s3.create_multipart_upload(Bucket=bucket, Key=dest_key)["UploadId"]
+        try:
+            def copy_part(numbered_range):
+                part_number, (first, last) = numbered_range
+                response = self.s3.upload_part_copy(
+                    Bucket=bucket,
+                    Key=dest_key,
+                    UploadId=upload_id,
+                    PartNumber=part_number,
+                    CopySource=copy_source,
+                    CopySourceRange=f"bytes={first}-{last}",
+                )
+                return {"PartNumber": part_number, "ETag": response["CopyPartResult"]["ETag"]}
+
+            parts = list(enumerate(plan_parts(size, self.part_size), start=1))
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(parts))) as executor:
+                completed = list(executor.map(copy_part, parts))
+            self.s3.complete_multipart_upload(
+                Bucket=bucket,
+                Key=dest_key,
+                UploadId=upload_id,
+                MultipartUpload={"Parts": completed},
+            )
+        except Exception:
+            self.s3.abort_multipart_upload(Bucket=bucket, Key=dest_key, UploadId=upload_id)
+            raise
+
+    def delete(self, bucket, keys):
+        """Deletes keys of a bucket in DeleteObjects batches; returns {key: error} of failed deletes."""
+        failed = {}
+        for start in range(0, len(keys), MAX_DELETE_KEYS):
+            batch = keys[start:start + MAX_DELETE_KEYS]
+            response = self.s3.delete_objects(
+                Bucket=bucket,
+                Delete={"Objects": [{"Key": key} for key in batch], "Quiet": True},
+            )
+            for error in response.get("Errors", []):
+                failed[error["Key"]] = f"{error.get('Code')}: {error.get('Message')}"
+        return failed
+
+    def move(self, s3_paths, directory, sizes=None):
+        """
+        Moves objects into 'directory' of their bucket, keeping their file name.
+        'sizes' ({s3_path: size}, optional) saves a HEAD request per object.
+        Returns ({source path: destination path} of moved objects,
+                 {source path: error} of objects that were not moved).
+        """
+        sizes = sizes or {}
+
+        def copy_one(s3_path):
+            bucket, source_key = split_s3_path(s3_path)
+            dest_key = archive_key(source_key, directory)
+            try:
+                self.copy(bucket, source_key, dest_key, sizes.get(s3_path))
+                return s3_path, f"s3://{bucket}/{dest_key}", None
+            except Exception as e:
+                return s3_path, None, str(e)
+
+        moved, failed = {}, {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for s3_path, dest_path, error in executor.map(copy_one, s3_paths):
+                if error is None:
+                    moved[s3_path] = dest_path
+                else:
+                    failed[s3_path] = f"copy failed: {error}"
+
+        keys_by_bucket = {}
+        for s3_path in moved:
+            bucket, source_key = split_s3_path(s3_path)
+            keys_by_bucket.setdefault(bucket, []).append(source_key)
+        for bucket, keys in keys_by_bucket.items():
+            try:
+                delete_errors = self.delete(bucket, keys)
+            except Exception as e:
+                delete_errors = {key: str(e) for key in keys}
+            for key, error in delete_errors.items():
+                s3_path = f"s3://{bucket}/{key}"
+                # The copy exists but the source remains; report it as not moved
+                moved.pop(s3_path, None)
+                failed[s3_path] = f"delete failed: {error}"
+        return moved, failed
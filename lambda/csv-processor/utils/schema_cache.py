@@ -0,0 +1,95 @@
+# lambda/csv-processor/utils/schema_cache.py
+
+import json
+import time
+
+import boto3
+
+# --- Redshift Table Schema Cache ---
+# Caches the (column_name, data_type) pairs of target tables so that loading
+# many small files into the same table does not query information_schema for
+# each of them. Entries expire after a TTL and must be invalidated explicitly
+# whenever the caller itself changes a table (CREATE / ALTER).
+# Layers: an in-process dict, backed by an optional persistent store shared
+# between job runs (S3SchemaStore). 'hits' / 'misses' count the lookups.
+# Shared by the csv-processor Lambda (as 'utils.schema_cache') and the Glue
+# jobs (as a flat 'schema_cache' module added to the Job's 'Python files').
+
+DEFAULT_TTL_SECONDS = 3600
+
+
+def cache_key(table_name):
+    return table_name.lower()
+
+
+class S3SchemaStore:
+    """Persistent store keeping one JSON object per table under an S3 prefix."""
+
+    def __init__(self, s3_path, s3_client=None):
+        self.bucket, _, prefix = s3_path.replace("s3://", "", 1).partition("/")
+        self.prefix = prefix.rstrip("/")
+        self.s3 = s3_client or boto3.client("s3")
+
+    def _key(self, key):
+        return f"{self.prefix}/{key}.json" if self.prefix else f"{key}.json"
+
+    def get(self, key):
+        try:
+            obj = self.s3.get_object(Bucket=self.bucket, Key=self._key(key))
+        except self.s3.exceptions.NoSuchKey:
+            return None
+        return json.loads(obj["Body"].read())
+
+    def put(self, key, entry):
+        self.s3.put_object(
+            Bucket=self.bucket,
+            Key=self._key(key),
+            Body=json.dumps(entry).encode("utf-8"),
+            ContentType="application/json",
+        )
+
+    def delete(self, key):
+        self.s3.delete_object(Bucket=self.bucket, Key=self._key(key))
+
+
+class SchemaCache:
+    """Table schema cache with TTL, in-process first, then the persistent store."""
+
+    def __init__(self, store=None, ttl_seconds=DEFAULT_TTL_SECONDS, clock=time.time):
+        self.store = store
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self._entries = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _fresh(self, entry):
+        return entry is not None and self.clock() - entry["cached_at"] < self.ttl_seconds
+
+    def get(self, table_name):
+        """Returns the cached columns of a table, or None if unknown or expired."""
+        key = cache_key(table_name)
+        entry = self._entries.get(key)
+        if not self._fresh(entry) and self.store is not None:
+            entry = self.store.get(key)
+            if self._fresh(entry):
+                self._entries[key] = entry
+        if self._fresh(entry):
+            self.hits += 1
+            return [tuple(column) for column in entry["columns"]]
+        self.misses += 1
+        return None
+
+    def put(self, table_name, columns):
+        key = cache_key(table_name)
+        entry = {"columns": [list(column) for column in columns], "cached_at": self.clock()}
+        self._entries[key] = entry
+        if self.store is not None:
+            self.store.put(key, entry)
+
+    def invalidate(self, table_name):
+        """Drops a table from every layer; call after CREATE / ALTER on it."""
+        key = cache_key(table_name)
+        self._entries.pop(key, None)
+        if self.store is not None:
+            self.store.delete(key)
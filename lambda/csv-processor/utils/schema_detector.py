@@ -1,18 +1,186 @@
-import boto3
-import pandas as pd
+import io
+from concurrent.futures import ThreadPoolExecutor
 
-def detect_schema_from_s3_csv(bucket, key):
-    """Detects the schema of a CSV file in S3 using pandas."""
+# Shared layer: the S3 client is created once per container, not per call
+from warm_cache import get_client
+
+# pandas (also pulled in by utils.type_inference) is imported by the functions
+# that parse data, so importing this module stays cheap for the handler
+
+# pandas dtype names reported in 'type' for each inferred kind (other kinds are 'object')
+PANDAS_DTYPES = {'integer': 'int64', 'decimal': 'float64', None: 'float64'}
+
+# Range-read detection: bytes read from the head of the file, and from each of
+# the sampled ranges spread over the rest of it (the last one ends at the tail)
+DEFAULT_HEAD_BYTES = 1024 * 1024
+DEFAULT_RANGE_BYTES = 256 * 1024
+DEFAULT_SAMPLE_RANGES = 2
+
+def schema_from_inferrer(inferrer):
+    """Returns the schema columns ({'name', 'type', 'redshift_type', 'nullable'}) of a TypeInferrer."""
+    schema = []
+    for column, stats in inferrer.columns.items():
+        dtype = PANDAS_DTYPES.get(stats.kind, 'object')
+        if dtype == 'int64' and stats.null_count:
+            dtype = 'float64'   # pandas reads integer columns with missing values as float64
+        schema.append({
+            'name': column,
+            'type': dtype,
+            'redshift_type': stats.redshift_type(),
+            'nullable': stats.null_count > 0
+        })
+    return schema
+
+def detect_schema_from_s3_csv(bucket, key, mode='full', sample_size=10000, max_workers=4):
+    """
+    Detects the schema of a CSV file in S3, streaming it in chunks through the
+    shared type inference engine ('mode' is 'full', 'reservoir' or 'head').
+    Each column reports its pandas-style 'type', 'redshift_type' and 'nullable'.
+    """
+    from utils.type_inference import infer_types
     try:
-        s3 = boto3.client('s3')
+        s3 = get_client('s3')
         obj = s3.get_object(Bucket=bucket, Key=key)
-        df = pd.read_csv(obj['Body'])
-        
-        schema = []
-        for column, dtype in df.dtypes.items():
-            schema.append({'name': column, 'type': str(dtype)})
-            
-        return schema
+        inferrer = infer_types(obj['Body'], mode=mode, sample_size=sample_size, max_workers=max_workers)
+        return schema_from_inferrer(inferrer)
+    except Exception as e:
+        print(f"Error detecting schema: {e}")
+        raise e
+
+# --- Range-read schema detection ---
+
+def plan_sample_ranges(file_size, head_bytes, range_bytes, sample_ranges):
+    """
+    Returns the (start, end) byte ranges (end exclusive) to read after the head:
+    'sample_ranges' ranges spread evenly over the rest of the file, the last one
+    ending at the end of the file. Ranges never overlap the head or each other.
+    """
+    ranges = []
+    previous_end = head_bytes
+    remaining = file_size - head_bytes
+    for i in range(1, sample_ranges + 1):
+        end = head_bytes + remaining * i // sample_ranges
+        start = max(end - range_bytes, previous_end)
+        if start < end:
+            ranges.append((start, end))
+        previous_end = end
+    return ranges
+
+def read_s3_range(s3, bucket, key, start, end):
+    """Reads bytes [start, end) of an S3 object with a ranged GET."""
+    obj = s3.get_object(Bucket=bucket, Key=key, Range=f'bytes={start}-{end - 1}')
+    return obj['Body'].read()
+
+def complete_lines(data, starts_mid_row, ends_mid_row):
+    """
+    Trims a byte range to whole lines: the partial first line of a range that
+    starts inside the file, and the partial last line of a range that does not
+    reach its end. Returns the remaining bytes (possibly empty).
+    """
+    if starts_mid_row:
+        newline = data.find(b'\n')
+        data = data[newline + 1:] if newline >= 0 else b''
+    if ends_mid_row:
+        newline = data.rfind(b'\n')
+        data = data[:newline + 1] if newline >= 0 else b''
+    return data
+
+def parse_range(header, data, max_workers):
+    """
+    Classifies the rows of a range (prefixed with the header) with the shared
+    type inference engine. Rows with a wrong field count, e.g. a quoted value
+    spanning a range boundary, are skipped.
+    Returns (TypeInferrer, number of rows parsed).
+    """
+    import pandas as pd
+    from utils.type_inference import TypeInferrer
+    chunk = pd.read_csv(
+        io.BytesIO(header + data),
+        dtype=str,
+        keep_default_na=False,
+        on_bad_lines='skip'
+    )
+    return TypeInferrer(max_workers=max_workers).update(chunk), len(chunk)
+
+def detect_schema_from_s3_ranges(bucket, key, head_bytes=DEFAULT_HEAD_BYTES, range_bytes=DEFAULT_RANGE_BYTES,
+                                 sample_ranges=DEFAULT_SAMPLE_RANGES, max_workers=4, s3=None):
+    """
+    Detects the schema of a CSV file in S3 from a few ranged GETs (the head,
+    plus 'sample_ranges' ranges from the middle and tail), so the cost depends
+    on the sample size, not the file size. Returns:
+      columns             - schema columns, as detect_schema_from_s3_csv, each
+                            with a 'confidence': the share of sampled ranges
+                            holding values of the column whose own type agrees
+                            with the detected one (1.0 when the file was read whole)
+      estimated_row_count - data rows, from the mean size of the sampled rows
+                            (exact when the file was read whole)
+      exact               - True when the whole file was read
+      sampled_rows, bytes_read, file_size
+    """
+    import pandas as pd
+    from utils.type_inference import TypeInferrer
+    try:
+        s3 = s3 or get_client('s3')
+        file_size = s3.head_object(Bucket=bucket, Key=key)['ContentLength']
+        if not file_size:
+            raise Exception(f"s3://{bucket}/{key} is empty")
+        head_end = min(head_bytes, file_size)
+        ranges = [(0, head_end)] + plan_sample_ranges(file_size, head_end, range_bytes, sample_ranges)
+
+        with ThreadPoolExecutor(max_workers=len(ranges)) as executor:
+            blocks = list(executor.map(lambda r: read_s3_range(s3, bucket, key, *r), ranges))
+        bytes_read = sum(len(block) for block in blocks)
+
+        head = blocks[0]
+        newline = head.find(b'\n')
+        if newline < 0 and head_end < file_size:
+            raise Exception(f"Header row of s3://{bucket}/{key} is longer than {head_bytes} bytes")
+        header = head[:newline + 1] if newline >= 0 else head + b'\n'
+        exact = head_end == file_size
+
+        # Columns come from the header, even those without any sampled value
+        inferrer = TypeInferrer(max_workers=max_workers)
+        inferrer.update(pd.read_csv(io.BytesIO(header), dtype=str, nrows=0))
+        range_inferrers = []
+        sampled_rows = sampled_row_bytes = 0
+        for (start, end), block in zip(ranges, blocks):
+            data = head[len(header):] if start == 0 else block
+            data = complete_lines(data, starts_mid_row=start > 0, ends_mid_row=end < file_size)
+            if not data.strip():
+                continue
+            range_inferrer, rows = parse_range(header, data, max_workers)
+            inferrer.merge(range_inferrer)
+            range_inferrers.append(range_inferrer)
+            sampled_rows += rows
+            sampled_row_bytes += len(data)
+
+        if exact:
+            estimated_row_count = sampled_rows
+        elif sampled_rows:
+            estimated_row_count = round((file_size - len(header)) * sampled_rows / sampled_row_bytes)
+        else:
+            estimated_row_count = None
+
+        columns = schema_from_inferrer(inferrer)
+        for column in columns:
+            kinds = [
+                r.columns[column['name']].kind for r in range_inferrers
+                if column['name'] in r.columns and r.columns[column['name']].kind is not None
+            ]
+            detected_kind = inferrer.columns[column['name']].kind
+            if exact or not kinds:
+                column['confidence'] = 1.0 if exact else 0.0
+            else:
+                column['confidence'] = round(sum(kind == detected_kind for kind in kinds) / len(kinds), 3)
+
+        return {
+            'columns': columns,
+            'estimated_row_count': estimated_row_count,
+            'exact': exact,
+            'sampled_rows': sampled_rows,
+            'bytes_read': bytes_read,
+            'file_size': file_size
+        }
     except Exception as e:
         print(f"Error detecting schema: {e}")
-        raise e
\ No newline at end of file
+        raise e
@@ -0,0 +1,270 @@
+# lambda/csv-processor/utils/type_inference.py
+
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+# --- Redshift Type Inference ---
+# Infers Redshift column types from CSV data, reading it in chunks so memory
+# stays bounded. Every chunk is classified with vectorized pandas operations,
+# one column per worker thread, and the per-column results are merged with a
+# monotonic widening rule: a type only ever gets wider, never narrower.
+#   SMALLINT -> INTEGER -> BIGINT -> DECIMAL(p,s) -> VARCHAR(n)
+#   DATE -> TIMESTAMP -> VARCHAR(n)
+# Mixing the numeric and date/time families widens to VARCHAR(n), with n the
+# measured maximum length in bytes, rounded up.
+# Shared by the csv-processor utils (as 'utils.type_inference') and the Glue
+# jobs (as a flat 'type_inference' module added to the Job's 'Python files').
+
+DEFAULT_CHUNK_SIZE = 100000
+DEFAULT_SAMPLE_SIZE = 10000
+DEFAULT_TYPE = "VARCHAR(256)"   # Used for columns without any value
+MAX_VARCHAR_LENGTH = 65535
+MAX_DECIMAL_PRECISION = 38
+# Integers with more digits are not range-checked (min_int/max_int stay unset)
+# and become DECIMAL(n,0), whatever the other chunks held
+MAX_RANGED_INT_DIGITS = 18
+
+# Sampling modes: 'full' classifies every row, 'reservoir' a uniform random
+# sample of 'sample_size' rows of the whole file, 'head' the first rows only.
+SAMPLING_MODES = ("full", "reservoir", "head")
+
+INTEGER_RANGES = (
+    ("SMALLINT", -32768, 32767),
+    ("INTEGER", -2147483648, 2147483647),
+    ("BIGINT", -9223372036854775808, 9223372036854775807),
+)
+
+INTEGER_PATTERN = r"[+-]?\d+"
+DECIMAL_PATTERN = r"[+-]?(?:\d+\.?\d*|\.\d+)"
+DATETIME_PATTERN = (
+    r"(\d{4}-\d{2}-\d{2})(?:[ T](\d{2}):(\d{2})(?::(\d{2})(?:\.\d+)?)?)?"
+)
+
+# Widening order within each family; kinds from different families widen to 'varchar'
+NUMERIC_KINDS = ("integer", "decimal")
+TEMPORAL_KINDS = ("date", "timestamp")
+
+
+def widen_kind(left, right):
+    """Returns the narrowest kind that can hold values of both kinds."""
+    if left is None:
+        return right
+    if right is None or left == right:
+        return left
+    for family in (NUMERIC_KINDS, TEMPORAL_KINDS):
+        if left in family and right in family:
+            return family[max(family.index(left), family.index(right))]
+    return "varchar"
+
+
+class ColumnStats:
+    """Mergeable per-column statistics from which a Redshift type is derived."""
+
+    def __init__(self):
+        self.kind = None        # None (no values yet), or one of the kinds above
+        self.count = 0          # Non-null values seen
+        self.null_count = 0
+        self.min_int = None
+        self.max_int = None
+        self.int_digits = 0     # Max digits before the decimal point
+        self.scale = 0          # Max digits after the decimal point
+        self.max_length = 0     # Max value length in UTF-8 bytes
+
+    def merge(self, other):
+        self.kind = widen_kind(self.kind, other.kind)
+        self.count += other.count
+        self.null_count += other.null_count
+        if other.min_int is not None:
+            self.min_int = other.min_int if self.min_int is None else min(self.min_int, other.min_int)
+            self.max_int = other.max_int if self.max_int is None else max(self.max_int, other.max_int)
+        self.int_digits = max(self.int_digits, other.int_digits)
+        self.scale = max(self.scale, other.scale)
+        self.max_length = max(self.max_length, other.max_length)
+        return self
+
+    def redshift_type(self):
+        if self.kind is None:
+            return DEFAULT_TYPE
+        if self.kind == "integer":
+            if self.int_digits <= MAX_RANGED_INT_DIGITS and self.min_int is not None:
+                for type_name, low, high in INTEGER_RANGES:
+                    if low <= self.min_int and self.max_int <= high:
+                        return type_name
+            if self.int_digits <= MAX_DECIMAL_PRECISION:
+                return f"DECIMAL({self.int_digits},0)"
+        if self.kind == "decimal":
+            precision = max(self.int_digits + self.scale, 1)
+            if precision <= MAX_DECIMAL_PRECISION:
+                return f"DECIMAL({precision},{self.scale})"
+        if self.kind == "date":
+            return "DATE"
+        if self.kind == "timestamp":
+            return "TIMESTAMP"
+        return f"VARCHAR({varchar_length(self.max_length)})"
+
+
+def varchar_length(max_length):
+    """Rounds a measured byte length up to the next power of two (at least 16)."""
+    length = 16
+    while length < max_length:
+        length *= 2
+    return min(length, MAX_VARCHAR_LENGTH)
+
+
+def valid_datetimes(values):
+    """
+    Classifies string values as dates or timestamps.
+    Returns (is_date, is_timestamp) boolean arrays; both False means neither.
+    """
+    parts = values.str.extract(f"^{DATETIME_PATTERN}$")
+    has_date = parts[0].notna() & pd.to_datetime(parts[0], format="%Y-%m-%d", errors="coerce").notna()
+    has_time = parts[1].notna()
+    hours = pd.to_numeric(parts[1], errors="coerce")
+    minutes = pd.to_numeric(parts[2], errors="coerce")
+    seconds = pd.to_numeric(parts[3], errors="coerce").fillna(0)
+    valid_time = (hours < 24) & (minutes < 60) & (seconds < 60)
+    is_date = (has_date & ~has_time).to_numpy()
+    is_timestamp = (has_date & has_time & valid_time).to_numpy()
+    return is_date, is_timestamp
+
+
+def classify_values(values):
+    """Computes ColumnStats for a Series of CSV string values (vectorized)."""
+    stats = ColumnStats()
+    values = values.astype(str).where(values.notna(), "").str.strip()
+    present = values != ""
+    stats.null_count = int((~present).sum())
+    values = values[present]
+    stats.count = len(values)
+    if not stats.count:
+        return stats
+
+    stats.max_length = int(values.str.encode("utf-8").str.len().max())
+
+    is_integer = values.str.fullmatch(INTEGER_PATTERN)
+    if is_integer.all():
+        digits = values.str.lstrip("+-").str.lstrip("0").str.len()
+        stats.int_digits = max(int(digits.max()), 1)
+        stats.kind = "integer"
+        if stats.int_digits <= MAX_RANGED_INT_DIGITS:
+            numbers = values.astype(np.int64)
+            stats.min_int, stats.max_int = int(numbers.min()), int(numbers.max())
+        return stats
+
+    if values.str.fullmatch(DECIMAL_PATTERN).all():
+        unsigned = values.str.lstrip("+-")
+        integer_part = unsigned.str.split(".", n=1).str[0].str.lstrip("0")
+        fraction_part = unsigned.str.split(".", n=1).str[1].fillna("")
+        stats.int_digits = int(integer_part.str.len().max())
+        stats.scale = int(fraction_part.str.len().max())
+        stats.kind = "decimal"
+        return stats
+
+    is_date, is_timestamp = valid_datetimes(values)
+    if is_date.all():
+        stats.kind = "date"
+    elif (is_date | is_timestamp).all():
+        stats.kind = "timestamp"
+    else:
+        stats.kind = "varchar"
+    return stats
+
+
+class TypeInferrer:
+    """
+    Accumulates column statistics over chunks (DataFrames of strings) and
+    returns the inferred Redshift types. Chunks are classified one column per
+    worker thread; results from several files can be merged.
+    """
+
+    def __init__(self, max_workers=4):
+        self.max_workers = max_workers
+        self.columns = {}   # Column name -> ColumnStats, in first-seen order
+
+    def update(self, chunk):
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            results = executor.map(lambda col: (col, classify_values(chunk[col])), chunk.columns)
+            for column, stats in results:
+                self.columns.setdefault(column, ColumnStats()).merge(stats)
+        return self
+
+    def merge(self, other):
+        for column, stats in other.columns.items():
+            self.columns.setdefault(column, ColumnStats()).merge(stats)
+        return self
+
+    def redshift_types(self):
+        """Returns {column: Redshift type} in column order."""
+        return {column: stats.redshift_type() for column, stats in self.columns.items()}
+
+
+def iter_string_chunks(source, chunk_size=DEFAULT_CHUNK_SIZE, usecols=None):
+    """Reads a CSV (path or file-like) in chunks, keeping every value as a string."""
+    return pd.read_csv(
+        source,
+        dtype=str,
+        keep_default_na=False,
+        chunksize=chunk_size,
+        usecols=usecols,
+    )
+
+
+def reservoir_sample(chunks, sample_size, seed=None):
+    """
+    Returns a uniform random sample of 'sample_size' rows from a stream of
+    chunks (reservoir sampling), holding at most one chunk plus the sample.
+    Replacement slots are drawn for a whole chunk at once.
+    """
+    rng = np.random.default_rng(seed)
+    columns = None
+    reservoir = None    # 2-D object array of sampled rows
+    seen = 0
+    for chunk in chunks:
+        if columns is None:
+            columns = chunk.columns
+            reservoir = np.empty((0, len(columns)), dtype=object)
+        values = chunk.to_numpy(dtype=object)
+        missing = sample_size - len(reservoir)
+        if missing > 0:
+            reservoir = np.vstack([reservoir, values[:missing]])
+            seen += len(values[:missing])
+            values = values[missing:]
+        if not len(values):
+            continue
+        # Row i (1-based, over the whole stream) replaces slot j ~ U[0, i) if j < sample_size
+        row_numbers = np.arange(seen + 1, seen + len(values) + 1)
+        slots = (rng.random(len(values)) * row_numbers).astype(np.int64)
+        accepted = np.flatnonzero(slots < sample_size)
+        # Of several rows replacing the same slot, the last one in the stream wins
+        last_first = accepted[::-1]
+        replaced, winners = np.unique(slots[last_first], return_index=True)
+        reservoir[replaced] = values[last_first[winners]]
+        seen += len(values)
+    if columns is None:
+        return pd.DataFrame()
+    return pd.DataFrame(reservoir, columns=columns)
+
+
+def infer_types(source, mode="full", chunk_size=DEFAULT_CHUNK_SIZE,
+                sample_size=DEFAULT_SAMPLE_SIZE, usecols=None, max_workers=4):
+    """
+    Infers types of a CSV (path or file-like) and returns a TypeInferrer.
+    'mode' is one of SAMPLING_MODES; 'usecols' limits inference to some columns.
+    """
+    if mode not in SAMPLING_MODES:
+        raise ValueError(f"Unknown sampling mode: {mode}")
+    inferrer = TypeInferrer(max_workers=max_workers)
+    if mode == "head":
+        chunk_size = min(chunk_size, sample_size)
+    chunks = iter_string_chunks(source, chunk_size=chunk_size, usecols=usecols)
+
+    if mode == "reservoir":
+        inferrer.update(reservoir_sample(chunks, sample_size))
+    elif mode == "head":
+        inferrer.update(next(iter(chunks), pd.DataFrame()))
+    else:
+        for chunk in chunks:
+            inferrer.update(chunk)
+    return inferrer
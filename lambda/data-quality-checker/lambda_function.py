@@ -1,13 +1,28 @@
+import os
 import json
-import boto3
-import csv
-from io import StringIO
 
 # Import data quality rules
 # Note: This import assumes the rules are in the same package or accessible
-from rules.quality_rules import get_python_rules
+from rules.quality_rules import get_python_rules, get_batch_rules
+from rules.engine import (
+    check_csv_stream,
+    check_csv_stream_vectorized,
+    open_s3_csv,
+    build_check_response,
+    DEFAULT_CHUNK_SIZE,
+    DEFAULT_MAX_ERROR_DETAILS,
+)
+# Shared layer: clients cached across warm invocations
+from warm_cache import get_client
 
-s3_client = boto3.client('s3')
+s3_client = get_client('s3')
+
+# Records are checked in bounded chunks and only a capped number of error
+# details is returned. Both can be overridden per invocation through the event.
+CHUNK_SIZE = int(os.environ.get('CHUNK_SIZE', DEFAULT_CHUNK_SIZE))
+MAX_ERROR_DETAILS = int(os.environ.get('MAX_ERROR_DETAILS', DEFAULT_MAX_ERROR_DETAILS))
+# 'vectorized' runs rules over column blocks, 'record' runs them once per record
+RULE_EXECUTION_MODE = os.environ.get('RULE_EXECUTION_MODE', 'vectorized')
 
 def lambda_handler(event, context):
     print("Lambda function invoked with event:", event)
@@ -32,51 +47,46 @@ def lambda_handler(event, context):
             'details': [{'error_type': 'INVALID_S3_PATH_FORMAT', 'description': f'Invalid S3 path format: {s3_path}'}]
         }
 
-    all_python_errors = []
-    
+    chunk_size = int(event.get('chunk_size', CHUNK_SIZE))
+    max_error_details = int(event.get('max_error_details', MAX_ERROR_DETAILS))
+    execution_mode = event.get('rule_execution_mode', RULE_EXECUTION_MODE)
+    # Optional {'start', 'end'} byte range when the Glue job fans out a large file
+    byte_range = event.get('byte_range')
+
     try:
-        # Read data from S3
-        response = s3_client.get_object(Bucket=bucket_name, Key=key)
-        csv_content = response['Body'].read().decode('utf-8')
-        
-        # Process CSV content
+        # Stream data from S3: the body is decoded incrementally and checked
+        # chunk by chunk, so the file is never held in memory as a whole.
         # Assuming CSV has a header row
-        reader = csv.DictReader(StringIO(csv_content))
-        records = list(reader) # Convert to list of dictionaries for easier processing
-        
-        print(f"Successfully read {len(records)} records from {s3_path}")
+        body = open_s3_csv(s3_client, bucket_name, key, byte_range)
+
+        if execution_mode == 'vectorized':
+            # Get the Python data quality rules in their batch form
+            records_checked, collector = check_csv_stream_vectorized(
+                body,
+                get_batch_rules(),
+                source_s3_path=s3_path,
+                chunk_size=chunk_size,
+                max_error_details=max_error_details,
+            )
+        else:
+            # Get all Python data quality rules
+            records_checked, collector = check_csv_stream(
+                body,
+                get_python_rules(),
+                source_s3_path=s3_path,
+                chunk_size=chunk_size,
+                max_error_details=max_error_details,
+            )
 
-        # Get all Python data quality rules
-        python_rules = get_python_rules()
+        print(f"Successfully checked {records_checked} records from {s3_path}"
+              + (f" (bytes {byte_range['start']}-{byte_range['end']})" if byte_range else ""))
 
-        # Apply each Python rule to each record
-        for i, record in enumerate(records):
-            # Add a record identifier for error reporting if not present
-            record_identifier = record.get('id', f'row_{i+1}') # Use 'id' or row number
-            
-            for rule_func in python_rules:
-                error = rule_func(record)
-                if error:
-                    # Augment error with record identifier and source info
-                    error['record_identifier'] = record_identifier
-                    error['source_s3_path'] = s3_path
-                    error['rule_name'] = rule_func.__name__ # Add rule function name
-                    all_python_errors.append(error)
-        
-        if all_python_errors:
-            print(f"Found {len(all_python_errors)} Python data quality issues.")
-            return {
-                'status': 'FAILED',
-                'errors_found': True,
-                'details': all_python_errors
-            }
+        if collector.total:
+            print(f"Found {collector.total} Python data quality issues "
+                  f"({len(collector.details)} details returned).")
         else:
             print("No Python data quality issues found.")
-            return {
-                'status': 'SUCCESS',
-                'errors_found': False,
-                'details': []
-            }
+        return build_check_response(records_checked, collector)
 
     except Exception as e:
         print(f"Error processing data from S3 or applying Python rules: {e}")
@@ -0,0 +1,280 @@
+# lambda/data-quality-checker/rules/engine.py
+
+import codecs
+import csv
+import io
+from itertools import islice
+
+# --- Streaming Rule Engine ---
+# Applies Python data quality rules to a CSV byte stream in bounded chunks,
+# so memory stays flat regardless of the size of the input file.
+# Rules run either per record (dictionaries) or vectorized over column blocks
+# (pandas DataFrames, see BatchRule in quality_rules.py).
+# This module has no dependency on the rule definitions themselves; callers
+# pass the rules in. That keeps it importable both from the Lambda package
+# (as 'rules.engine') and from the Glue job (as a flat 'engine' module).
+# numpy and pandas are only imported by the vectorized path, so the per-record
+# path (and the Lambda's cold start) does not load them.
+
+DEFAULT_CHUNK_SIZE = 10000          # Records checked per chunk
+DEFAULT_MAX_ERROR_DETAILS = 1000    # Error dictionaries kept for the response
+READ_BLOCK_SIZE = 1024 * 1024       # Bytes read from the stream at a time
+HEADER_RANGE_BYTES = 64 * 1024      # Bytes fetched to find the header of a ranged shard
+
+
+def iter_text_lines(byte_stream, encoding='utf-8', block_size=READ_BLOCK_SIZE):
+    """
+    Incrementally decodes a binary stream (e.g. an S3 StreamingBody) and yields
+    text lines, keeping the trailing newline so the csv module can handle
+    quoted fields that span several lines.
+    """
+    decoder = codecs.getincrementaldecoder(encoding)()
+    pending = ''
+    while True:
+        block = byte_stream.read(block_size)
+        if not block:
+            break
+        pending += decoder.decode(block)
+        lines = pending.split('\n')
+        pending = lines.pop()  # Last piece is an incomplete line
+        for line in lines:
+            yield line + '\n'
+    pending += decoder.decode(b'', final=True)
+    if pending:
+        yield pending
+
+
+def iter_byte_lines(byte_stream, block_size=READ_BLOCK_SIZE):
+    """
+    Yields raw lines (including b'\\n') from a binary stream. Splitting on bytes
+    is safe for UTF-8 since b'\\n' never occurs inside a multi-byte character.
+    """
+    pending = b''
+    while True:
+        block = byte_stream.read(block_size)
+        if not block:
+            break
+        pending += block
+        lines = pending.split(b'\n')
+        pending = lines.pop()
+        for line in lines:
+            yield line + b'\n'
+    if pending:
+        yield pending
+
+
+class ByteRangeShard(io.RawIOBase):
+    """
+    Read-only stream over the lines of a CSV byte range, prefixed with the header.
+
+    'byte_stream' must start at byte 'start' of the object. Line ownership follows
+    the usual split convention: a shard skips the (partial) line it starts in,
+    unless it starts at byte 0, and owns every line that starts at or before
+    'end'. Adjacent shards therefore read every line exactly once. Quoted fields
+    containing newlines must not straddle a shard boundary.
+    """
+
+    def __init__(self, byte_stream, start, end, header=b''):
+        self._chunks = self._iter_shard_bytes(byte_stream, start, end, header)
+        self._buffer = b''
+
+    @staticmethod
+    def _iter_shard_bytes(byte_stream, start, end, header):
+        if header:
+            yield header
+        position = start
+        lines = iter_byte_lines(byte_stream)
+        if start > 0:
+            position += len(next(lines, b''))
+        for line in lines:
+            if position > end:
+                break
+            yield line
+            position += len(line)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._buffer:
+            try:
+                self._buffer = next(self._chunks)
+            except StopIteration:
+                return 0
+        size = min(len(buffer), len(self._buffer))
+        buffer[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return size
+
+
+def read_header_line(s3_client, bucket, key):
+    """Fetches the first line (the CSV header) of an S3 object with a ranged GET."""
+    response = s3_client.get_object(Bucket=bucket, Key=key, Range=f'bytes=0-{HEADER_RANGE_BYTES - 1}')
+    head = response['Body'].read()
+    header, newline, _ = head.partition(b'\n')
+    if not newline:
+        raise ValueError(f'No CSV header found in the first {HEADER_RANGE_BYTES} bytes of s3://{bucket}/{key}')
+    return header + newline
+
+
+def open_s3_csv(s3_client, bucket, key, byte_range=None):
+    """
+    Opens an S3 CSV object for streaming. With a byte_range ({'start', 'end'}),
+    only the lines owned by that range are returned, prefixed with the header.
+    """
+    if not byte_range:
+        return s3_client.get_object(Bucket=bucket, Key=key)['Body']
+
+    start, end = int(byte_range['start']), int(byte_range['end'])
+    header = read_header_line(s3_client, bucket, key) if start > 0 else b''
+    # Open-ended range: the body is streamed, so only what is read gets downloaded
+    body = s3_client.get_object(Bucket=bucket, Key=key, Range=f'bytes={start}-')['Body']
+    return io.BufferedReader(ByteRangeShard(body, start, end, header), buffer_size=READ_BLOCK_SIZE)
+
+
+def iter_csv_records(byte_stream, encoding='utf-8'):
+    """Yields CSV rows as dictionaries, assuming the first row is a header."""
+    return csv.DictReader(iter_text_lines(byte_stream, encoding=encoding))
+
+
+def iter_chunks(iterable, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Groups an iterable into lists of at most 'chunk_size' items."""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class ErrorCollector:
+    """
+    Counts every error reported by the rules but keeps at most 'max_details'
+    error dictionaries, so a badly broken file cannot blow up the response payload.
+    """
+
+    def __init__(self, max_details=DEFAULT_MAX_ERROR_DETAILS):
+        self.max_details = max_details
+        self.details = []
+        self.total = 0
+        self.counts_by_rule = {}
+
+    def add(self, error):
+        self.total += 1
+        rule_name = error.get('rule_name', 'Python_Rule')
+        self.counts_by_rule[rule_name] = self.counts_by_rule.get(rule_name, 0) + 1
+        if len(self.details) < self.max_details:
+            self.details.append(error)
+
+    def add_batch(self, rule_name, count, errors):
+        """Counts 'count' errors for a rule; 'errors' holds the details built for them."""
+        self.total += count
+        self.counts_by_rule[rule_name] = self.counts_by_rule.get(rule_name, 0) + count
+        self.details.extend(errors[:self.remaining])
+
+    @property
+    def remaining(self):
+        """How many more error details can be kept."""
+        return max(self.max_details - len(self.details), 0)
+
+    @property
+    def truncated(self):
+        return self.total > len(self.details)
+
+
+def apply_rules_to_chunk(records, rules, collector, start_index=0, source_s3_path=None):
+    """Applies each per-record rule to each record of a chunk."""
+    for offset, record in enumerate(records):
+        # Use 'id' or the row number (1-based, across the whole file) for error reporting
+        record_identifier = record.get('id', f'row_{start_index + offset + 1}')
+
+        for rule_func in rules:
+            error = rule_func(record)
+            if error:
+                # Augment error with record identifier and source info
+                error['record_identifier'] = record_identifier
+                error['source_s3_path'] = source_s3_path
+                error['rule_name'] = rule_func.__name__
+                collector.add(error)
+
+
+def iter_csv_blocks(byte_stream, encoding='utf-8', chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Parses a CSV stream into DataFrame blocks of at most 'chunk_size' rows.
+    Values are kept as strings (empty fields as ''), like csv.DictReader.
+    An empty stream yields no blocks, as csv.DictReader yields no records.
+    """
+    import pandas as pd
+    try:
+        return pd.read_csv(
+            byte_stream,
+            chunksize=chunk_size,
+            dtype=str,
+            keep_default_na=False,
+            encoding=encoding,
+        )
+    except pd.errors.EmptyDataError:
+        return iter(())
+
+
+def apply_batch_rules_to_block(block, batch_rules, collector, start_index=0, source_s3_path=None):
+    """
+    Applies each batch rule to a column block. Rules return violation masks;
+    error details are only built for violating rows while the collector has room.
+    """
+    import numpy as np
+    for rule in batch_rules:
+        violations = np.flatnonzero(rule.mask(block))
+        if not len(violations):
+            continue
+
+        errors = []
+        for position in violations[:collector.remaining]:
+            record = block.iloc[position].to_dict()
+            error = rule.error(record) or {'error_type': 'PYTHON_DQ_ERROR'}
+            error['record_identifier'] = record.get('id', f'row_{start_index + position + 1}')
+            error['source_s3_path'] = source_s3_path
+            error['rule_name'] = rule.name
+            errors.append(error)
+        collector.add_batch(rule.name, len(violations), errors)
+
+
+def check_csv_stream(byte_stream, rules, source_s3_path=None, encoding='utf-8',
+                     chunk_size=DEFAULT_CHUNK_SIZE, max_error_details=DEFAULT_MAX_ERROR_DETAILS):
+    """
+    Streams CSV records from 'byte_stream' and checks them chunk by chunk.
+    Returns a tuple of (records_checked, ErrorCollector).
+    """
+    collector = ErrorCollector(max_details=max_error_details)
+    records_checked = 0
+    for chunk in iter_chunks(iter_csv_records(byte_stream, encoding=encoding), chunk_size):
+        apply_rules_to_chunk(chunk, rules, collector, records_checked, source_s3_path)
+        records_checked += len(chunk)
+    return records_checked, collector
+
+
+def check_csv_stream_vectorized(byte_stream, batch_rules, source_s3_path=None, encoding='utf-8',
+                                chunk_size=DEFAULT_CHUNK_SIZE, max_error_details=DEFAULT_MAX_ERROR_DETAILS):
+    """
+    Vectorized counterpart of check_csv_stream: parses the stream into column
+    blocks and runs batch rules on them. Returns (records_checked, ErrorCollector).
+    """
+    collector = ErrorCollector(max_details=max_error_details)
+    records_checked = 0
+    for block in iter_csv_blocks(byte_stream, encoding=encoding, chunk_size=chunk_size):
+        apply_batch_rules_to_block(block, batch_rules, collector, records_checked, source_s3_path)
+        records_checked += len(block)
+    return records_checked, collector
+
+
+def build_check_response(records_checked, collector):
+    """Builds the data-quality-checker response for a finished check."""
+    return {
+        'status': 'FAILED' if collector.total else 'SUCCESS',
+        'errors_found': bool(collector.total),
+        'details': collector.details,
+        'records_checked': records_checked,
+        'error_count': collector.total,
+        'error_counts_by_rule': collector.counts_by_rule,
+        'details_truncated': collector.truncated,
+    }
@@ -0,0 +1,127 @@
+# lambda/data-quality-checker/rules/fanout.py
+
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+# --- Fan-out of Python Data Quality Checks ---
+# Splits an S3 input path into shards (one per object, or byte ranges for large
+# objects), runs the data-quality-checker Lambda on every shard concurrently and
+# merges the per-shard responses into a single response of the same shape.
+# Used by the Glue DQ job; importable as 'fanout' (Glue) or 'rules.fanout'.
+
+DEFAULT_SHARD_SIZE = 256 * 1024 * 1024   # Objects larger than this are split into byte ranges
+DEFAULT_MAX_WORKERS = 16                 # Concurrent Lambda invocations
+DEFAULT_MAX_ERROR_DETAILS = 1000         # Error details kept in the merged response
+
+
+def split_s3_path(s3_path):
+    """Splits 's3://bucket/prefix' into (bucket, prefix)."""
+    bucket, _, prefix = s3_path.replace('s3://', '', 1).partition('/')
+    return bucket, prefix
+
+
+def list_input_objects(s3_client, s3_path):
+    """Lists every non-empty object under an S3 path (recursively), with its size."""
+    bucket, prefix = split_s3_path(s3_path)
+    paginator = s3_client.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+        for obj in page.get('Contents', []):
+            if obj['Key'].endswith('/') or obj['Size'] == 0:
+                continue
+            yield bucket, obj['Key'], obj['Size']
+
+
+def plan_shards(s3_client, s3_path, shard_size=DEFAULT_SHARD_SIZE):
+    """
+    Returns the shards to check. Each shard is a dict with 's3_path' and, for
+    objects larger than 'shard_size', a 'byte_range' of {'start', 'end'}.
+    """
+    shards = []
+    for bucket, key, size in list_input_objects(s3_client, s3_path):
+        object_path = f's3://{bucket}/{key}'
+        if size <= shard_size:
+            shards.append({'s3_path': object_path, 'size': size})
+            continue
+        for start in range(0, size, shard_size):
+            end = min(start + shard_size, size)
+            shards.append({
+                's3_path': object_path,
+                'size': end - start,
+                'byte_range': {'start': start, 'end': end},
+            })
+    return shards
+
+
+def invoke_shard(lambda_client, function_name, shard, base_payload=None):
+    """Invokes the data-quality-checker Lambda for one shard and returns its response payload."""
+    payload = dict(base_payload or {})
+    payload['s3_path'] = shard['s3_path']
+    if shard.get('byte_range'):
+        payload['byte_range'] = shard['byte_range']
+
+    try:
+        response = lambda_client.invoke(
+            FunctionName=function_name,
+            InvocationType='RequestResponse',
+            Payload=json.dumps(payload),
+        )
+        response_payload = json.loads(response['Payload'].read().decode('utf-8'))
+        if response.get('FunctionError'):
+            raise RuntimeError(response_payload.get('errorMessage', response['FunctionError']))
+        return response_payload
+    except Exception as e:
+        return {
+            'status': 'FAILED',
+            'errors_found': True,
+            'details': [{
+                'error_type': 'LAMBDA_ERROR',
+                'description': f'Failed to invoke Lambda for Python DQ checks: {e}',
+                'source_s3_path': shard['s3_path'],
+                'byte_range': shard.get('byte_range'),
+            }],
+        }
+
+
+def invoke_shards(lambda_client, function_name, shards, base_payload=None, max_workers=DEFAULT_MAX_WORKERS):
+    """Invokes the Lambda for every shard concurrently; results keep the order of 'shards'."""
+    if not shards:
+        return []
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(shards))) as executor:
+        return list(executor.map(
+            lambda shard: invoke_shard(lambda_client, function_name, shard, base_payload),
+            shards,
+        ))
+
+
+def merge_shard_results(results, max_error_details=DEFAULT_MAX_ERROR_DETAILS):
+    """Merges per-shard responses into one response shaped like a single Lambda response."""
+    details = []
+    records_checked = 0
+    error_count = 0
+    error_counts_by_rule = {}
+    truncated = False
+
+    for result in results:
+        shard_details = result.get('details', [])
+        # Responses without 'error_count' are failures reported before any record was checked
+        shard_error_count = result.get('error_count', len(shard_details))
+        records_checked += result.get('records_checked', 0)
+        error_count += shard_error_count
+        for rule_name, count in result.get('error_counts_by_rule', {}).items():
+            error_counts_by_rule[rule_name] = error_counts_by_rule.get(rule_name, 0) + count
+        truncated = truncated or result.get('details_truncated', False)
+
+        room = max(max_error_details - len(details), 0)
+        details.extend(shard_details[:room])
+        truncated = truncated or len(shard_details) > room
+
+    return {
+        'status': 'FAILED' if error_count else 'SUCCESS',
+        'errors_found': bool(error_count),
+        'details': details,
+        'records_checked': records_checked,
+        'error_count': error_count,
+        'error_counts_by_rule': error_counts_by_rule,
+        'details_truncated': truncated,
+        'shards_checked': len(results),
+    }
@@ -1,17 +1,24 @@
 # lambda/data-quality-checker/rules/quality_rules.py
 
+from collections import namedtuple
+
 # --- SQL Data Quality Rules ---
 # These rules are executed by the AWS Glue Job using Spark SQL.
 # Key: Rule Name (for identification)
-# Value: Dictionary containing 'query', 'error_type', and 'description'
+# Value: Dictionary containing 'error_type', 'description' and either
+#   'predicate' - a row-level rule: the condition a bad row matches (its error
+#                 query is derived from it, see get_rule_query), or
+#   'query'     - any other rule (e.g. an aggregation): the full SQL query.
+# The Glue job fuses all predicates into a single scan that tags each row with
+# the rules it violates; rules without a predicate run their 'query' on their own.
 SQL_DATA_QUALITY_RULES = {
     "null_user_id_check": {
-        "query": "SELECT * FROM temp_data WHERE user_id IS NULL",
+        "predicate": "user_id IS NULL",
         "error_type": "NULL_USER_ID",
         "description": "Checks for records where 'user_id' is NULL."
     },
     "invalid_email_format_check": {
-        "query": "SELECT * FROM temp_data WHERE email NOT RLIKE '^[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\\.[A-Za-z]{2,}$'",
+        "predicate": "email NOT RLIKE '^[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\\.[A-Za-z]{2,}$'",
         "error_type": "INVALID_EMAIL_FORMAT",
         "description": "Checks for records where 'email' does not match a standard email regex pattern."
     },
@@ -29,12 +36,13 @@ SQL_DATA_QUALITY_RULES = {
 # and return a dictionary of error details if a problem is found,
 # or None if the record passes the check.
 
+VALID_PRODUCT_CATEGORIES = ["Electronics", "Books", "Clothing", "Home & Kitchen"]
+
 def check_product_category_valid(record):
     """
     Checks if the 'product_category' is one of the predefined valid categories.
     """
-    valid_categories = ["Electronics", "Books", "Clothing", "Home & Kitchen"]
-    if record.get('product_category') not in valid_categories:
+    if record.get('product_category') not in VALID_PRODUCT_CATEGORIES:
         return {
             "error_type": "INVALID_PRODUCT_CATEGORY",
             "description": f"Invalid product category: {record.get('product_category')}",
@@ -45,9 +53,14 @@ def check_product_category_valid(record):
 def check_price_positive(record):
     """
     Checks if the 'price' is a positive number.
+    CSV values arrive as strings, so numeric strings are parsed before comparing.
     """
     price = record.get('price')
-    if not isinstance(price, (int, float)) or price <= 0:
+    try:
+        price_value = float(price)
+    except (TypeError, ValueError):
+        price_value = None
+    if price_value is None or not price_value > 0: # 'not >' also catches NaN
         return {
             "error_type": "NON_POSITIVE_PRICE",
             "description": f"Price is not positive: {price}",
@@ -62,12 +75,74 @@ PYTHON_DATA_QUALITY_RULES = [
     # Add more Python rule functions here
 ]
 
+# --- Batch (Vectorized) Python Data Quality Rules ---
+# A batch rule receives a whole block of records as a pandas DataFrame (one
+# column per CSV field, values as strings) and returns a boolean NumPy mask
+# that is True for every violating row. Error details are only built for the
+# violating rows, by calling the matching per-record rule on them, so both
+# execution modes report identical errors.
+# 'name': Rule name, 'mask': block -> mask, 'error': record -> error details
+# numpy and pandas are imported inside the masks, so loading the rules (e.g.
+# for the per-record path or the SQL rules) does not load them.
+
+BatchRule = namedtuple('BatchRule', ['name', 'mask', 'error'])
+
+def product_category_invalid_mask(block):
+    """Vectorized form of check_product_category_valid."""
+    import numpy as np
+    if 'product_category' not in block.columns:
+        return np.ones(len(block), dtype=bool)
+    return ~block['product_category'].isin(VALID_PRODUCT_CATEGORIES).to_numpy()
+
+def price_not_positive_mask(block):
+    """Vectorized form of check_price_positive."""
+    import numpy as np
+    import pandas as pd
+    if 'price' not in block.columns:
+        return np.ones(len(block), dtype=bool)
+    prices = pd.to_numeric(block['price'], errors='coerce').to_numpy(dtype=float)
+    return ~(prices > 0) # NaN (unparseable or missing) compares False
+
+# Per-record rules that have a vectorized implementation
+VECTORIZED_RULE_MASKS = {
+    check_product_category_valid: product_category_invalid_mask,
+    check_price_positive: price_not_positive_mask,
+    # Add vectorized versions of Python rule functions here
+}
+
+def record_rule_mask(rule_func):
+    """Adapts a per-record rule to the batch interface by calling it on every row."""
+    def mask(block):
+        import numpy as np
+        return np.fromiter(
+            (rule_func(record) is not None for record in block.to_dict('records')),
+            dtype=bool,
+            count=len(block),
+        )
+    mask.__name__ = f"{rule_func.__name__}_mask"
+    return mask
+
+def as_batch_rule(rule_func):
+    """Returns the batch form of a per-record rule, vectorized when available."""
+    mask = VECTORIZED_RULE_MASKS.get(rule_func) or record_rule_mask(rule_func)
+    return BatchRule(name=rule_func.__name__, mask=mask, error=rule_func)
+
 # --- Helper Functions ---
 
 def get_sql_rules():
     """Returns the dictionary of SQL data quality rules."""
     return SQL_DATA_QUALITY_RULES
 
+def get_rule_query(rule_details, view_name="temp_data"):
+    """Returns the query selecting a SQL rule's bad records (derived from its predicate, if it has one)."""
+    if rule_details.get("predicate"):
+        return f"SELECT * FROM {view_name} WHERE {rule_details['predicate']}"
+    return rule_details["query"]
+
 def get_python_rules():
     """Returns the list of Python data quality rule functions."""
-    return PYTHON_DATA_QUALITY_RULES
\ No newline at end of file
+    return PYTHON_DATA_QUALITY_RULES
+
+def get_batch_rules():
+    """Returns the Python rules in their batch (vectorized or adapted) form."""
+    return [as_batch_rule(rule_func) for rule_func in PYTHON_DATA_QUALITY_RULES]
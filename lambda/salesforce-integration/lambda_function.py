@@ -1,29 +1,54 @@
 
 import os
 import json
-import boto3
-import pandas as pd
-from salesforce.client import SalesforceClient
+# Only light modules are imported at load time. pandas (segment_sync) and
+# simple_salesforce (client) are imported by the steps that use them, so the
+# cold start does not pay for them and a run without changes never logs in.
+from salesforce.transform_output import iter_transform_output
+# Shared layer: clients, secrets and sessions cached across warm invocations
+from warm_cache import get_client, secrets, sessions
 
-s3 = boto3.client('s3')
+s3 = get_client('s3')
 
-def get_secret(secret_name_or_arn, region_name="us-east-1"):
+def get_secret(secret_name_or_arn, refresh=False):
     """
     從 AWS Secrets Manager 檢索秘密。
+    Served from the container's secret cache until its TTL expires;
+    refresh=True re-reads it (e.g. after the credentials were rejected).
     """
-    client = boto3.client('secretsmanager', region_name=region_name)
     try:
-        get_secret_value_response = client.get_secret_value(
-            SecretId=secret_name_or_arn
-        )
+        return secrets.get(secret_name_or_arn, refresh=refresh)
     except Exception as e:
         print(f"Error retrieving secret: {e}")
         raise e
 
-    if 'SecretString' in get_secret_value_response:
-        return json.loads(get_secret_value_response['SecretString'])
-    else:
-        raise ValueError("Secret is not a string type.")
+def get_salesforce_client(secret_arn):
+    """
+    Returns the container's logged-in SalesforceClient, so warm invocations
+    reuse its session instead of logging in again. The client logs in again
+    when the session expires (401), re-reading the secret if the stored
+    credentials are rejected.
+    """
+    def connect():
+        from salesforce.client import SalesforceClient
+        sf_creds = get_secret(secret_arn)
+        client = SalesforceClient(
+            username=sf_creds['username'],
+            password=sf_creds['password'],
+            security_token=sf_creds['security_token'],
+            credentials_provider=lambda refresh=False: get_secret(secret_arn, refresh=refresh)
+        )
+        if not client.is_connected():
+            raise ConnectionError("Failed to connect to Salesforce.")
+        return client
+
+    key = ('salesforce', secret_arn)
+    sf_client = sessions.get(key, connect)
+    if not sf_client.is_connected():
+        # A refresh failed during an earlier invocation
+        sessions.invalidate(key)
+        sf_client = sessions.get(key, connect)
+    return sf_client
 
 def lambda_handler(event, context):
     """
@@ -36,44 +61,48 @@ def lambda_handler(event, context):
     if not s3_output_path:
         raise ValueError("Missing 's3_output_path' in the event payload.")
 
-    # 2. Read prediction results from S3
-    # The output file name is often the input file name with .out appended.
-    # This might need adjustment based on your SageMaker job's configuration.
-    bucket, key = s3_output_path.replace("s3://", "").split("/", 1)
-    # Assuming the output is a single file. You might need to list objects in the prefix.
-    # This is a simplification.
-    obj = s3.get_object(Bucket=bucket, Key=f"{key}/your_input_file.csv.out") 
-    predictions = pd.read_csv(obj['Body'], header=None)
-    # TODO: You need to map predictions back to user identifiers (e.g., emails)
-    # This requires the original data to be joined with the predictions.
+    # 2. Stream the predictions of every '.out' part, joined back to the user
+    # identifiers (emails). With the 'joined' layout the transform job joins each
+    # prediction to its input record (JoinSource=Input); with 'aligned' the
+    # input files (event 's3_input_path') are read alongside the output.
+    segments = iter_transform_output(
+        s3,
+        s3_output_path,
+        layout=event.get('transform_output_layout', os.environ.get('TRANSFORM_OUTPUT_LAYOUT', 'joined')),
+        s3_input_path=event.get('s3_input_path'),
+        id_column=int(os.environ.get('ID_COLUMN_INDEX', '0')),
+        input_has_header=os.environ.get('INPUT_HAS_HEADER', 'false').lower() == 'true'
+    )
 
-    # 3. Get Salesforce credentials from Secrets Manager
+    # 3. Get the Salesforce credentials' secret
     salesforce_secret_arn = os.environ.get('SALESFORCE_SECRET_ARN')
     if not salesforce_secret_arn:
         raise ValueError("SALESFORCE_SECRET_ARN environment variable not set.")
 
-    sf_creds = get_secret(salesforce_secret_arn)
+    # 4. Push only the segments that changed since the last sync (Bulk API 2.0),
+    # using the last synced segments kept as a snapshot in S3. The Salesforce
+    # client is only requested when there are changes to send (and logs in
+    # only on a cold start).
+    from salesforce.segment_sync import sync_changed_segments
 
-    # 4. Initialize Salesforce client
-    sf_client = SalesforceClient(
-        username=sf_creds['username'],
-        password=sf_creds['password'],
-        security_token=sf_creds['security_token']
+    bucket = s3_output_path.replace("s3://", "").split("/", 1)[0]
+    snapshot_path = os.environ.get(
+        'SEGMENT_SNAPSHOT_S3_PATH', f"s3://{bucket}/salesforce-sync/segment_snapshot.csv.gz"
+    )
+    metrics_namespace = os.environ.get('SYNC_METRICS_NAMESPACE')
+    metrics = sync_changed_segments(
+        lambda: get_salesforce_client(salesforce_secret_arn),
+        segments,
+        snapshot_path,
+        s3=s3,
+        metrics_namespace=metrics_namespace,
+        cloudwatch=get_client('cloudwatch') if metrics_namespace else None
     )
-
-    if not sf_client.is_connected():
-        raise ConnectionError("Failed to connect to Salesforce.")
-
-    # 5. Iterate and update Salesforce
-    # This is a placeholder loop. You need to adapt it to your data.
-    # for index, row in predictions.iterrows():
-    #     email = row['email'] # Assuming you have an 'email' column
-    #     segment = row['prediction'] # Assuming you have a 'prediction' column
-    #     sf_client.update_contact_segment(email, segment)
 
     print("Salesforce sync complete.")
 
     return {
         'statusCode': 200,
-        'body': json.dumps('Salesforce sync complete.')
+        'body': json.dumps('Salesforce sync complete.'),
+        'metrics': metrics
     }
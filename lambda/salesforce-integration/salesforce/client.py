@@ -1,14 +1,263 @@
 
+import csv
+import io
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
 from simple_salesforce import Salesforce
+from simple_salesforce.exceptions import SalesforceExpiredSession
+
+# --- Bulk API 2.0 ---
+# Segments are synced with Bulk API 2.0 ingest jobs: one upsert job per
+# MAX_JOB_BYTES of CSV, uploaded as a stream, processed by Salesforce in
+# parallel with the next upload, polled concurrently with an adaptive backoff
+# and checked row by row from the job's result CSVs.
+BULK_API_VERSION = '59.0'
+MAX_JOB_BYTES = 100 * 1024 * 1024     # Salesforce accepts up to 150 MB of CSV per job
+UPLOAD_BLOCK_BYTES = 1024 * 1024      # Size of the blocks a job's CSV is streamed in
+MAX_ERROR_DETAILS = 1000
+POLL_INITIAL_DELAY = 1.0
+POLL_MAX_DELAY = 15.0
+POLL_BACKOFF = 1.5
+JOB_TIMEOUT = 3600
+JOB_DONE_STATES = ('JobComplete', 'Failed', 'Aborted')
+
+class CsvRowEncoder:
+    """Encodes rows as UTF-8 CSV lines ('\\n' line endings), reusing one buffer."""
+
+    def __init__(self):
+        self.buffer = io.StringIO()
+        self.writer = csv.writer(self.buffer, lineterminator='\n')
+
+    def encode(self, values):
+        self.writer.writerow(values)
+        line = self.buffer.getvalue().encode('utf-8')
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        return line
+
+def iter_job_bodies(header, rows, max_job_bytes=MAX_JOB_BYTES, block_bytes=UPLOAD_BLOCK_BYTES):
+    """
+    Splits rows into CSV bodies of at most 'max_job_bytes' (header included),
+    one per ingest job. Each body is a generator of byte blocks, so a job's CSV
+    is never held in memory as a whole; it must be consumed before the next
+    body is requested.
+    """
+    encoder = CsvRowEncoder()
+    header_line = encoder.encode(header)
+    rows = iter(rows)
+    carried = []   # Encoded row that did not fit into the previous body
+
+    def body(first_line):
+        block, block_size, job_size = [header_line, first_line], len(header_line) + len(first_line), 0
+        for row in rows:
+            line = encoder.encode(row)
+            if job_size + block_size + len(line) > max_job_bytes:
+                carried.append(line)
+                break
+            block.append(line)
+            block_size += len(line)
+            if block_size >= block_bytes:
+                yield b''.join(block)
+                job_size += block_size
+                block, block_size = [], 0
+        if block:
+            yield b''.join(block)
+
+    while True:
+        if carried:
+            first_line = carried.pop()
+        else:
+            row = next(rows, None)
+            if row is None:
+                return
+            first_line = encoder.encode(row)
+        yield body(first_line)
+
+class SalesforceBulkClient:
+    """Salesforce Bulk API 2.0 ingest client for one org session."""
+
+    def __init__(self, instance_url, session_id, api_version=BULK_API_VERSION, session=None,
+                 max_job_bytes=MAX_JOB_BYTES, max_workers=8, poll_initial_delay=POLL_INITIAL_DELAY,
+                 poll_max_delay=POLL_MAX_DELAY, poll_backoff=POLL_BACKOFF, timeout=JOB_TIMEOUT,
+                 sleep=time.sleep, refresh_session=None):
+        self.instance_url = instance_url.rstrip('/')
+        self.session_id = session_id
+        self.api_version = api_version
+        self.session = session or requests.Session()
+        self.max_job_bytes = max_job_bytes
+        self.max_workers = max_workers
+        self.poll_initial_delay = poll_initial_delay
+        self.poll_max_delay = poll_max_delay
+        self.poll_backoff = poll_backoff
+        self.timeout = timeout
+        self.sleep = sleep
+        # Called on a 401 to log in again; returns the new session ID
+        self.refresh_session = refresh_session
+        self.api_calls = 0  # REST requests sent, for monitoring API limits
+        self._api_calls_lock = threading.Lock()   # wait_jobs polls from worker threads
+
+    def _url(self, path=''):
+        return f"{self.instance_url}/services/data/v{self.api_version}/jobs/ingest{path}"
+
+    def _request(self, method, url, content_type='application/json', retry_expired=True, **kwargs):
+        headers = {'Authorization': f"Bearer {self.session_id}", 'Content-Type': content_type}
+        response = self.session.request(method, url, headers=headers, **kwargs)
+        with self._api_calls_lock:
+            self.api_calls += 1
+        if response.status_code == 401 and retry_expired and self.refresh_session:
+            # The (cached) session expired: log in again and retry once
+            print("Salesforce session expired; logging in again.")
+            self.session_id = self.refresh_session()
+            return self._request(method, url, content_type, retry_expired=False, **kwargs)
+        if response.status_code >= 400:
+            raise Exception(f"Bulk API request {method} {url} failed ({response.status_code}): {response.text}")
+        return response
+
+    def create_upsert_job(self, object_name, external_id_field):
+        response = self._request('POST', self._url(), json={
+            'object': object_name,
+            'externalIdFieldName': external_id_field,
+            'contentType': 'CSV',
+            'operation': 'upsert',
+            'lineEnding': 'LF'
+        })
+        return response.json()['id']
+
+    def upload_job_data(self, job_id, body):
+        """Uploads a job's CSV; 'body' may be bytes or a generator of byte blocks (streamed)."""
+        # A streamed body cannot be sent twice, so it is not retried after a 401
+        self._request('PUT', self._url(f"/{job_id}/batches"), content_type='text/csv',
+                      retry_expired=isinstance(body, bytes), data=body)
+
+    def set_job_state(self, job_id, state):
+        self._request('PATCH', self._url(f"/{job_id}"), json={'state': state})
+
+    def get_job(self, job_id):
+        return self._request('GET', self._url(f"/{job_id}")).json()
+
+    def wait_job(self, job_id):
+        """Polls a job until it is done (with an adaptive backoff) and returns its info."""
+        delay = self.poll_initial_delay
+        # Measured on the clock: request time counts too, and a sleep may overrun
+        deadline = time.monotonic() + self.timeout
+        while True:
+            job = self.get_job(job_id)
+            if job['state'] in JOB_DONE_STATES:
+                return job
+            if time.monotonic() >= deadline:
+                raise Exception(f"Bulk job {job_id} did not finish within {self.timeout} seconds (state: {job['state']})")
+            self.sleep(delay)
+            delay = min(delay * self.poll_backoff, self.poll_max_delay)
+
+    def wait_jobs(self, job_ids):
+        """Polls several jobs concurrently; returns their infos in order."""
+        with ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(job_ids)))) as executor:
+            return list(executor.map(self.wait_job, job_ids))
+
+    def iter_results(self, job_id, result_type):
+        """
+        Streams a job's result CSV as dict rows. 'result_type' is
+        'successfulResults', 'failedResults' or 'unprocessedrecords'.
+        """
+        response = self._request('GET', self._url(f"/{job_id}/{result_type}/"), stream=True)
+        lines = (line.decode('utf-8') for line in response.iter_lines())
+        yield from csv.DictReader(lines)
+
+    def summarize_job(self, job, external_id_field, max_error_details=MAX_ERROR_DETAILS):
+        """Parses a finished job's per-row results into counts and error details."""
+        summary = {'succeeded': 0, 'created': 0, 'failed': 0, 'unprocessed': 0, 'errors': []}
+        for row in self.iter_results(job['id'], 'successfulResults'):
+            summary['succeeded'] += 1
+            summary['created'] += row.get('sf__Created') == 'true'
+        for row in self.iter_results(job['id'], 'failedResults'):
+            summary['failed'] += 1
+            if len(summary['errors']) < max_error_details:
+                summary['errors'].append({'external_id': row.get(external_id_field), 'error': row.get('sf__Error')})
+        if job['state'] != 'JobComplete':
+            summary['unprocessed'] = sum(1 for _ in self.iter_results(job['id'], 'unprocessedrecords'))
+        return summary
+
+    def upsert(self, object_name, external_id_field, header, rows, max_error_details=MAX_ERROR_DETAILS):
+        """
+        Upserts rows (value lists in 'header' order, the external ID among them)
+        in as many ingest jobs as their size requires. Each job is uploaded and
+        closed while Salesforce processes the previous ones; all jobs are then
+        polled and their results parsed concurrently.
+        Returns a summary with row counts, failed jobs and per-row errors.
+        """
+        job_ids = []
+        for body in iter_job_bodies(header, rows, self.max_job_bytes):
+            job_id = self.create_upsert_job(object_name, external_id_field)
+            try:
+                self.upload_job_data(job_id, body)
+                self.set_job_state(job_id, 'UploadComplete')
+            except Exception:
+                self.set_job_state(job_id, 'Aborted')
+                raise
+            job_ids.append(job_id)
+            print(f"Uploaded Bulk API upsert job {job_id} ({len(job_ids)} so far)")
+
+        jobs = self.wait_jobs(job_ids)
+        with ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(jobs)))) as executor:
+            job_summaries = list(executor.map(
+                lambda job: self.summarize_job(job, external_id_field, max_error_details), jobs
+            ))
+
+        summary = {
+            'jobs': len(jobs),
+            'records_succeeded': sum(s['succeeded'] for s in job_summaries),
+            'records_created': sum(s['created'] for s in job_summaries),
+            'records_failed': sum(s['failed'] for s in job_summaries),
+            'records_unprocessed': sum(s['unprocessed'] for s in job_summaries),
+            'failed_jobs': [
+                {'id': job['id'], 'state': job['state'], 'error': job.get('errorMessage')}
+                for job in jobs if job['state'] != 'JobComplete'
+            ],
+            'errors': [error for s in job_summaries for error in s['errors']][:max_error_details],
+            'api_calls': self.api_calls
+        }
+        print(f"Bulk upsert finished: {summary['records_succeeded']} succeeded, "
+              f"{summary['records_failed']} failed in {summary['jobs']} job(s)")
+        return summary
 
 class SalesforceClient:
-    def __init__(self, username, password, security_token):
+    def __init__(self, username, password, security_token, credentials_provider=None):
+        """
+        Logs in to Salesforce. 'credentials_provider', if given, is called as
+        credentials_provider(refresh=True) when a login is rejected or the
+        session expires, and returns fresh credentials (username, password,
+        security_token), e.g. after the secret holding them was rotated.
+        """
+        self.credentials = {'username': username, 'password': password, 'security_token': security_token}
+        self.credentials_provider = credentials_provider
+        # One HTTP session for every login, so pooled connections outlive a session refresh
+        self.http_session = requests.Session()
+        self.sf = None
         try:
-            self.sf = Salesforce(username=username, password=password, security_token=security_token)
-            print("Successfully connected to Salesforce.")
+            self.login()
         except Exception as e:
             print(f"Failed to connect to Salesforce: {e}")
-            self.sf = None
+
+    def login(self):
+        try:
+            self.sf = Salesforce(session=self.http_session, **self.credentials)
+        except Exception:
+            if not self.credentials_provider:
+                raise
+            # The credentials may have been rotated since they were read
+            credentials = self.credentials_provider(refresh=True)
+            self.credentials = {name: credentials[name] for name in ('username', 'password', 'security_token')}
+            self.sf = Salesforce(session=self.http_session, **self.credentials)
+        print("Successfully connected to Salesforce.")
+        return self.sf.session_id
+
+    def refresh_session(self):
+        """Logs in again after the session expired; returns the new session ID."""
+        self.sf = None
+        return self.login()
 
     def is_connected(self):
         return self.sf is not None
@@ -24,8 +273,12 @@ class SalesforceClient:
             raise ConnectionError("Not connected to Salesforce.")
 
         try:
-            # Find the contact by email
-            contact = self.sf.Contact.get_by_custom_id('Email', email)
+            try:
+                # Find the contact by email
+                contact = self.sf.Contact.get_by_custom_id('Email', email)
+            except SalesforceExpiredSession:
+                self.refresh_session()
+                contact = self.sf.Contact.get_by_custom_id('Email', email)
             if contact:
                 # Update the contact record
                 self.sf.Contact.update(contact['Id'], {'User_Segment__c': segment})
@@ -37,3 +290,31 @@ class SalesforceClient:
         except Exception as e:
             print(f"Error updating contact in Salesforce: {e}")
             return False
+
+    def bulk_client(self, **kwargs):
+        """Returns a Bulk API 2.0 client sharing this client's session."""
+        if not self.is_connected():
+            raise ConnectionError("Not connected to Salesforce.")
+        return SalesforceBulkClient(
+            f"https://{self.sf.sf_instance}",
+            self.sf.session_id,
+            api_version=self.sf.sf_version,
+            session=self.sf.session,
+            refresh_session=self.refresh_session,
+            **kwargs
+        )
+
+    def bulk_update_segments(self, segments, external_id_field='Email', object_name='Contact',
+                             segment_field='User_Segment__c', max_error_details=MAX_ERROR_DETAILS, **kwargs):
+        """
+        Upserts the segment field of many records with Bulk API 2.0 jobs instead
+        of a lookup and an update call per record. 'segments' is an iterable of
+        (external ID, segment) pairs and may be a generator.
+
+        NOTE: 'external_id_field' must be marked as an External ID field on the
+        object. Records without a match are created by the upsert; for Contacts
+        that fails (LastName is required) and is reported per row in 'errors'.
+        """
+        return self.bulk_client(**kwargs).upsert(
+            object_name, external_id_field, [external_id_field, segment_field], segments, max_error_details
+        )
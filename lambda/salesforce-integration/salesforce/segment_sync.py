@@ -0,0 +1,140 @@
+
+import io
+import itertools
+import json
+
+import boto3
+import pandas as pd
+
+# --- Diff-based segment sync ---
+# The segment last synced for each user is kept as a snapshot in S3: a
+# gzip-compressed CSV of (key, segment) rows sorted by key. Each run joins the
+# new predictions with it and sends only new and changed segments to
+# Salesforce; the snapshot is then updated with the rows that were synced, so
+# rows that failed are sent again by the next run.
+
+SNAPSHOT_COLUMNS = ['key', 'segment']
+CHUNK_SIZE = 100000    # Pairs joined with the snapshot at a time
+PER_RECORD_CALLS = 2   # Lookup + update per user with SalesforceClient.update_contact_segment
+
+def split_s3_path(s3_path):
+    bucket, _, key = s3_path.replace('s3://', '', 1).partition('/')
+    return bucket, key
+
+def empty_snapshot():
+    return pd.DataFrame({column: pd.Series(dtype=str) for column in SNAPSHOT_COLUMNS})
+
+def read_snapshot(s3, s3_path):
+    """Reads the last synced segments, or an empty snapshot on the first run."""
+    bucket, key = split_s3_path(s3_path)
+    try:
+        obj = s3.get_object(Bucket=bucket, Key=key)
+    except s3.exceptions.NoSuchKey:
+        print(f"No segment snapshot at {s3_path} yet; every segment will be synced.")
+        return empty_snapshot()
+    return pd.read_csv(io.BytesIO(obj['Body'].read()), compression='gzip', dtype=str, keep_default_na=False)
+
+def write_snapshot(s3, s3_path, snapshot):
+    bucket, key = split_s3_path(s3_path)
+    buffer = io.BytesIO()
+    snapshot.to_csv(buffer, index=False, compression={'method': 'gzip', 'mtime': 0})
+    s3.put_object(Bucket=bucket, Key=key, Body=buffer.getvalue(), ContentType='application/gzip')
+
+def iter_segment_chunks(pairs, chunk_size=CHUNK_SIZE):
+    """
+    Groups (key, segment) pairs into DataFrames of string rows, one per key
+    (the last one wins), without empty keys.
+    """
+    pairs = iter(pairs)
+    while True:
+        chunk = pd.DataFrame(itertools.islice(pairs, chunk_size), columns=SNAPSHOT_COLUMNS)
+        if chunk.empty:
+            return
+        valid = chunk['key'].notna().to_numpy()
+        chunk = chunk.astype(str)
+        chunk['key'] = chunk['key'].str.strip()
+        chunk = chunk[valid & (chunk['key'] != '').to_numpy()]
+        yield chunk.drop_duplicates('key', keep='last')
+
+def classify_segments(snapshot, current):
+    """
+    Hash-joins the current segments with the snapshot.
+    Returns the current rows with their 'status': 'new', 'changed' or 'unchanged'.
+    """
+    merged = current.merge(snapshot.rename(columns={'segment': 'synced_segment'}), on='key', how='left')
+    is_new = merged['synced_segment'].isna()
+    is_changed = ~is_new & (merged['segment'] != merged['synced_segment'])
+    merged['status'] = 'unchanged'
+    merged.loc[is_new, 'status'] = 'new'
+    merged.loc[is_changed, 'status'] = 'changed'
+    return merged[SNAPSHOT_COLUMNS + ['status']]
+
+def update_snapshot(snapshot, synced):
+    """Returns the snapshot with the synced rows applied, sorted by key."""
+    kept = snapshot[~snapshot['key'].isin(synced['key'])]
+    return pd.concat([kept, synced], ignore_index=True).sort_values('key', kind='stable').reset_index(drop=True)
+
+def publish_metrics(metrics, namespace, cloudwatch=None):
+    cloudwatch = cloudwatch or boto3.client('cloudwatch')
+    cloudwatch.put_metric_data(Namespace=namespace, MetricData=[
+        {'MetricName': 'SegmentRows', 'Value': metrics['rows_total'], 'Unit': 'Count'},
+        {'MetricName': 'ChangedSegmentRows', 'Value': metrics['rows_sent'], 'Unit': 'Count'},
+        {'MetricName': 'SegmentChangeRate', 'Value': metrics['change_rate'] * 100, 'Unit': 'Percent'},
+        {'MetricName': 'FailedSegmentRows', 'Value': metrics['rows_failed'], 'Unit': 'Count'},
+        {'MetricName': 'SalesforceApiCallsSaved', 'Value': metrics['api_calls_saved'], 'Unit': 'Count'}
+    ])
+
+def sync_changed_segments(sf_client, segments, snapshot_path, external_id_field='Email', s3=None,
+                          metrics_namespace=None, chunk_size=CHUNK_SIZE, cloudwatch=None):
+    """
+    Sends only the segments that changed since the last sync to Salesforce
+    (Bulk API 2.0 upsert, keys matched on 'external_id_field') and updates the
+    snapshot. 'sf_client' is a SalesforceClient, or a function returning one
+    that is only called when there are changes to send. 'segments' is an iterable of (key, segment) pairs, e.g. a
+    generator; it is joined with the snapshot chunk by chunk, so only the
+    snapshot and the last row of each key are held in memory.
+    Returns the sync metrics: counts of distinct keys, change rate, rows sent and failed,
+    Bulk API calls made and per-record API calls saved by skipping unchanged rows.
+    """
+    s3 = s3 or boto3.client('s3')
+    snapshot = read_snapshot(s3, snapshot_path)
+    # A key repeated across chunks keeps its last row, so every count is of distinct keys
+    latest = classify_segments(snapshot, empty_snapshot())
+    for chunk in iter_segment_chunks(segments, chunk_size):
+        latest = pd.concat([latest, classify_segments(snapshot, chunk)],
+                           ignore_index=True).drop_duplicates('key', keep='last')
+    statuses = latest['status'].value_counts()
+    metrics = {
+        'rows_total': len(latest),
+        'rows_new': int(statuses.get('new', 0)),
+        'rows_changed': int(statuses.get('changed', 0)),
+        'rows_unchanged': int(statuses.get('unchanged', 0))
+    }
+    delta = latest.loc[latest['status'] != 'unchanged', SNAPSHOT_COLUMNS]
+    metrics['rows_sent'] = len(delta)
+    metrics['change_rate'] = round(len(delta) / metrics['rows_total'], 4) if metrics['rows_total'] else 0.0
+    metrics['api_calls_saved'] = metrics['rows_unchanged'] * PER_RECORD_CALLS
+    metrics['rows_failed'] = 0
+    metrics['bulk_api_calls'] = 0
+
+    if len(delta):
+        if callable(sf_client):
+            sf_client = sf_client()
+        result = sf_client.bulk_update_segments(
+            delta.itertuples(index=False, name=None),
+            external_id_field=external_id_field,
+            max_error_details=len(delta)
+        )
+        metrics['rows_failed'] = result['records_failed'] + result['records_unprocessed']
+        metrics['bulk_api_calls'] = result['api_calls']
+        if result['failed_jobs']:
+            # Rows of failed jobs are not reported individually; keep the old snapshot so all are retried
+            print(f"Bulk jobs failed: {result['failed_jobs']}; segment snapshot left unchanged.")
+        else:
+            failed_keys = {error['external_id'] for error in result['errors']}
+            write_snapshot(s3, snapshot_path, update_snapshot(snapshot, delta[~delta['key'].isin(failed_keys)]))
+
+    print(f"Segment sync metrics: {json.dumps(metrics)}")
+    if metrics_namespace:
+        publish_metrics(metrics, metrics_namespace, cloudwatch)
+    return metrics
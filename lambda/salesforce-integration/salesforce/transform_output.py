@@ -0,0 +1,167 @@
+
+import csv
+import itertools
+import json
+import queue
+import threading
+
+# --- SageMaker batch transform output reader ---
+# Streams every '.out' part under a transform job's S3 output path and yields
+# (identifier, prediction) pairs lazily. Parts are read concurrently by a few
+# worker threads that hand over small batches through a bounded queue, so
+# memory stays bounded whatever the number of rows.
+# Two output layouts are supported:
+#   'joined'  - the job joins each prediction to its input record
+#               (DataProcessing.JoinSource = 'Input', AssembleWith = 'Line'):
+#               every output line is a CSV record holding the identifier
+#               (column 'id_column') and the prediction (column 'prediction_column')
+#   'aligned' - the output lines only hold predictions (one per line, or JSON
+#               arrays of a mini-batch per line), aligned with the lines of the
+#               matching input file ('<input key>.out' -> '<input key>')
+
+LAYOUTS = ('joined', 'aligned')
+READ_BLOCK_SIZE = 1024 * 1024
+BATCH_SIZE = 1000          # Pairs handed over from a worker at a time
+MAX_QUEUED_BATCHES = 32    # Bounds memory: at most this many batches wait in the queue
+DEFAULT_MAX_WORKERS = 4
+
+def split_s3_path(s3_path):
+    bucket, _, key = s3_path.replace('s3://', '', 1).partition('/')
+    return bucket, key
+
+def list_output_parts(s3, s3_output_path):
+    """Returns the keys of every '.out' part under an output path, in key order."""
+    bucket, prefix = split_s3_path(s3_output_path)
+    prefix = prefix.rstrip('/') + '/' if prefix else ''
+    keys = []
+    for page in s3.get_paginator('list_objects_v2').paginate(Bucket=bucket, Prefix=prefix):
+        keys.extend(obj['Key'] for obj in page.get('Contents', []) if obj['Key'].endswith('.out'))
+    return bucket, sorted(keys)
+
+def iter_object_lines(s3, bucket, key):
+    """Streams the lines of an S3 object (decoded, without line endings)."""
+    body = s3.get_object(Bucket=bucket, Key=key)['Body']
+    pending = b''
+    for block in iter(lambda: body.read(READ_BLOCK_SIZE), b''):
+        lines = (pending + block).split(b'\n')
+        pending = lines.pop()
+        for line in lines:
+            yield line.rstrip(b'\r').decode('utf-8')
+    if pending:
+        yield pending.rstrip(b'\r').decode('utf-8')
+
+def iter_predictions(lines):
+    """Yields single predictions from output lines: scalars, or JSON arrays of a mini-batch."""
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith('['):
+            for prediction in json.loads(line):
+                yield prediction[0] if isinstance(prediction, list) and len(prediction) == 1 else prediction
+        else:
+            yield line
+
+def iter_joined_pairs(s3, bucket, key, id_column=0, prediction_column=-1):
+    """Yields (identifier, prediction) pairs of a part whose records hold both."""
+    for row in csv.reader(line for line in iter_object_lines(s3, bucket, key) if line.strip()):
+        yield row[id_column], row[prediction_column]
+
+def input_location(key, s3_output_path, s3_input_path):
+    """Returns the (bucket, key) of the input file a '.out' part was produced from."""
+    _, output_prefix = split_s3_path(s3_output_path)
+    input_bucket, input_prefix = split_s3_path(s3_input_path)
+    relative_key = key[len(output_prefix):].lstrip('/')[:-len('.out')]
+    if input_prefix.endswith(relative_key):   # The input path names a single file
+        return input_bucket, input_prefix
+    return input_bucket, f"{input_prefix.rstrip('/')}/{relative_key}" if input_prefix else relative_key
+
+def iter_aligned_pairs(s3, bucket, key, s3_output_path, s3_input_path, id_column=0, input_has_header=False):
+    """
+    Yields (identifier, prediction) pairs of a part by reading the matching
+    input file alongside it, line by line.
+    """
+    input_bucket, input_key = input_location(key, s3_output_path, s3_input_path)
+    input_rows = csv.reader(line for line in iter_object_lines(s3, input_bucket, input_key) if line.strip())
+    if input_has_header:
+        next(input_rows, None)
+    predictions = iter_predictions(iter_object_lines(s3, bucket, key))
+    missing = object()
+    for row, prediction in itertools.zip_longest(input_rows, predictions, fillvalue=missing):
+        if row is missing or prediction is missing:
+            raise ValueError(
+                f"s3://{bucket}/{key} and s3://{input_bucket}/{input_key} have different numbers of records"
+            )
+        yield row[id_column], prediction
+
+def iter_transform_output(s3, s3_output_path, layout='joined', s3_input_path=None, id_column=0,
+                          prediction_column=-1, input_has_header=False, max_workers=DEFAULT_MAX_WORKERS):
+    """
+    Yields (identifier, prediction) pairs from every '.out' part of a batch
+    transform output, reading up to 'max_workers' parts concurrently. Pairs of
+    one part keep their order; parts are interleaved.
+    """
+    if layout not in LAYOUTS:
+        raise ValueError(f"Unknown transform output layout: {layout}")
+    if layout == 'aligned' and not s3_input_path:
+        raise ValueError("The 'aligned' layout needs the transform input path.")
+    bucket, keys = list_output_parts(s3, s3_output_path)
+    print(f"Reading {len(keys)} transform output part(s) under {s3_output_path}")
+    if not keys:
+        return
+
+    def part_pairs(key):
+        if layout == 'joined':
+            return iter_joined_pairs(s3, bucket, key, id_column, prediction_column)
+        return iter_aligned_pairs(s3, bucket, key, s3_output_path, s3_input_path, id_column, input_has_header)
+
+    batches = queue.Queue(maxsize=MAX_QUEUED_BATCHES)
+    pending_keys = queue.Queue()
+    for key in keys:
+        pending_keys.put(key)
+    stop = threading.Event()
+    done = object()
+
+    def worker():
+        try:
+            while not stop.is_set():
+                try:
+                    key = pending_keys.get_nowait()
+                except queue.Empty:
+                    return
+                batch = []
+                for pair in part_pairs(key):
+                    batch.append(pair)
+                    if len(batch) >= BATCH_SIZE:
+                        batches.put(batch)
+                        batch = []
+                        if stop.is_set():
+                            return
+                if batch:
+                    batches.put(batch)
+        except Exception as e:
+            batches.put(e)
+        finally:
+            batches.put(done)
+
+    workers = [threading.Thread(target=worker, daemon=True) for _ in range(min(max_workers, len(keys)))]
+    for thread in workers:
+        thread.start()
+    running = len(workers)
+    try:
+        while running:
+            item = batches.get()
+            if item is done:
+                running -= 1
+            elif isinstance(item, Exception):
+                raise item
+            else:
+                yield from item
+    finally:
+        # On an error or an abandoned generator, let the workers exit
+        stop.set()
+        while any(thread.is_alive() for thread in workers):
+            try:
+                batches.get(timeout=0.1)
+            except queue.Empty:
+                pass
@@ -0,0 +1,148 @@
+# lambda/shared/python/warm_cache.py
+
+import json
+import os
+import threading
+import time
+
+import boto3
+
+# --- Warm Container Cache ---
+# Keeps expensive objects alive across warm invocations of the same Lambda
+# container: boto3 clients (one per service/region/config), secrets read from
+# Secrets Manager (TTL, re-read early when a caller reports that the cached
+# value stopped working, e.g. after a rotation) and authenticated sessions
+# (e.g. a Salesforce login, dropped by the caller when the API answers 401).
+# Everything lives at module level, so it survives between invocations and is
+# rebuilt only on a cold start. All caches are safe to use from threads.
+# Shipped to every Lambda as the shared layer (lambda/shared -> /opt/python),
+# imported as a flat 'warm_cache' module.
+
+DEFAULT_SECRET_TTL_SECONDS = 300
+# A forced secret refresh within this many seconds of the last read is served
+# from the cache, so a burst of auth failures does not hammer Secrets Manager
+MIN_SECRET_REFRESH_SECONDS = 10
+DEFAULT_SESSION_TTL_SECONDS = 3600
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(service_name, region_name=None, **kwargs):
+    """
+    Returns the container's boto3 client for a service (and region / client
+    options), creating it on first use. Creating clients from the default
+    session is not thread-safe, so creation is serialized; the clients are.
+    """
+    key = (service_name, region_name, tuple(sorted((name, repr(value)) for name, value in kwargs.items())))
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                client = boto3.client(service_name, region_name=region_name, **kwargs)
+                _clients[key] = client
+    return client
+
+
+class WarmCache:
+    """
+    Thread-safe key -> value cache with a per-entry TTL. Values are built by the
+    caller's factory on a miss; concurrent misses of one key build it once.
+    """
+
+    def __init__(self, ttl_seconds=None, clock=time.monotonic):
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self._entries = {}   # key -> (value, expires_at or None)
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _key_lock(self, key):
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def _fresh(self, key):
+        entry = self._entries.get(key)
+        if entry is not None and (entry[1] is None or self.clock() < entry[1]):
+            return entry
+        return None
+
+    def get(self, key, factory, ttl_seconds=None):
+        entry = self._fresh(key)
+        if entry is None:
+            with self._key_lock(key):
+                entry = self._fresh(key)
+                if entry is None:
+                    self.misses += 1
+                    return self.put(key, factory(), ttl_seconds)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, key, value, ttl_seconds=None):
+        ttl_seconds = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        expires_at = self.clock() + ttl_seconds if ttl_seconds is not None else None
+        self._entries[key] = (value, expires_at)
+        return value
+
+    def invalidate(self, key):
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+
+class SecretCache:
+    """
+    Caches parsed JSON secrets from Secrets Manager for 'ttl_seconds'.
+    get(secret_id, refresh=True) re-reads a secret before its TTL, for callers
+    whose credentials were rejected (a new version is logged as a rotation).
+    """
+
+    def __init__(self, ttl_seconds=DEFAULT_SECRET_TTL_SECONDS, client=None, region_name=None,
+                 min_refresh_seconds=MIN_SECRET_REFRESH_SECONDS, clock=time.monotonic):
+        self.ttl_seconds = ttl_seconds
+        self.client = client
+        self.region_name = region_name
+        self.min_refresh_seconds = min_refresh_seconds
+        self.clock = clock
+        self._entries = {}   # secret_id -> {"value", "version", "fetched_at"}
+        self._lock = threading.Lock()
+        self.fetches = 0
+
+    def _fetch(self, secret_id):
+        client = self.client or get_client("secretsmanager", region_name=self.region_name)
+        response = client.get_secret_value(SecretId=secret_id)
+        self.fetches += 1
+        if "SecretString" not in response:
+            raise ValueError("Secret is not a string type.")
+        return {
+            "value": json.loads(response["SecretString"]),
+            "version": response.get("VersionId"),
+            "fetched_at": self.clock()
+        }
+
+    def get(self, secret_id, refresh=False):
+        with self._lock:
+            entry = self._entries.get(secret_id)
+            now = self.clock()
+            if entry is not None:
+                age = now - entry["fetched_at"]
+                if age < (self.min_refresh_seconds if refresh else self.ttl_seconds):
+                    return entry["value"]
+            new_entry = self._fetch(secret_id)
+            if entry is not None and new_entry["version"] != entry["version"]:
+                print(f"Secret {secret_id} was rotated (version {entry['version']} -> {new_entry['version']}).")
+            self._entries[secret_id] = new_entry
+            return new_entry["value"]
+
+    def invalidate(self, secret_id):
+        with self._lock:
+            self._entries.pop(secret_id, None)
+
+
+# Container-wide caches shared by the handler modules
+secrets = SecretCache(ttl_seconds=int(os.environ.get("SECRET_CACHE_TTL_SECONDS", DEFAULT_SECRET_TTL_SECONDS)))
+sessions = WarmCache(ttl_seconds=int(os.environ.get("SESSION_CACHE_TTL_SECONDS", DEFAULT_SESSION_TTL_SECONDS)))
@@ -0,0 +1,98 @@
+
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import StandardScaler
+
+# --- User features ---
+# Turns the user records written by the ml-data-prep Glue job (age, gender,
+# total_spend, last_purchase_date, product_category) into the float32 feature
+# rows the k-means model is trained on and predicts from:
+#   - age, total_spend and the days since the last purchase, standardized
+#     (missing values become 0, the mean);
+#   - gender and product_category one-hot encoded (unseen or missing values
+#     encode as all zeros).
+# The statistics are accumulated batch by batch (partial_fit), so fitting
+# needs one pass over the data and bounded memory. The fitted transformer is
+# saved next to the features (transformer.joblib), packaged with the model by
+# train.py and applied by inference.py, so training and serving transform
+# records identically. Recency is counted up to the 'as_of' date fixed at fit
+# time, for the same reason.
+
+RAW_COLUMNS = ('age', 'gender', 'total_spend', 'last_purchase_date', 'product_category')
+NUMERIC_COLUMNS = ('age', 'total_spend')
+CATEGORICAL_COLUMNS = ('gender', 'product_category')
+DATE_COLUMN = 'last_purchase_date'
+RECENCY_FEATURE = 'days_since_last_purchase'
+TRANSFORMER_FILE = 'transformer.joblib'
+DEFAULT_MAX_CATEGORIES = 50
+
+class UserFeatureTransformer:
+    """
+    Standardizes the numeric and recency features and one-hot encodes the
+    categorical ones. Call partial_fit on every batch, then finalize, then
+    transform.
+    """
+
+    def __init__(self, as_of=None, max_categories=DEFAULT_MAX_CATEGORIES, dtype=np.float32):
+        self.as_of = pd.Timestamp(as_of or pd.Timestamp.now(tz='UTC').date()).normalize()
+        self.max_categories = max_categories
+        self.dtype = np.dtype(dtype)
+        self.scaler = StandardScaler()
+        self.category_counts = {column: Counter() for column in CATEGORICAL_COLUMNS}
+        self.categories = None
+
+    @property
+    def feature_names(self):
+        if self.categories is None:
+            raise ValueError("The transformer is not finalized")
+        return list(NUMERIC_COLUMNS) + [RECENCY_FEATURE] + [
+            f"{column}={value}" for column in CATEGORICAL_COLUMNS for value in self.categories[column]
+        ]
+
+    def _check_columns(self, records):
+        missing = [column for column in RAW_COLUMNS if column not in records.columns]
+        if missing:
+            raise ValueError(f"Missing user record columns: {missing}")
+
+    def _numeric(self, records):
+        """Numeric features and recency in days, as float64 (NaN where missing)."""
+        dates = pd.to_datetime(records[DATE_COLUMN], errors='coerce', utc=True).dt.tz_localize(None)
+        numeric = np.empty((len(records), len(NUMERIC_COLUMNS) + 1))
+        for i, column in enumerate(NUMERIC_COLUMNS):
+            numeric[:, i] = pd.to_numeric(records[column], errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+        numeric[:, -1] = (self.as_of - dates).dt.days.to_numpy(dtype=float, na_value=np.nan)
+        return numeric
+
+    def partial_fit(self, records):
+        """Accumulates the statistics of one batch of user records (a DataFrame)."""
+        self._check_columns(records)
+        self.scaler.partial_fit(self._numeric(records))
+        for column in CATEGORICAL_COLUMNS:
+            self.category_counts[column].update(records[column].dropna().astype(str).value_counts().to_dict())
+        return self
+
+    def finalize(self):
+        """Fixes the categories (the 'max_categories' most frequent values of each column)."""
+        self.categories = {
+            column: sorted(value for value, _ in counts.most_common(self.max_categories))
+            for column, counts in self.category_counts.items()
+        }
+        return self
+
+    def transform(self, records):
+        """Returns the feature rows of a DataFrame of user records."""
+        if self.categories is None:
+            raise ValueError("The transformer is not finalized")
+        self._check_columns(records)
+        numeric = np.nan_to_num(self.scaler.transform(self._numeric(records)), nan=0.0)
+        blocks = [numeric.astype(self.dtype)]
+        for column in CATEGORICAL_COLUMNS:
+            values = records[column].astype('string')
+            codes = pd.Categorical(values, categories=self.categories[column]).codes
+            one_hot = np.zeros((len(records), len(self.categories[column])), dtype=self.dtype)
+            known = np.flatnonzero(codes >= 0)
+            one_hot[known, codes[known]] = 1
+            blocks.append(one_hot)
+        return np.hstack(blocks)
@@ -2,13 +2,435 @@
 import os
 import json
 import io
+import queue
+import struct
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
 import pandas as pd
 import joblib
 
+from features import RAW_COLUMNS, TRANSFORMER_FILE
+from shards import DEFAULT_EXCLUDE_COLUMNS
+
+# --- Content types ---
+# Requests: text/csv, application/json ({"instances": [...]} or a list of
+# rows), JSON Lines (one row, or {"features": [...]}, per line),
+# application/x-npy and application/x-recordio-protobuf (SageMaker's RecordIO
+# framed 'Record' protobuf, dense or sparse 'values' features).
+# Binary inputs are decoded with np.frombuffer over the request bytes without
+# copying: npy arrays, and RecordIO payloads of alike dense records (the usual
+# case) as one strided view; other RecordIO payloads are parsed per record.
+# Responses: the same types; RecordIO responses carry one 'closest_cluster'
+# label per record, like SageMaker's built-in k-means.
+# Raw user records (application/x-parquet as written by ml-data-prep, JSON
+# objects without 'features', CSV rows with text columns in RAW_COLUMNS order)
+# are decoded as DataFrames and transformed by the model's preprocessing
+# transformer; numeric rows are taken as feature rows already.
+CSV = 'text/csv'
+JSON = 'application/json'
+JSONLINES = ('application/jsonlines', 'application/x-jsonlines')
+NPY = 'application/x-npy'
+PARQUET = 'application/x-parquet'
+RECORDIO_PROTOBUF = 'application/x-recordio-protobuf'
+
+RECORDIO_MAGIC = 0xced7230a
+RECORDIO_LENGTH_MASK = (1 << 29) - 1
+FEATURES_KEY = 'values'
+PREDICTION_LABEL = 'closest_cluster'
+
+# --- Micro-batching ---
+# Optional: concurrent small requests handled by the threads of one serving
+# process are grouped into a single model.predict call. Disabled unless
+# INFERENCE_MICRO_BATCH_MAX_ROWS is set; a batch is run when it holds that many
+# rows or when its first request has waited INFERENCE_MICRO_BATCH_MAX_WAIT_MS.
+MICRO_BATCH_MAX_ROWS = int(os.environ.get('INFERENCE_MICRO_BATCH_MAX_ROWS', '0'))
+MICRO_BATCH_MAX_WAIT_MS = float(os.environ.get('INFERENCE_MICRO_BATCH_MAX_WAIT_MS', '5'))
+
+# --- Model loading ---
+# The model's arrays (e.g. the k-means centroids) are memory-mapped read-only
+# from the uncompressed joblib file instead of being copied into each worker,
+# so every worker process of an endpoint shares one copy in the page cache.
+# With INFERENCE_PRELOAD_MODEL (default on), the model is also loaded when this
+# module is imported: a server that imports it before forking its workers
+# (e.g. gunicorn --preload) loads it once, and the workers inherit it
+# copy-on-write instead of each loading it at startup.
+MODEL_FILE = 'model.joblib'
+MODEL_DIR = os.environ.get('SM_MODEL_DIR', '/opt/ml/model')
+PRELOAD_MODEL = os.environ.get('INFERENCE_PRELOAD_MODEL', 'true').lower() == 'true'
+
+def base_content_type(content_type):
+    """'text/csv; charset=utf-8' -> 'text/csv'"""
+    return (content_type or '').split(';')[0].strip().lower()
+
+def as_bytes(request_body):
+    return request_body.encode('utf-8') if isinstance(request_body, str) else request_body
+
+def as_text(request_body):
+    return request_body if isinstance(request_body, str) else bytes(request_body).decode('utf-8')
+
+# --- CSV ---
+
+def decode_csv(text):
+    """Numeric rows as an array; rows with text columns as a DataFrame of raw user records."""
+    if not text.strip():
+        raise ValueError("Empty CSV payload.")
+    frame = pd.read_csv(io.StringIO(text), header=None)
+    if all(pd.api.types.is_numeric_dtype(dtype) for dtype in frame.dtypes):
+        return frame.values
+    if len(frame.columns) != len(RAW_COLUMNS):
+        raise ValueError(f"CSV user records need the columns {list(RAW_COLUMNS)}, got {len(frame.columns)} columns")
+    frame.columns = list(RAW_COLUMNS)
+    return frame
+
+# --- NumPy (.npy) ---
+
+def decode_npy(body):
+    """Returns the array of an .npy payload as a read-only view of 'body' (no copy)."""
+    header = io.BytesIO(body)
+    version = np.lib.format.read_magic(header)
+    if version == (1, 0):
+        shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(header)
+    elif version == (2, 0):
+        shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(header)
+    else:
+        return np.load(header, allow_pickle=False)
+    if dtype.hasobject:
+        raise ValueError("Object arrays are not accepted.")
+    count = int(np.prod(shape)) if shape else 1
+    array = np.frombuffer(body, dtype=dtype, count=count, offset=header.tell())
+    return array.reshape(shape, order='F' if fortran_order else 'C')
+
+def encode_npy(array):
+    buffer = io.BytesIO()
+    np.save(buffer, np.asarray(array), allow_pickle=False)
+    return buffer.getvalue()
+
+# --- RecordIO-protobuf ---
+# Minimal codec for SageMaker's Record message, so no protobuf package is needed:
+#   Record { map<string, Value> features = 1; map<string, Value> label = 2; }
+#   Value  { Float32Tensor float32_tensor = 2; Float64Tensor float64_tensor = 3;
+#            Int32Tensor int32_tensor = 7; }
+#   *Tensor { repeated values = 1 [packed]; repeated uint64 keys = 2 [packed];
+#             repeated uint64 shape = 3 [packed]; }
+
+TENSOR_DTYPES = {2: '<f4', 3: '<f8'}   # Value field -> dtype of packed fixed-size values
+INT32_TENSOR = 7
+
+def read_varint(buf, pos):
+    result = shift = 0
+    while True:
+        byte = buf[pos]
+        pos += 1
+        result |= (byte & 0x7f) << shift
+        if not byte & 0x80:
+            return result, pos
+        shift += 7
+
+def iter_fields(buf, start, end):
+    """Yields (field number, wire type, start, end) of a message; varints as (value, None)."""
+    pos = start
+    while pos < end:
+        key, pos = read_varint(buf, pos)
+        field, wire_type = key >> 3, key & 7
+        if wire_type == 0:
+            value, pos = read_varint(buf, pos)
+            yield field, wire_type, value, None
+        elif wire_type == 2:
+            length, pos = read_varint(buf, pos)
+            yield field, wire_type, pos, pos + length
+            pos += length
+        elif wire_type in (1, 5):
+            size = 8 if wire_type == 1 else 4
+            yield field, wire_type, pos, pos + size
+            pos += size
+        else:
+            raise ValueError(f"Unsupported protobuf wire type {wire_type}")
+
+def read_packed_varints(buf, start, end):
+    values, pos = [], start
+    while pos < end:
+        value, pos = read_varint(buf, pos)
+        values.append(value)
+    return values
+
+def decode_tensor(buf, start, end, value_field):
+    """Returns (values, keys, shape) of a tensor; packed float values are views of 'buf'."""
+    dtype = TENSOR_DTYPES.get(value_field)
+    values, keys, shape = None, [], []
+    for field, wire_type, field_start, field_end in iter_fields(buf, start, end):
+        if field == 1 and wire_type == 2 and dtype:
+            itemsize = np.dtype(dtype).itemsize
+            values = np.frombuffer(buf, dtype=dtype, count=(field_end - field_start) // itemsize, offset=field_start)
+        elif field == 1 and wire_type == 2:
+            # int32 values are varints; negative ones are 64-bit two's complement
+            values = np.array(read_packed_varints(buf, field_start, field_end), dtype=np.uint64).astype(np.int32)
+        elif field == 1:
+            raise ValueError("Unpacked tensor values are not supported.")
+        elif field == 2:
+            keys.extend(read_packed_varints(buf, field_start, field_end) if wire_type == 2 else [field_start])
+        elif field == 3:
+            shape.extend(read_packed_varints(buf, field_start, field_end) if wire_type == 2 else [field_start])
+    if values is None:
+        values = np.empty(0, dtype=dtype or np.int32)
+    return values, keys, shape
+
+def decode_value(buf, start, end):
+    """Returns a Value's tensor as a dense 1-D array (sparse tensors are expanded)."""
+    for field, wire_type, field_start, field_end in iter_fields(buf, start, end):
+        if field in TENSOR_DTYPES or field == INT32_TENSOR:
+            values, keys, shape = decode_tensor(buf, field_start, field_end, field)
+            if not keys:
+                return values
+            dense = np.zeros(shape[0] if shape else max(keys) + 1, dtype=values.dtype)
+            dense[keys] = values
+            return dense
+    raise ValueError("Record value holds no numeric tensor.")
+
+def find_feature(buf, start, end, feature_key=FEATURES_KEY):
+    """Returns the (start, end) of the Value of a record's feature, or None."""
+    for field, wire_type, entry_start, entry_end in iter_fields(buf, start, end):
+        if field != 1:
+            continue
+        key, value = None, None
+        for entry_field, _, value_start, value_end in iter_fields(buf, entry_start, entry_end):
+            if entry_field == 1:
+                key = bytes(buf[value_start:value_end]).decode('utf-8')
+            elif entry_field == 2:
+                value = (value_start, value_end)
+        if key == feature_key and value is not None:
+            return value
+    return None
+
+def decode_record(buf, start, end, feature_key=FEATURES_KEY):
+    value = find_feature(buf, start, end, feature_key)
+    if value is None:
+        raise ValueError(f"Record has no '{feature_key}' feature.")
+    return decode_value(buf, *value)
+
+def dense_values_location(buf, start, end):
+    """Returns (offset, count) of a record's packed dense float32 'values', or None."""
+    value = find_feature(buf, start, end)
+    if value is None:
+        return None
+    for field, _, tensor_start, tensor_end in iter_fields(buf, *value):
+        if field != 2:
+            return None
+        location = None
+        for tensor_field, wire_type, field_start, field_end in iter_fields(buf, tensor_start, tensor_end):
+            if tensor_field != 1 or wire_type != 2:
+                return None   # Sparse (keys / shape) or unpacked
+            location = (field_start, (field_end - field_start) // 4)
+        return location
+    return None
+
+def iter_recordio(buf):
+    """Yields the (start, end) of every record of a RecordIO payload."""
+    pos = 0
+    while pos < len(buf):
+        magic, length = struct.unpack_from('<II', buf, pos)
+        if magic != RECORDIO_MAGIC:
+            raise ValueError(f"Invalid RecordIO magic number at byte {pos}")
+        length &= RECORDIO_LENGTH_MASK
+        start = pos + 8
+        yield start, start + length
+        pos = start + length + (-length % 4)
+
+def dense_recordio_view(body):
+    """
+    Fast path for the usual payload, records that only differ in their dense
+    float32 'values': returns them as a 2-D view of 'body' (strided over the
+    records, no copy), or None when the records are not laid out alike.
+    """
+    if len(body) < 8:
+        return None
+    magic, length = struct.unpack_from('<II', body, 0)
+    length &= RECORDIO_LENGTH_MASK
+    stride = 8 + length + (-length % 4)
+    if magic != RECORDIO_MAGIC or len(body) % stride:
+        return None
+    location = dense_values_location(body, 8, 8 + length)
+    if location is None:
+        return None
+    offset, count = location
+    records = np.ndarray((len(body) // stride, stride), dtype=np.uint8, buffer=body)
+    # Every byte but the values (frame header, protobuf tags, lengths, padding) must match the first record
+    layout = np.concatenate([records[:, :offset], records[:, offset + count * 4:]], axis=1)
+    if not (layout == layout[0]).all():
+        return None
+    return np.ndarray((len(records), count), dtype='<f4', buffer=body, offset=offset, strides=(stride, 4))
+
+def decode_recordio_protobuf(body):
+    """Returns the 'values' features of every record as a 2-D array."""
+    view = dense_recordio_view(body)
+    if view is not None:
+        return view
+    rows = [decode_record(body, start, end) for start, end in iter_recordio(body)]
+    if not rows:
+        raise ValueError("Empty RecordIO payload.")
+    return np.stack(rows)
+
+def encode_varint(value):
+    out = bytearray()
+    while True:
+        byte = value & 0x7f
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+def encode_field(field, payload):
+    """Encodes a length-delimited field."""
+    return encode_varint(field << 3 | 2) + encode_varint(len(payload)) + payload
+
+def encode_record(values, map_field=1, key=FEATURES_KEY):
+    """Encodes a 1-D array as a Record with one float32 tensor in 'features' (1) or 'label' (2)."""
+    tensor = encode_field(1, np.asarray(values, dtype='<f4').tobytes())
+    entry = encode_field(1, key.encode('utf-8')) + encode_field(2, encode_field(2, tensor))
+    return encode_field(map_field, entry)
+
+def encode_recordio_protobuf(rows, map_field=1, key=FEATURES_KEY):
+    """
+    Encodes the rows of a 2-D array (or scalars) as RecordIO framed Records.
+    All records share one layout, so a template record is repeated and only
+    its trailing float32 values are filled in, for all rows at once.
+    """
+    rows = np.ascontiguousarray(rows, dtype='<f4')   # Row-major, whatever the input's memory order
+    rows = rows.reshape(len(rows), int(np.prod(rows.shape[1:])))
+    count = rows.shape[1]
+    record = encode_record(np.zeros(count), map_field, key)   # The values are its last bytes
+    template = struct.pack('<II', RECORDIO_MAGIC, len(record)) + record + b'\x00' * (-len(record) % 4)
+    out = np.empty((len(rows), len(template)), dtype=np.uint8)
+    out[:] = np.frombuffer(template, dtype=np.uint8)
+    values_end = 8 + len(record)
+    out[:, values_end - count * 4:values_end] = rows.view(np.uint8)
+    return out.tobytes()
+
+# --- JSON ---
+
+def decode_json_rows(rows, payload='JSON'):
+    rows = list(rows or ())
+    if not rows:
+        raise ValueError(f"Empty {payload} payload.")
+    if all(isinstance(row, dict) and 'features' not in row for row in rows):
+        return pd.DataFrame.from_records(rows)   # Raw user records
+    return np.asarray([row['features'] if isinstance(row, dict) else row for row in rows], dtype=float)
+
+def decode_json(text):
+    if not text.strip():
+        raise ValueError("Empty JSON payload.")
+    data = json.loads(text)
+    if isinstance(data, dict):
+        data = data.get('instances', data.get('features'))
+    return decode_json_rows(data)
+
+def decode_jsonlines(text):
+    return decode_json_rows((json.loads(line) for line in text.splitlines() if line.strip()), 'JSON Lines')
+
+# --- Micro-batcher ---
+
+class MicroBatcher:
+    """
+    Groups concurrent predict requests into one call of 'predict'. Callers
+    block in predict() until the batch holding their rows has been predicted;
+    errors are raised in every caller of the failed batch.
+    """
+
+    def __init__(self, predict, max_rows=256, max_wait=0.005):
+        self._predict = predict
+        self.max_rows = max_rows
+        self.max_wait = max_wait
+        self.batches = 0
+        self.requests_served = 0
+        self._requests = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def predict(self, data):
+        future = Future()
+        self._requests.put((np.asarray(data), future))
+        return future.result()
+
+    def _run(self):
+        while True:
+            pending = [self._requests.get()]
+            rows = len(pending[0][0])
+            deadline = time.monotonic() + self.max_wait
+            while rows < self.max_rows:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    request = self._requests.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                pending.append(request)
+                rows += len(request[0])
+            self._predict_batch(pending)
+
+    def _predict_batch(self, pending):
+        # Requests with different row shapes cannot share a predict call
+        groups = {}
+        for data, future in pending:
+            groups.setdefault(data.shape[1:], []).append((data, future))
+        for group in groups.values():
+            try:
+                predictions = self._predict(np.concatenate([data for data, _ in group]))
+                offsets = np.cumsum([len(data) for data, _ in group])[:-1]
+                for (_, future), prediction in zip(group, np.split(predictions, offsets)):
+                    future.set_result(prediction)
+            except Exception as e:
+                for _, future in group:
+                    future.set_exception(e)
+            self.batches += 1
+            self.requests_served += len(group)
+
+_batchers = {}
+_batchers_lock = threading.Lock()
+
+def get_batcher(model):
+    """Returns the micro-batcher of a model, creating it on first use."""
+    with _batchers_lock:
+        if id(model) not in _batchers:
+            _batchers[id(model)] = MicroBatcher(model.predict, MICRO_BATCH_MAX_ROWS, MICRO_BATCH_MAX_WAIT_MS / 1000)
+        return _batchers[id(model)]
+
+_preloaded_models = {}
+_transformers = {}
+
+def load_model(model_dir, mmap_mode='r'):
+    """
+    Loads a model with its arrays memory-mapped (compressed files are read in
+    full), and the preprocessing transformer packaged with it, if any.
+    """
+    model = joblib.load(os.path.join(model_dir, MODEL_FILE), mmap_mode=mmap_mode)
+    transformer_path = os.path.join(model_dir, TRANSFORMER_FILE)
+    if os.path.exists(transformer_path):
+        _transformers[id(model)] = joblib.load(transformer_path)
+    return model
+
+def get_transformer(model):
+    """Returns the preprocessing transformer packaged with a model, or None."""
+    return _transformers.get(id(model))
+
+def preload_model(model_dir=MODEL_DIR):
+    """Loads the model before the workers are forked, if it is there."""
+    if os.path.exists(os.path.join(model_dir, MODEL_FILE)):
+        _preloaded_models[model_dir] = load_model(model_dir)
+        print(f"Preloaded model from {model_dir}")
+
+# --- SageMaker serving functions ---
+
 def model_fn(model_dir):
-    """Loads the model from the disk."""
+    """Loads the model from the disk (or returns the preloaded one)."""
+    if model_dir in _preloaded_models:
+        return _preloaded_models[model_dir]
     try:
-        model = joblib.load(os.path.join(model_dir, "model.joblib"))
+        model = load_model(model_dir)
         return model
     except Exception as e:
         print(f"Error loading model: {e}")
@@ -16,20 +438,67 @@ def model_fn(model_dir):
 
 def input_fn(request_body, request_content_type):
     """Deserializes the input data from an inference request."""
-    if request_content_type == 'text/csv':
-        return pd.read_csv(io.StringIO(request_body), header=None).values
+    content_type = base_content_type(request_content_type)
+    if content_type == CSV:
+        return decode_csv(as_text(request_body))
+    elif content_type == PARQUET:
+        return pd.read_parquet(io.BytesIO(as_bytes(request_body)))
+    elif content_type == NPY:
+        return decode_npy(as_bytes(request_body))
+    elif content_type == RECORDIO_PROTOBUF:
+        return decode_recordio_protobuf(as_bytes(request_body))
+    elif content_type in JSONLINES:
+        return decode_jsonlines(as_text(request_body))
+    elif content_type == JSON:
+        return decode_json(as_text(request_body))
     else:
         raise ValueError(f"Unsupported content type: {request_content_type}")
 
+def model_input(input_data, model):
+    """
+    Transforms raw user records (DataFrames) with the model's transformer, then
+    casts the input to the dtype the model was fitted with (fitted k-means
+    cannot predict float32 input when fitted on float64); no copy when it already matches.
+    """
+    if isinstance(input_data, pd.DataFrame):
+        transformer = get_transformer(model)
+        if transformer is not None:
+            input_data = transformer.transform(input_data)
+        elif all(pd.api.types.is_numeric_dtype(dtype) for dtype in input_data.dtypes):
+            input_data = input_data.drop(columns=[c for c in DEFAULT_EXCLUDE_COLUMNS if c in input_data]).to_numpy()
+        else:
+            raise ValueError("User records need the preprocessing transformer, which is not packaged with the model")
+    centers = getattr(model, 'cluster_centers_', None)
+    return np.asarray(input_data, dtype=centers.dtype if centers is not None else np.float64)
+
 def predict_fn(input_data, model):
     """Makes a prediction on the input data."""
     if model is None:
         raise ValueError("Model not loaded")
+    input_data = model_input(input_data, model)
+    if MICRO_BATCH_MAX_ROWS > 0:
+        return get_batcher(model).predict(input_data)
     return model.predict(input_data)
 
 def output_fn(prediction, response_content_type):
     """Serializes the prediction output to the desired response format."""
-    if response_content_type == 'application/json':
+    content_type = base_content_type(response_content_type)
+    if content_type == JSON:
         return json.dumps(prediction.tolist())
+    elif content_type == CSV:
+        # One line per input record, so batch transform can join it back (JoinSource=Input)
+        return '\n'.join(str(value) for value in prediction.tolist()) + '\n'
+    elif content_type in JSONLINES:
+        return '\n'.join(json.dumps(value) for value in prediction.tolist()) + '\n'
+    elif content_type == NPY:
+        return encode_npy(prediction)
+    elif content_type == RECORDIO_PROTOBUF:
+        return encode_recordio_protobuf(prediction, map_field=2, key=PREDICTION_LABEL)
     else:
         raise ValueError(f"Unsupported content type: {response_content_type}")
+
+if PRELOAD_MODEL:
+    try:
+        preload_model()
+    except Exception as e:
+        print(f"Error preloading model: {e}")
@@ -1,34 +1,96 @@
-
 import argparse
 import os
+import time
+
+import joblib
 import pandas as pd
-from sklearn.preprocessing import StandardScaler
+
+from features import DEFAULT_MAX_CATEGORIES, RAW_COLUMNS, TRANSFORMER_FILE, UserFeatureTransformer
+from shards import DEFAULT_BATCH_SIZE, list_shards, shard_format
+from warm_start import load_previous_artifact
+
+# Streams the ml-data-prep user records twice, one batch at a time: a first
+# pass accumulates the transformer's statistics (skipped when a saved
+# transformer is given, e.g. the one packaged with the previous model, to keep
+# its feature space for a warm-started retrain), a second one writes the float32 feature rows as
+# Parquet shards (one per input shard, with user_id kept for joining back),
+# next to the fitted transformer.joblib that train.py packages with the model.
+
+ID_COLUMN = 'user_id'
+
+def iter_record_batches(path, batch_size):
+    """Yields DataFrames of at most 'batch_size' user records from a Parquet or CSV (with header) shard."""
+    if shard_format(path) == 'parquet':
+        import pyarrow.parquet as pq
+        parquet_file = pq.ParquetFile(path)
+        columns = [name for name in (ID_COLUMN,) + RAW_COLUMNS if name in parquet_file.schema_arrow.names]
+        for record_batch in parquet_file.iter_batches(batch_size=batch_size, columns=columns):
+            yield record_batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=batch_size)
+
+def fit_transformer(shards, batch_size, as_of=None, max_categories=DEFAULT_MAX_CATEGORIES):
+    transformer = UserFeatureTransformer(as_of=as_of, max_categories=max_categories)
+    rows = 0
+    for path in shards:
+        for records in iter_record_batches(path, batch_size):
+            transformer.partial_fit(records)
+            rows += len(records)
+    print(f"Fitted the transformer on {rows} records")
+    return transformer.finalize()
+
+def write_features(transformer, path, output_path, batch_size):
+    """Writes the feature rows of one input shard as a Parquet file; returns the row count."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    writer, rows = None, 0
+    try:
+        for records in iter_record_batches(path, batch_size):
+            features = transformer.transform(records)
+            columns = {ID_COLUMN: records[ID_COLUMN].to_numpy()} if ID_COLUMN in records else {}
+            columns.update(zip(transformer.feature_names, features.T))
+            table = pa.table(columns)
+            if writer is None:
+                writer = pq.ParquetWriter(output_path, table.schema)
+            writer.write_table(table)
+            rows += len(records)
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
-    # TODO: Add arguments for input and output paths
-    # Example:
-    # parser.add_argument('--input-data-path', type=str, default='/opt/ml/processing/input')
-    # parser.add_argument('--output-data-path', type=str, default='/opt/ml/processing/output')
+    parser.add_argument('--input-data-path', type=str, default='/opt/ml/processing/input')
+    parser.add_argument('--output-data-path', type=str, default='/opt/ml/processing/output')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument('--as-of', type=str, default='', help='Recency reference date (default: today, UTC)')
+    parser.add_argument('--max-categories', type=int, default=DEFAULT_MAX_CATEGORIES)
+    parser.add_argument('--transformer-path', type=str, default='', help='Saved transformer to reuse instead of fitting')
+    parser.add_argument('--previous-model-path', type=str, default='',
+                        help="Previous model (directory or model.tar.gz) whose transformer to reuse instead of fitting")
     args = parser.parse_args()
 
     print("Starting preprocessing job")
+    start = time.perf_counter()
+    shards = list_shards(args.input_data_path)
 
-    # TODO: Load data from input path
-    # input_file = os.path.join(args.input_data_path, 'your_data.csv')
-    # df = pd.read_csv(input_file)
-
-    # --- Placeholder Preprocessing Logic ---
-    # This is where you would put your data cleaning, feature engineering, etc.
-    # For example, scaling numerical features.
-    
-    # scaler = StandardScaler()
-    # df[['numeric_feature_1', 'numeric_feature_2']] = scaler.fit_transform(df[['numeric_feature_1', 'numeric_feature_2']])
-    
-    # --- End of Placeholder Logic ---
+    if args.transformer_path:
+        transformer = joblib.load(args.transformer_path)
+        print(f"Reusing the transformer from {args.transformer_path} (as of {transformer.as_of.date()})")
+    elif args.previous_model_path:
+        transformer = load_previous_artifact(args.previous_model_path, TRANSFORMER_FILE)
+        print(f"Reusing the previous model's transformer (as of {transformer.as_of.date()})")
+    else:
+        transformer = fit_transformer(shards, args.batch_size, args.as_of or None, args.max_categories)
+    print(f"Features: {transformer.feature_names}")
 
-    # TODO: Save the processed data to the output path
-    # output_file = os.path.join(args.output_data_path, 'train.csv')
-    # df.to_csv(output_file, header=False, index=False)
+    os.makedirs(args.output_data_path, exist_ok=True)
+    rows = 0
+    for index, path in enumerate(shards):
+        rows += write_features(transformer, path, os.path.join(args.output_data_path, f"part-{index:05d}.parquet"),
+                               args.batch_size)
+    joblib.dump(transformer, os.path.join(args.output_data_path, TRANSFORMER_FILE))
 
+    print(f"Wrote {rows} feature rows in {len(shards)} shard(s) in {time.perf_counter() - start:.1f} s")
     print("Finished preprocessing job")
@@ -0,0 +1,131 @@
+
+import os
+
+import numpy as np
+import pandas as pd
+
+# --- Training data shards ---
+# Streams the feature rows of every Parquet / CSV shard under a SageMaker
+# channel directory (File or FastFile input mode, where shards are plain files)
+# or from a Pipe mode FIFO (CSV only: the FIFO concatenates the channel's
+# objects into one stream, which Parquet cannot be read from). Rows come out
+# as NumPy arrays of at most 'batch_size' rows, so memory depends on the batch
+# size, not on the number of rows.
+# Parquet shards (as written by the ml-data-prep Glue job) contribute their
+# numeric columns, except the excluded identifier columns; CSV shards have no
+# header and hold only feature columns, as train.csv did.
+
+PARQUET_SUFFIXES = ('.parquet', '.parq')
+CSV_SUFFIXES = ('.csv',)
+DEFAULT_BATCH_SIZE = 65536
+DEFAULT_EXCLUDE_COLUMNS = ('user_id',)
+
+def shard_format(path):
+    name = os.path.basename(path).lower()
+    if name.endswith(PARQUET_SUFFIXES):
+        return 'parquet'
+    if name.endswith(CSV_SUFFIXES):
+        return 'csv'
+    return None
+
+def list_shards(channel_dir):
+    """Returns the Parquet / CSV files under a channel directory, in path order."""
+    shards = []
+    for root, dirs, files in os.walk(channel_dir):
+        dirs[:] = [d for d in dirs if not d.startswith(('.', '_'))]
+        shards.extend(
+            os.path.join(root, name) for name in files
+            if not name.startswith(('.', '_')) and shard_format(name)
+        )
+    if not shards:
+        raise ValueError(f"No Parquet or CSV shards found under {channel_dir}")
+    return sorted(shards)
+
+def numeric_columns(parquet_path, exclude=DEFAULT_EXCLUDE_COLUMNS):
+    """Returns the numeric column names of a Parquet file, without the excluded ones."""
+    import pyarrow.parquet as pq
+    import pyarrow.types as pa_types
+    schema = pq.read_schema(parquet_path)
+    return [
+        field.name for field in schema
+        if field.name not in exclude and (
+            pa_types.is_integer(field.type) or pa_types.is_floating(field.type) or pa_types.is_decimal(field.type)
+        )
+    ]
+
+def iter_parquet_batches(path, batch_size, columns, dtype):
+    import pyarrow.parquet as pq
+    for record_batch in pq.ParquetFile(path).iter_batches(batch_size=batch_size, columns=columns):
+        yield np.column_stack([
+            record_batch.column(name).to_numpy(zero_copy_only=False).astype(dtype, copy=False)
+            for name in columns
+        ])
+
+def iter_csv_batches(path_or_file, batch_size, dtype):
+    for chunk in pd.read_csv(path_or_file, header=None, chunksize=batch_size, dtype=dtype):
+        yield chunk.to_numpy(dtype=dtype)
+
+def rebatch(arrays, batch_size):
+    """Regroups arrays of any number of rows into batches of exactly 'batch_size' rows (but the last)."""
+    pending, pending_rows = [], 0
+    for array in arrays:
+        while len(array):
+            take = min(batch_size - pending_rows, len(array))
+            pending.append(array[:take])
+            pending_rows += take
+            array = array[take:]
+            if pending_rows == batch_size:
+                yield pending[0] if len(pending) == 1 else np.concatenate(pending)
+                pending, pending_rows = [], 0
+    if pending_rows:
+        yield pending[0] if len(pending) == 1 else np.concatenate(pending)
+
+class ShardReader:
+    """
+    Reads a channel's feature rows in bounded batches, as many times as needed
+    (one pass per epoch). Rows with missing values are skipped and counted in
+    'skipped_rows' (for the last pass).
+    """
+
+    def __init__(self, channel_dir, batch_size=DEFAULT_BATCH_SIZE, dtype=np.float32, columns=None,
+                 exclude=DEFAULT_EXCLUDE_COLUMNS, pipe=False):
+        self.channel_dir = channel_dir
+        self.batch_size = batch_size
+        self.dtype = np.dtype(dtype)
+        self.pipe = pipe
+        self.shards = [] if pipe else list_shards(channel_dir)
+        parquet_shards = [path for path in self.shards if shard_format(path) == 'parquet']
+        self.columns = columns or (numeric_columns(parquet_shards[0], exclude) if parquet_shards else None)
+        self.skipped_rows = 0
+
+    def _iter_shard_arrays(self, epoch):
+        if self.pipe:
+            # Pipe mode opens a new FIFO per pass: <channel>_<epoch>
+            with open(f"{self.channel_dir}_{epoch}", 'rb') as fifo:
+                yield from iter_csv_batches(fifo, self.batch_size, self.dtype)
+            return
+        for path in self.shards:
+            if shard_format(path) == 'parquet':
+                yield from iter_parquet_batches(path, self.batch_size, self.columns, self.dtype)
+            else:
+                yield from iter_csv_batches(path, self.batch_size, self.dtype)
+
+    def _drop_missing(self, arrays):
+        for array in arrays:
+            complete = ~np.isnan(array).any(axis=1)
+            if not complete.all():
+                self.skipped_rows += int((~complete).sum())
+                array = array[complete]
+            yield array
+
+    def iter_batches(self, epoch=0):
+        """Yields the feature rows of one pass in batches of 'batch_size' rows."""
+        self.skipped_rows = 0
+        yield from rebatch(self._drop_missing(self._iter_shard_arrays(epoch)), self.batch_size)
+
+    def read_all(self, epoch=0):
+        """Returns every feature row as one array (full-batch training)."""
+        batches = list(self.iter_batches(epoch))
+        if not batches:
+            raise ValueError(f"No feature rows found under {self.channel_dir}")
+        return np.concatenate(batches)
@@ -0,0 +1,131 @@
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.metrics import pairwise_distances, silhouette_score
+from threadpoolctl import threadpool_limits
+
+# --- k sweep ---
+# Fits one model per candidate number of clusters in a process pool and scores
+# each with its inertia and a sampled silhouette. The shared work is done once
+# before the pool starts: the feature rows are streamed into one on-disk
+# matrix that every worker memory-maps read-only (the page cache holds a
+# single copy), and the pairwise distances of the silhouette sample are
+# computed once and memory-mapped as well. Each worker runs single-threaded
+# BLAS/OpenMP, so the sweep scales with processes, one per core.
+
+DEFAULT_SILHOUETTE_SAMPLE = 4000
+FEATURES_FILE = 'features.bin'
+DISTANCES_FILE = 'silhouette_distances.npy'
+SWEEP_METRICS = ('silhouette', 'inertia')
+# Initializations per k: with a single one, a k stuck in a local minimum scores
+# worse than its neighbours and the comparison between k values is noise
+DEFAULT_N_INIT = 3
+
+def parse_k_values(spec):
+    """'2-10' -> 2..10, '2-10:2' -> 2, 4, .., 10, '3,5,8' -> 3, 5, 8"""
+    values = []
+    for part in spec.split(','):
+        part = part.strip()
+        if '-' in part:
+            bounds, _, step = part.partition(':')
+            low, high = (int(bound) for bound in bounds.split('-'))
+            values.extend(range(low, high + 1, int(step or 1)))
+        elif part:
+            values.append(int(part))
+    if not values or min(values) < 2:
+        raise ValueError(f"Invalid k range '{spec}': every k must be at least 2")
+    return sorted(set(values))
+
+def write_feature_matrix(reader, path):
+    """Streams a ShardReader's rows into a raw row-major file; returns its (rows, features)."""
+    rows, features = 0, None
+    with open(path, 'wb') as f:
+        for batch in reader.iter_batches():
+            f.write(np.ascontiguousarray(batch).tobytes())
+            rows, features = rows + len(batch), batch.shape[1]
+    if not rows:
+        raise ValueError("No feature rows to sweep over")
+    return rows, features
+
+def open_feature_matrix(path, shape, dtype):
+    return np.memmap(path, dtype=dtype, mode='r', shape=shape)
+
+def precompute_silhouette(features, sample_size, path, random_state=None):
+    """Picks the silhouette sample and stores its pairwise distances; returns the sample's row indices."""
+    rng = np.random.default_rng(random_state)
+    sample = np.sort(rng.choice(len(features), min(sample_size, len(features)), replace=False))
+    np.save(path, pairwise_distances(features[sample]).astype(np.float32))
+    return sample
+
+def evaluate_k(task):
+    """Worker: fits and scores one k against the memory-mapped matrices."""
+    with threadpool_limits(limits=1):
+        features = open_feature_matrix(task['features_path'], task['shape'], task['dtype'])
+        start = time.perf_counter()
+        if task['training_mode'] == 'streaming':
+            # partial_fit alone initializes once and ignores n_init, so the first
+            # batch is fit with fit() (best of n_init initializations) and the
+            # rest are streamed in with partial_fit
+            batch_size = task['batch_size']
+            model = MiniBatchKMeans(n_clusters=task['k'], batch_size=batch_size,
+                                    n_init=task['n_init'], random_state=task['random_state'])
+            model.fit(features[:batch_size])
+            for epoch in range(task['epochs']):
+                for offset in range(batch_size if epoch == 0 else 0, len(features), batch_size):
+                    model.partial_fit(features[offset:offset + batch_size])
+            inertia = float(sum(
+                -model.score(features[offset:offset + task['batch_size']])
+                for offset in range(0, len(features), task['batch_size'])
+            ))
+        else:
+            model = KMeans(n_clusters=task['k'], n_init=task['n_init'],
+                           random_state=task['random_state']).fit(features)
+            inertia = float(model.inertia_)
+        fit_seconds = time.perf_counter() - start
+
+        distances = np.load(task['distances_path'], mmap_mode='r')
+        labels = model.predict(features[task['sample']])
+        if 1 < len(np.unique(labels)) < len(labels):
+            silhouette = float(silhouette_score(distances, labels, metric='precomputed'))
+        else:
+            silhouette = float('nan')
+    return {'k': task['k'], 'inertia': inertia, 'silhouette': silhouette, 'fit_seconds': fit_seconds}, model
+
+def run_sweep(reader, k_values, work_dir, training_mode='full', max_workers=None, metric='silhouette',
+              silhouette_sample=DEFAULT_SILHOUETTE_SAMPLE, epochs=3, n_init=DEFAULT_N_INIT, random_state=None):
+    """
+    Evaluates every k in a process pool. Returns (results DataFrame sorted by
+    k, best k, best model); the best k has the highest silhouette (or the
+    lowest inertia with metric='inertia').
+    """
+    if metric not in SWEEP_METRICS:
+        raise ValueError(f"Unknown sweep metric: {metric}")
+    features_path = os.path.join(work_dir, FEATURES_FILE)
+    distances_path = os.path.join(work_dir, DISTANCES_FILE)
+    shape = write_feature_matrix(reader, features_path)
+    features = open_feature_matrix(features_path, shape, reader.dtype)
+    sample = precompute_silhouette(features, silhouette_sample, distances_path, random_state)
+    print(f"Sweeping k over {k_values}: {shape[0]} rows x {shape[1]} features, "
+          f"silhouette sample of {len(sample)} rows")
+
+    tasks = [{
+        'k': k, 'features_path': features_path, 'shape': shape, 'dtype': reader.dtype.str,
+        'distances_path': distances_path, 'sample': sample, 'training_mode': training_mode,
+        'batch_size': reader.batch_size, 'epochs': epochs, 'n_init': n_init, 'random_state': random_state,
+    } for k in sorted(k_values, reverse=True)]   # Largest k (slowest) first, for a better balance
+    max_workers = max(1, min(max_workers or os.cpu_count() or 1, len(tasks)))
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        evaluated = list(executor.map(evaluate_k, tasks))
+
+    results = pd.DataFrame([result for result, _ in evaluated]).sort_values('k').reset_index(drop=True)
+    models = {result['k']: model for result, model in evaluated}
+    if metric == 'silhouette' and results['silhouette'].notna().any():
+        best_k = int(results.loc[results['silhouette'].idxmax(), 'k'])
+    else:
+        best_k = int(results.loc[results['inertia'].idxmin(), 'k'])
+    return results, best_k, models[best_k]
@@ -1,50 +1,192 @@
 
 import argparse
+import json
 import os
+import shutil
+import sys
+import tempfile
+import time
 import pandas as pd
-from sklearn.cluster import KMeans
+from sklearn.cluster import KMeans, MiniBatchKMeans
 import joblib
 
+from features import TRANSFORMER_FILE
+from shards import ShardReader, DEFAULT_BATCH_SIZE
+from sweep import DEFAULT_SILHOUETTE_SAMPLE, SWEEP_METRICS, parse_k_values, run_sweep
+from warm_start import DEFAULT_DRIFT_THRESHOLD, DEFAULT_SAMPLE_FRACTION, align_clusters, try_warm_start
+
+# 'full' loads every row and fits KMeans; 'streaming' fits MiniBatchKMeans with
+# partial_fit over bounded batches, so memory does not grow with the row count
+TRAINING_MODES = ('full', 'streaming')
+
+def channel_input_mode(channel):
+    """Returns a channel's TrainingInputMode ('File', 'FastFile' or 'Pipe')."""
+    config = json.loads(os.environ.get('SM_INPUT_DATA_CONFIG') or '{}')
+    return config.get(channel, {}).get('TrainingInputMode', 'File')
+
+def fit_full(reader, n_clusters, random_state=None, first_epoch=0):
+    data = reader.read_all(first_epoch)
+    print(f"Loaded {len(data)} rows x {data.shape[1]} features ({data.nbytes / 1024 ** 2:.1f} MB)")
+    return KMeans(n_clusters=n_clusters, random_state=random_state).fit(data)
+
+def fit_streaming(reader, n_clusters, epochs=3, random_state=None, first_epoch=0):
+    """Fits MiniBatchKMeans with one partial_fit call per batch, over 'epochs' passes."""
+    model = MiniBatchKMeans(n_clusters=n_clusters, batch_size=reader.batch_size, random_state=random_state)
+    for epoch in range(first_epoch, first_epoch + epochs):
+        rows = 0
+        for batch in reader.iter_batches(epoch):
+            model.partial_fit(batch)
+            rows += len(batch)
+        print(f"Epoch {epoch - first_epoch + 1}/{epochs}: {rows} rows, {reader.skipped_rows} skipped (missing values)")
+    return model
+
+def streaming_inertia(model, reader, epoch):
+    """Sum of squared distances of every row to its closest centroid, computed batch by batch."""
+    return float(sum(-model.score(batch) for batch in reader.iter_batches(epoch)))
+
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
 
     # Hyperparameters
     parser.add_argument('--n-clusters', type=int, default=5)
+    parser.add_argument('--training-mode', type=str, default='full', choices=TRAINING_MODES)
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument('--epochs', type=int, default=3)
+    parser.add_argument('--dtype', type=str, default='float32', choices=['float32', 'float64'])
+    parser.add_argument('--feature-columns', type=str, default='', help='Comma-separated Parquet columns (default: numeric)')
+    parser.add_argument('--random-state', type=int, default=None)
+    # Streaming mode: one more pass to report the exact inertia (Pipe mode needs epochs + 1 passes)
+    parser.add_argument('--report-inertia', type=str, default='true')
+    # k sweep: a range of --n-clusters values ('2-10', '2-20:2' or '3,5,8') evaluated in
+    # parallel; the best model is saved and every k's scores go to sweep_results.csv
+    parser.add_argument('--n-clusters-sweep', type=str, default='')
+    parser.add_argument('--sweep-metric', type=str, default='silhouette', choices=SWEEP_METRICS)
+    parser.add_argument('--sweep-workers', type=int, default=None, help='Default: one per CPU')
+    parser.add_argument('--silhouette-sample-size', type=int, default=DEFAULT_SILHOUETTE_SAMPLE)
+    # Warm start: fit from the previous model's centroids on the 'changed' channel plus a sample
+    # of the training channel; full retrain when the centroids drift past the threshold
+    parser.add_argument('--warm-start', type=str, default='false')
+    parser.add_argument('--sample-fraction', type=float, default=DEFAULT_SAMPLE_FRACTION)
+    parser.add_argument('--drift-threshold', type=float, default=DEFAULT_DRIFT_THRESHOLD)
 
     # SageMaker environment variables
     parser.add_argument('--output-data-dir', type=str, default=os.environ.get('SM_OUTPUT_DATA_DIR'))
     parser.add_argument('--model-dir', type=str, default=os.environ.get('SM_MODEL_DIR'))
-    parser.add_argument('--train', type=str, default=os.environ.get('SM_CHANNEL_TRAIN'))
+    parser.add_argument('--channel', type=str, default='training')
+    parser.add_argument('--train', type=str,
+                        default=os.environ.get('SM_CHANNEL_TRAINING', os.environ.get('SM_CHANNEL_TRAIN')))
+    parser.add_argument('--changed', type=str, default=os.environ.get('SM_CHANNEL_CHANGED'))
+    parser.add_argument('--previous-model', type=str, default=os.environ.get('SM_CHANNEL_MODEL'))
 
     args = parser.parse_args()
 
     print("Starting training job")
 
-    # Load training data
+    # Stream the training data: every Parquet / CSV shard of the channel
     try:
-        input_file = os.path.join(args.train, 'train.csv')
-        df = pd.read_csv(input_file, header=None)
+        reader = ShardReader(
+            args.train,
+            batch_size=args.batch_size,
+            dtype=args.dtype,
+            columns=[c for c in args.feature_columns.split(',') if c] or None,
+            pipe=channel_input_mode(args.channel) == 'Pipe'
+        )
+        print(f"Training data: {len(reader.shards)} shard(s), features: {reader.columns or 'all CSV columns'}")
     except Exception as e:
         print("Error loading training data:", e)
         # Exit if data is not found
         sys.exit(1)
 
+    # Features written by preprocessing.py come with the transformer that produced them
+    transformer_path = os.path.join(args.train, TRANSFORMER_FILE)
+    feature_names = None
+    if os.path.isfile(transformer_path):
+        feature_names = joblib.load(transformer_path).feature_names
+        if reader.columns is not None and list(reader.columns) != feature_names:
+            print(f"Error: the training features {reader.columns} are not the transformer's {feature_names}")
+            sys.exit(1)
+
     # Train the model (KMeans in this example)
-    kmeans = KMeans(n_clusters=args.n_clusters)
-    kmeans.fit(df)
+    start = time.perf_counter()
+    kmeans, previous, first_epoch = None, None, 0
+    if args.warm_start == 'true' and not args.n_clusters_sweep:
+        changed_reader = ShardReader(
+            args.changed,
+            batch_size=args.batch_size,
+            dtype=args.dtype,
+            columns=reader.columns,
+            pipe=channel_input_mode('changed') == 'Pipe'
+        ) if args.changed else None
+        kmeans, previous, report = try_warm_start(
+            args.previous_model, reader, changed_reader,
+            n_clusters=args.n_clusters,
+            sample_fraction=args.sample_fraction,
+            drift_threshold=args.drift_threshold,
+            random_state=args.random_state,
+            feature_names=feature_names
+        )
+        first_epoch = report['training_passes']   # Pipe mode: FIFOs already read
+        print(f"Warm start: {json.dumps(report)}")
+        if kmeans is None:
+            print(f"Falling back to a full retrain: {report['reason']}")
+        report_dir = args.output_data_dir or args.model_dir
+        os.makedirs(report_dir, exist_ok=True)
+        with open(os.path.join(report_dir, "warm_start_report.json"), "w") as f:
+            json.dump(report, f, indent=2)
 
-    # Save the trained model
+    warm_started = kmeans is not None
+    if warm_started:
+        # Warm-started: fitted on a subset, so the inertia is reported over every row
+        inertia = streaming_inertia(kmeans, reader, first_epoch) if args.report_inertia == 'true' else None
+    elif args.n_clusters_sweep:
+        with tempfile.TemporaryDirectory() as work_dir:
+            results, best_k, kmeans = run_sweep(
+                reader, parse_k_values(args.n_clusters_sweep), work_dir,
+                training_mode=args.training_mode,
+                max_workers=args.sweep_workers,
+                metric=args.sweep_metric,
+                silhouette_sample=args.silhouette_sample_size,
+                epochs=args.epochs,
+                random_state=args.random_state
+            )
+        inertia = float(results.loc[results['k'] == best_k, 'inertia'].iloc[0])
+        print(results.to_string(index=False))
+        print(f"Best n_clusters: {best_k} (by {args.sweep_metric})")
+        results_dir = args.output_data_dir or args.model_dir
+        os.makedirs(results_dir, exist_ok=True)
+        results.to_csv(os.path.join(results_dir, "sweep_results.csv"), index=False)
+    elif args.training_mode == 'streaming':
+        kmeans = fit_streaming(reader, args.n_clusters, args.epochs, args.random_state, first_epoch)
+        inertia = (streaming_inertia(kmeans, reader, first_epoch + args.epochs)
+                   if args.report_inertia == 'true' else None)
+    else:
+        kmeans = fit_full(reader, args.n_clusters, args.random_state, first_epoch)
+        inertia = float(kmeans.inertia_)
+    if not warm_started and previous is not None and kmeans.cluster_centers_.shape == previous.cluster_centers_.shape:
+        # Full retrain after a previous model: keep its segment IDs where the centroids match
+        align_clusters(kmeans, previous.cluster_centers_)
+    print(f"Fit time: {time.perf_counter() - start:.3f} s")
+    if inertia is not None:
+        print(f"Inertia: {inertia}")
+
+    # Save the trained model, uncompressed so that inference can memory-map its
+    # arrays (joblib.load(mmap_mode='r')) and share them between workers
     model_path = os.path.join(args.model_dir, "model.joblib")
-    joblib.dump(kmeans, model_path)
+    joblib.dump(kmeans, model_path, compress=0)
 
     print(f"Model saved to {model_path}")
+
+    # Package the preprocessing transformer with the model, so that inference.py applies the same transform
+    if os.path.isfile(transformer_path):
+        shutil.copy(transformer_path, os.path.join(args.model_dir, TRANSFORMER_FILE))
+        print(f"Transformer saved to {os.path.join(args.model_dir, TRANSFORMER_FILE)}")
     print("Finished training job")
 
 # --- For Inference ---
 
 def model_fn(model_dir):
-    """Loads the model from the disk."""
-    model = joblib.load(os.path.join(model_dir, "model.joblib"))
+    """Loads the model from the disk, its arrays memory-mapped read-only."""
+    model = joblib.load(os.path.join(model_dir, "model.joblib"), mmap_mode='r')
     return model
 
 def input_fn(request_body, request_content_type):
@@ -0,0 +1,146 @@
+
+import os
+import tarfile
+
+import joblib
+import numpy as np
+from sklearn.cluster import KMeans
+from sklearn.metrics import pairwise_distances
+
+from features import TRANSFORMER_FILE
+
+# --- Warm start ---
+# Retrains from the previous model's centroids instead of from scratch, on the
+# new or changed users (their own channel) plus a random sample of every user.
+# Lloyd iterations started from the previous centroids converge in a few
+# steps, and cluster i of the new model is still cluster i of the previous one,
+# so segment IDs stay stable. The previous centroids are only reused in the
+# same feature space: the features must come from a transformer with the same
+# feature names as the one packaged with the previous model (preprocessing.py
+# --previous-model-path reuses that transformer). When the centroids move too
+# far (drift past the threshold), the caller falls back to a full retrain and
+# renumbers its clusters to match the previous centroids as closely as possible.
+
+MODEL_FILE = 'model.joblib'
+MODEL_ARCHIVE = 'model.tar.gz'
+DEFAULT_SAMPLE_FRACTION = 0.1
+# Largest allowed centroid shift, relative to the distance between the
+# centroid's previous position and the nearest other previous centroid
+DEFAULT_DRIFT_THRESHOLD = 0.25
+
+def load_previous_artifact(path, file_name=MODEL_FILE):
+    """Loads a joblib file from a directory, or from the model.tar.gz artifact of a training job in it."""
+    if not path:
+        raise FileNotFoundError("No previous model directory (--previous-model or the 'model' channel)")
+    for root, _, files in os.walk(path):
+        if file_name in files:
+            return joblib.load(os.path.join(root, file_name))
+        if MODEL_ARCHIVE in files:
+            with tarfile.open(os.path.join(root, MODEL_ARCHIVE)) as archive:
+                for member in archive.getmembers():
+                    if member.isfile() and os.path.basename(member.name) == file_name:
+                        return joblib.load(archive.extractfile(member))
+    raise FileNotFoundError(f"No {file_name} found under {path}, directly or in a {MODEL_ARCHIVE}")
+
+def load_previous_model(path):
+    """Loads the previous model (model.joblib)."""
+    return load_previous_artifact(path, MODEL_FILE)
+
+def load_previous_transformer(path):
+    """Returns the preprocessing transformer packaged with the previous model, or None."""
+    try:
+        return load_previous_artifact(path, TRANSFORMER_FILE)
+    except FileNotFoundError:
+        return None
+
+def sample_batches(reader, fraction, epoch=0, random_state=None):
+    """Yields a Bernoulli sample ('fraction' of the rows) of one pass over a ShardReader."""
+    rng = np.random.default_rng(random_state)
+    for batch in reader.iter_batches(epoch):
+        yield batch[rng.random(len(batch)) < fraction]
+
+def centroid_drift(previous_centers, centers):
+    """Each centroid's shift, relative to the distance from its previous position to the nearest other previous centroid."""
+    previous_centers = np.asarray(previous_centers, dtype=np.float64)
+    separation = pairwise_distances(previous_centers)
+    np.fill_diagonal(separation, np.inf)
+    shift = np.linalg.norm(np.asarray(centers, dtype=np.float64) - previous_centers, axis=1)
+    return shift / separation.min(axis=1)
+
+def align_clusters(model, previous_centers):
+    """
+    Renumbers a retrained model's clusters so that each one gets the ID of the
+    previous centroid it is matched with (minimum total distance).
+    """
+    from scipy.optimize import linear_sum_assignment
+    previous_ids, new_ids = linear_sum_assignment(pairwise_distances(previous_centers, model.cluster_centers_))
+    model.cluster_centers_ = model.cluster_centers_[new_ids]
+    if getattr(model, 'labels_', None) is not None:
+        relabel = np.empty_like(previous_ids)
+        relabel[new_ids] = previous_ids
+        model.labels_ = relabel[model.labels_]
+    return model
+
+def fit_warm_start(previous, reader, changed_reader=None, sample_fraction=DEFAULT_SAMPLE_FRACTION,
+                   random_state=None):
+    """
+    Fits KMeans from the previous model's centroids on the changed rows plus a
+    sample of one pass over 'reader'. Returns the model and the row counts.
+    """
+    parts = list(changed_reader.iter_batches()) if changed_reader else []
+    changed_rows = sum(len(part) for part in parts)
+    parts.extend(sample_batches(reader, sample_fraction, random_state=random_state))
+    data = np.concatenate(parts) if parts else np.empty((0, 0), dtype=reader.dtype)
+    init = np.asarray(previous.cluster_centers_, dtype=reader.dtype)
+    if len(data) < len(init):
+        raise ValueError(f"{len(data)} rows are not enough to warm-start {len(init)} clusters")
+    model = KMeans(n_clusters=len(init), init=init, n_init=1, random_state=random_state).fit(data)
+    return model, {'changed_rows': changed_rows, 'sampled_rows': len(data) - changed_rows}
+
+def try_warm_start(previous_model_dir, reader, changed_reader=None, n_clusters=None,
+                   sample_fraction=DEFAULT_SAMPLE_FRACTION, drift_threshold=DEFAULT_DRIFT_THRESHOLD,
+                   random_state=None, feature_names=None):
+    """
+    Returns (model, previous model, report). The model is None when a full
+    retrain is needed (no previous model, different number of clusters,
+    different features or drift past the threshold); the report says why.
+    'feature_names' are those of the transformer that produced the data (None
+    without one); the previous model's transformer must have the same, or
+    both must have none (then only the feature counts are compared).
+    'report["training_passes"]' counts the passes made over 'reader'.
+    """
+    report = {'mode': 'full', 'drift_threshold': drift_threshold, 'training_passes': 0}
+    try:
+        previous = load_previous_model(previous_model_dir)
+    except FileNotFoundError as e:
+        report['reason'] = str(e)
+        return None, None, report
+
+    previous_k, previous_features = previous.cluster_centers_.shape
+    if n_clusters is not None and n_clusters != previous_k:
+        report['reason'] = f"n_clusters changed from {previous_k} to {n_clusters}"
+        return None, previous, report
+    previous_transformer = load_previous_transformer(previous_model_dir)
+    previous_names = previous_transformer.feature_names if previous_transformer is not None else None
+    feature_names = list(feature_names) if feature_names is not None else None
+    if previous_names != feature_names:
+        report['reason'] = f"previous model was trained on the features {previous_names}, the data has {feature_names}"
+        return None, previous, report
+    if reader.columns is not None and len(reader.columns) != previous_features:
+        report['reason'] = f"previous model has {previous_features} features, the data has {len(reader.columns)}"
+        return None, previous, report
+
+    report['training_passes'] = 1
+    try:
+        model, rows = fit_warm_start(previous, reader, changed_reader, sample_fraction, random_state)
+    except ValueError as e:
+        # Too few rows, or CSV shards whose column count differs from the previous model's
+        report['reason'] = f"warm start failed: {e}"
+        return None, previous, report
+    drift = centroid_drift(previous.cluster_centers_, model.cluster_centers_)
+    report.update(rows, drift=[round(float(value), 6) for value in drift], max_drift=float(drift.max()))
+    if drift.max() > drift_threshold:
+        report['reason'] = f"max centroid drift {drift.max():.4f} is above the threshold {drift_threshold}"
+        return None, previous, report
+    report['mode'] = 'warm'
+    return model, previous, report
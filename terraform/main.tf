@@ -27,6 +27,21 @@ module "s3_csv" {
   enable_lifecycle_policy = true
 }
 
+# Shared Lambda layer (lambda/shared, importable from /opt/python): the
+# warm_cache module caching boto3 clients, secrets and sessions across warm invocations
+data "archive_file" "shared_layer_zip" {
+  type        = "zip"
+  source_dir  = "../lambda/shared"
+  output_path = "${path.module}/shared-layer.zip"
+}
+
+resource "aws_lambda_layer_version" "shared" {
+  layer_name          = "${var.project_name}-shared"
+  filename            = data.archive_file.shared_layer_zip.output_path
+  source_code_hash    = data.archive_file.shared_layer_zip.output_base64sha256
+  compatible_runtimes = ["python3.8"]
+}
+
 module "lambda_csv_processor" {
   source          = "./modules/lambda"
   function_name   = "csv-processor"
@@ -38,6 +53,7 @@ module "lambda_csv_processor" {
   glue_job_arn    = module.glue_csv_to_redshift.glue_job_arn
   glue_job_name   = module.glue_csv_to_redshift.glue_job_name
   source_dir      = "../lambda/csv-processor"
+  layers          = [aws_lambda_layer_version.shared.arn]
   oracle_secret_arn = "" # Not directly used by this lambda
   salesforce_secret_arn = "" # Not directly used by this lambda
 }
@@ -57,6 +73,15 @@ module "glue_csv_to_redshift" {
   primary_key              = var.csv_primary_key
   oracle_secret_arn        = "" # Not directly used by this glue job
   salesforce_secret_arn    = "" # Not directly used by this glue job
+  extra_py_files = [
+    "redshift_data.py",
+    "schema_cache.py",
+    "manifest.py",
+    "type_inference.py",
+    "ledger.py",
+    "s3_archive.py",
+    "merge_sql.py",
+  ]
 }
 
 module "redshift" {
@@ -213,6 +238,7 @@ module "lambda_data_quality_checker" {
   handler         = "lambda_function.lambda_handler"
   runtime         = "python3.8"
   source_dir      = "../lambda/data-quality-checker"
+  layers          = [aws_lambda_layer_version.shared.arn]
   oracle_secret_arn = "" # Not directly used by this lambda
   salesforce_secret_arn = "" # Not directly used by this lambda
   environment_variables = {
@@ -223,6 +249,33 @@ module "lambda_data_quality_checker" {
   }
 }
 
+# Data quality Glue job: SQL rules run in Spark, Python rules are fanned out
+# to the data-quality-checker Lambda (one invocation per byte-range shard)
+module "glue_data_quality_check" {
+  source                   = "./modules/glue"
+  job_name                 = "data-quality-check"
+  project_name             = var.project_name
+  environment              = var.environment
+  s3_bucket_arn            = module.s3_csv.bucket_arn
+  glue_scripts_bucket_name = var.glue_scripts_bucket_name
+  s3_bucket_name           = module.s3_csv.bucket_name
+  redshift_cluster_id      = module.redshift.cluster_id
+  redshift_database        = module.redshift.database_name
+  redshift_user            = var.redshift_master_username
+  redshift_table           = "user_data"
+  oracle_secret_arn        = "" # Not directly used by this glue job
+  salesforce_secret_arn    = "" # Not directly used by this glue job
+  extra_py_files           = ["quality_rules.py", "fanout.py", "engine.py"]
+  lambda_function_arns     = [module.lambda_data_quality_checker.lambda_function_arn]
+  sns_topic_arns           = [module.sns_notifications.topic_arn]
+  job_arguments = {
+    "--S3_INPUT_PATH"           = "s3://${module.s3_csv.bucket_name}/processed/"
+    "--S3_ERROR_PATH"           = "s3://${module.s3_csv.bucket_name}/dq-errors"
+    "--DATA_QUALITY_LAMBDA_ARN" = module.lambda_data_quality_checker.lambda_function_arn
+    "--SNS_TOPIC_ARN"           = module.sns_notifications.topic_arn
+  }
+}
+
 resource "aws_cloudwatch_event_target" "lambda_target" {
   rule      = aws_cloudwatch_event_rule.glue_job_success_rule.name
   target_id = "TriggerDataQualityLambda"
@@ -286,6 +339,7 @@ module "lambda_salesforce_integration" {
   handler       = "lambda_function.lambda_handler"
   runtime       = "python3.8"
   source_dir    = "../lambda/salesforce-integration"
+  layers        = [aws_lambda_layer_version.shared.arn]
   oracle_secret_arn = "" # Not directly used by this lambda
   salesforce_secret_arn = module.salesforce_credentials.salesforce_secret_arn # Pass the correct ARN
   environment_variables = {
@@ -22,12 +22,13 @@ resource "aws_iam_policy" "glue_policy" {
 
   policy = jsonencode({
     Version   = "2012-10-17",
-    Statement = [
+    Statement = concat([
       {
         Action   = [
           "s3:GetObject",
           "s3:PutObject",
           "s3:DeleteObject",
+          "s3:AbortMultipartUpload",
           "s3:ListBucket"
         ],
         Effect   = "Allow",
@@ -39,7 +40,10 @@ resource "aws_iam_policy" "glue_policy" {
       {
         Action   = [
           "redshift:DescribeClusters",
-          "redshift-data:ExecuteStatement"
+          "redshift-data:ExecuteStatement",
+          "redshift-data:BatchExecuteStatement",
+          "redshift-data:DescribeStatement",
+          "redshift-data:GetStatementResult"
         ],
         Effect   = "Allow",
         Resource = "*"
@@ -59,7 +63,21 @@ resource "aws_iam_policy" "glue_policy" {
         Effect   = "Allow",
         Resource = "arn:aws:logs:*:*:*"
       }
-    ]
+    ],
+    length(var.lambda_function_arns) > 0 ? [
+      {
+        Action   = "lambda:InvokeFunction",
+        Effect   = "Allow",
+        Resource = var.lambda_function_arns
+      }
+    ] : [],
+    length(var.sns_topic_arns) > 0 ? [
+      {
+        Action   = "sns:Publish",
+        Effect   = "Allow",
+        Resource = var.sns_topic_arns
+      }
+    ] : [])
   })
 }
 
@@ -77,7 +95,7 @@ resource "aws_glue_job" "csv_to_redshift" {
     python_version  = "3"
   }
 
-  default_arguments = {
+  default_arguments = merge({
     "--job-bookmark-option"      = "job-bookmark-enable",
     "--enable-metrics"           = "",
     "--S3_BUCKET_NAME"           = var.s3_bucket_name,
@@ -85,8 +103,15 @@ resource "aws_glue_job" "csv_to_redshift" {
     "--REDSHIFT_DATABASE"        = var.redshift_database,
     "--REDSHIFT_USER"            = var.redshift_user,
     "--REDSHIFT_TABLE"           = var.redshift_table,
-    "--PRIMARY_KEY"              = var.primary_key
-  }
+    "--PRIMARY_KEY"              = var.primary_key,
+  },
+  # Shared modules the job script imports ('Python files'), uploaded next to the scripts
+  length(var.extra_py_files) > 0 ? {
+    "--extra-py-files" = join(",", [
+      for file_name in var.extra_py_files : "s3://${var.glue_scripts_bucket_name}/${file_name}"
+    ])
+  } : {},
+  var.job_arguments)
 
   tags = {
     Name        = "${var.project_name}-${var.job_name}"
@@ -65,3 +65,26 @@ variable "salesforce_secret_arn" {
   type        = string
 }
 
+variable "extra_py_files" {
+  description = "Python files in the Glue scripts bucket added to the job's --extra-py-files (e.g. shared utils imported by the script)."
+  type        = list(string)
+  default     = []
+}
+
+variable "job_arguments" {
+  description = "Additional default arguments of the job (e.g. {\"--S3_ERROR_PATH\" = \"s3://...\"})."
+  type        = map(string)
+  default     = {}
+}
+
+variable "lambda_function_arns" {
+  description = "ARNs of the Lambda functions the job may invoke."
+  type        = list(string)
+  default     = []
+}
+
+variable "sns_topic_arns" {
+  description = "ARNs of the SNS topics the job may publish to."
+  type        = list(string)
+  default     = []
+}
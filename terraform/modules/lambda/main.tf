@@ -26,7 +26,7 @@ resource "aws_iam_policy" "lambda_policy" {
       {
         Sid      = "S3Access",
         Effect   = "Allow",
-        Action   = ["s3:GetObject", "s3:ListBucket"],
+        Action   = ["s3:GetObject", "s3:PutObject", "s3:ListBucket"],
         Resource = compact([var.s3_bucket_arn, var.s3_bucket_arn != "" ? "${var.s3_bucket_arn}/*" : ""])
       },
       {
@@ -44,7 +44,13 @@ resource "aws_iam_policy" "lambda_policy" {
       {
         Sid      = "RedshiftDataAccess",
         Effect   = "Allow",
-        Action   = ["redshift-data:ExecuteStatement", "redshift:DescribeClusters"],
+        Action   = [
+          "redshift-data:ExecuteStatement",
+          "redshift-data:BatchExecuteStatement",
+          "redshift-data:DescribeStatement",
+          "redshift-data:GetStatementResult",
+          "redshift:DescribeClusters"
+        ],
         Resource = "*" # NOTE: Should be restricted to specific Redshift resources
       },
       {
@@ -53,6 +59,12 @@ resource "aws_iam_policy" "lambda_policy" {
         Action   = "secretsmanager:GetSecretValue",
         Resource = [var.oracle_secret_arn, var.salesforce_secret_arn] # Restrict to specific secrets
       },
+      {
+        Sid      = "CloudWatchMetrics",
+        Effect   = "Allow",
+        Action   = "cloudwatch:PutMetricData",
+        Resource = "*" # PutMetricData does not support resource-level permissions
+      },
       {
         Sid      = "Logging",
         Effect   = "Allow",
@@ -74,6 +86,7 @@ resource "aws_lambda_function" "default_lambda" {
   handler       = var.handler
   runtime       = var.runtime
   timeout       = var.timeout
+  layers        = var.layers
 
   filename         = data.archive_file.lambda_zip.output_path
   source_code_hash = data.archive_file.lambda_zip.output_base64sha256
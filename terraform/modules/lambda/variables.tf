@@ -67,3 +67,9 @@ variable "salesforce_secret_arn" {
   description = "The ARN of the Salesforce API secret for Lambda to access."
   type        = string
 }
+
+variable "layers" {
+  description = "ARNs of the Lambda layers to attach (e.g. the shared warm_cache layer)."
+  type        = list(string)
+  default     = []
+}
@@ -0,0 +1,73 @@
+import importlib.util
+import os
+import sys
+
+import pytest
+
+# Components are deployed as separate bundles with flat imports (Lambda
+# packages, Glue 'Python files', SageMaker source directories); the tests
+# import them the same way.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+COMPONENT_DIRS = (
+    ('lambda', 'csv-processor'),
+    ('lambda', 'data-quality-checker'),
+    ('lambda', 'salesforce-integration'),
+    ('lambda', 'shared', 'python'),
+    ('sagemaker', 'scripts'),
+)
+
+for component in COMPONENT_DIRS:
+    sys.path.insert(0, os.path.join(ROOT, *component))
+
+# Handlers create their boto3 clients at import time, as in the Lambda runtime
+# (which sets the region); the tests replace them with fakes before any call
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+
+
+@pytest.fixture(scope='session')
+def load_lambda_function():
+    """Imports a Lambda's lambda_function.py; every Lambda has one, so each gets its own module name."""
+    modules = {}
+
+    def load(lambda_name):
+        if lambda_name not in modules:
+            path = os.path.join(ROOT, 'lambda', lambda_name, 'lambda_function.py')
+            spec = importlib.util.spec_from_file_location(f"{lambda_name.replace('-', '_')}_lambda_function", path)
+            modules[lambda_name] = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(modules[lambda_name])
+        return modules[lambda_name]
+
+    return load
+
+
+# Shared modules the Glue jobs import flat, as their --extra-py-files
+GLUE_PYTHON_FILE_DIRS = (
+    ('lambda', 'csv-processor', 'utils'),
+    ('lambda', 'data-quality-checker', 'rules'),
+)
+
+
+@pytest.fixture(scope='session')
+def load_glue_job():
+    """
+    Imports a Glue job script (glue/jobs/<name>.py) without running it. Jobs
+    need the Glue libraries (e.g. the AWS Glue dev container); without them
+    the tests that use this fixture are skipped.
+    """
+    pytest.importorskip('pyspark')
+    pytest.importorskip('awsglue')
+    for component in GLUE_PYTHON_FILE_DIRS:
+        path = os.path.join(ROOT, *component)
+        if path not in sys.path:
+            sys.path.append(path)
+    modules = {}
+
+    def load(job_name):
+        if job_name not in modules:
+            path = os.path.join(ROOT, 'glue', 'jobs', f'{job_name}.py')
+            spec = importlib.util.spec_from_file_location(f"{job_name.replace('-', '_')}_glue_job", path)
+            modules[job_name] = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(modules[job_name])
+        return modules[job_name]
+
+    return load
@@ -0,0 +1,83 @@
+# tests/fakes/fake_redshift_data.py
+
+import itertools
+
+# --- Fake Redshift Data API Backend ---
+# In-memory stand-in for boto3's 'redshift-data' client, for exercising
+# RedshiftDataClient and the jobs that use it without a cluster.
+# Every statement is recorded in 'executed'. A statement reports 'STARTED'
+# for 'polls_until_finished' describe calls before it finishes.
+# Query results come from 'results': {sql substring: rows}, rows being lists
+# of Python values. 'failures': {sql substring: error message} fails statements.
+
+
+def to_field(value):
+    """Converts a Python value to a Data API field."""
+    if value is None:
+        return {"isNull": True}
+    if isinstance(value, bool):
+        return {"booleanValue": value}
+    if isinstance(value, int):
+        return {"longValue": value}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class FakeRedshiftDataBackend:
+
+    def __init__(self, results=None, failures=None, polls_until_finished=1, page_size=1000):
+        self.results = results or {}
+        self.failures = failures or {}
+        self.polls_until_finished = polls_until_finished
+        self.page_size = page_size
+        self.executed = []          # SQL text of every statement, in order
+        self.calls = []             # (API name, statement ID) of every request
+        self._statements = {}
+        self._ids = itertools.count(1)
+
+    def _start(self, sqls, api_name):
+        statement_id = f"fake-{next(self._ids)}"
+        self.calls.append((api_name, statement_id))
+        self.executed.extend(sqls)
+        self._statements[statement_id] = {"sqls": sqls, "polls": 0}
+        return {"Id": statement_id}
+
+    def _match(self, mapping, sqls):
+        for sql in sqls:
+            for fragment, value in mapping.items():
+                if fragment in sql:
+                    return value
+        return None
+
+    def execute_statement(self, Sql, **connection_args):
+        return self._start([Sql], "execute_statement")
+
+    def batch_execute_statement(self, Sqls, **connection_args):
+        return self._start(list(Sqls), "batch_execute_statement")
+
+    def describe_statement(self, Id):
+        self.calls.append(("describe_statement", Id))
+        statement = self._statements[Id]
+        statement["polls"] += 1
+        error = self._match(self.failures, statement["sqls"])
+        if error is not None:
+            return {"Id": Id, "Status": "FAILED", "Error": error}
+        if statement["polls"] < self.polls_until_finished:
+            return {"Id": Id, "Status": "STARTED"}
+        has_result_set = self._match(self.results, statement["sqls"]) is not None
+        return {"Id": Id, "Status": "FINISHED", "HasResultSet": has_result_set}
+
+    def get_statement_result(self, Id, NextToken=None):
+        self.calls.append(("get_statement_result", Id))
+        rows = self._match(self.results, self._statements[Id]["sqls"]) or []
+        start = int(NextToken or 0)
+        page = rows[start:start + self.page_size]
+        response = {"Records": [[to_field(value) for value in row] for row in page]}
+        if start + self.page_size < len(rows):
+            response["NextToken"] = str(start + self.page_size)
+        return response
+
+    def api_call_count(self, api_name=None):
+        """Number of requests received, optionally for one API only."""
+        return sum(1 for name, _ in self.calls if api_name in (None, name))
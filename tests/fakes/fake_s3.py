@@ -0,0 +1,181 @@
+# tests/fakes/fake_s3.py
+
+import hashlib
+import io
+import itertools
+import threading
+import time
+
+# --- Fake S3 Backend ---
+# In-memory stand-in for the subset of boto3's 's3' client used by the
+# csv-processor utils and Glue jobs (objects, ranged reads, copies, multipart
+# copies, batched deletes), for exercising them without AWS.
+# Objects live in 'objects': {(bucket, key): bytes}. Every request is recorded
+# in 'calls' as (API name, key). 'max_copy_size' mirrors the 5 GB CopyObject
+# limit and 'latency' (seconds) is added to every request.
+
+
+class FakeS3Error(Exception):
+    """Error response of the fake, with an S3 error code."""
+
+    def __init__(self, code, message=""):
+        super().__init__(f"{code}: {message}" if message else code)
+        self.code = code
+
+
+class FakeNoSuchKey(FakeS3Error):
+    def __init__(self, message=""):
+        super().__init__("NoSuchKey", message)
+
+
+class FakeS3Exceptions:
+    NoSuchKey = FakeNoSuchKey
+
+
+class FakeBody:
+    """Streaming body with read() / close(), like botocore's StreamingBody."""
+
+    def __init__(self, data):
+        self._stream = io.BytesIO(data)
+
+    def read(self, size=-1):
+        return self._stream.read(size)
+
+    def close(self):
+        self._stream.close()
+
+
+class FakePaginator:
+    """Follows continuation tokens of a list operation, like a boto3 paginator."""
+
+    def __init__(self, operation):
+        self.operation = operation
+
+    def paginate(self, **kwargs):
+        token = None
+        while True:
+            page = self.operation(**kwargs, **({"ContinuationToken": token} if token else {}))
+            yield page
+            token = page.get("NextContinuationToken")
+            if not token:
+                return
+
+
+def etag_of(data):
+    return f'"{hashlib.md5(data).hexdigest()}"'
+
+
+class FakeS3Backend:
+
+    exceptions = FakeS3Exceptions
+
+    def __init__(self, objects=None, max_copy_size=5 * 1024 ** 3, latency=0.0, fail_deletes=()):
+        self.objects = dict(objects or {})
+        self.max_copy_size = max_copy_size
+        self.latency = latency
+        self.fail_deletes = set(fail_deletes)   # Keys whose deletes report an error
+        self.calls = []                         # (API name, key) of every request
+        self._uploads = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def _call(self, api_name, key):
+        with self._lock:
+            self.calls.append((api_name, key))
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _get(self, bucket, key):
+        try:
+            return self.objects[(bucket, key)]
+        except KeyError:
+            raise FakeNoSuchKey(f"s3://{bucket}/{key}")
+
+    def put_object(self, Bucket, Key, Body=b"", **kwargs):
+        self._call("put_object", Key)
+        self.objects[(Bucket, Key)] = Body if isinstance(Body, bytes) else Body.read()
+        return {"ETag": etag_of(self.objects[(Bucket, Key)])}
+
+    def head_object(self, Bucket, Key):
+        self._call("head_object", Key)
+        data = self._get(Bucket, Key)
+        return {"ContentLength": len(data), "ETag": etag_of(data)}
+
+    def get_object(self, Bucket, Key, Range=None):
+        self._call("get_object", Key)
+        data = self._get(Bucket, Key)
+        if Range:
+            first, _, last = Range.replace("bytes=", "").partition("-")
+            data = data[int(first):int(last) + 1 if last else None]   # 'bytes=N-': to the end
+        return {"Body": FakeBody(data), "ContentLength": len(data)}
+
+    def copy_object(self, Bucket, Key, CopySource):
+        self._call("copy_object", Key)
+        data = self._get(CopySource["Bucket"], CopySource["Key"])
+        if len(data) > self.max_copy_size:
+            raise FakeS3Error("InvalidRequest", "The specified copy source is larger than the maximum allowable size")
+        self.objects[(Bucket, Key)] = data
+        return {"CopyObjectResult": {"ETag": etag_of(data)}}
+
+    def create_multipart_upload(self, Bucket, Key):
+        self._call("create_multipart_upload", Key)
+        upload_id = f"upload-{next(self._ids)}"
+        self._uploads[upload_id] = {}
+        return {"UploadId": upload_id}
+
+    def upload_part_copy(self, Bucket, Key, UploadId, PartNumber, CopySource, CopySourceRange):
+        self._call("upload_part_copy", Key)
+        first, _, last = CopySourceRange.replace("bytes=", "").partition("-")
+        data = self._get(CopySource["Bucket"], CopySource["Key"])[int(first):int(last) + 1]
+        self._uploads[UploadId][PartNumber] = data
+        return {"CopyPartResult": {"ETag": etag_of(data)}}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        self._call("complete_multipart_upload", Key)
+        parts = self._uploads.pop(UploadId)
+        numbers = [part["PartNumber"] for part in MultipartUpload["Parts"]]
+        if numbers != sorted(numbers):
+            raise FakeS3Error("InvalidPartOrder")
+        self.objects[(Bucket, Key)] = b"".join(parts[number] for number in numbers)
+        return {"ETag": etag_of(self.objects[(Bucket, Key)])}
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self._call("abort_multipart_upload", Key)
+        self._uploads.pop(UploadId, None)
+
+    def delete_object(self, Bucket, Key):
+        self._call("delete_object", Key)
+        self.objects.pop((Bucket, Key), None)
+
+    def delete_objects(self, Bucket, Delete):
+        self._call("delete_objects", None)
+        if len(Delete["Objects"]) > 1000:
+            raise FakeS3Error("MalformedXML", "More than 1000 keys")
+        errors = []
+        for entry in Delete["Objects"]:
+            if entry["Key"] in self.fail_deletes:
+                errors.append({"Key": entry["Key"], "Code": "AccessDenied", "Message": "Access Denied"})
+            else:
+                self.objects.pop((Bucket, entry["Key"]), None)
+        return {"Errors": errors} if errors else {}
+
+    def list_objects_v2(self, Bucket, Prefix="", ContinuationToken=None, MaxKeys=1000):
+        self._call("list_objects_v2", Prefix)
+        keys = sorted(key for bucket, key in self.objects if bucket == Bucket and key.startswith(Prefix))
+        start = int(ContinuationToken or 0)
+        page = keys[start:start + MaxKeys]
+        response = {
+            "Contents": [{"Key": key, "Size": len(self.objects[(Bucket, key)])} for key in page],
+            "KeyCount": len(page),
+            "IsTruncated": start + MaxKeys < len(keys),
+        }
+        if response["IsTruncated"]:
+            response["NextContinuationToken"] = str(start + MaxKeys)
+        return response
+
+    def get_paginator(self, operation_name):
+        return FakePaginator(getattr(self, operation_name))
+
+    def api_call_count(self, api_name=None):
+        """Number of requests received, optionally for one API only."""
+        return sum(1 for name, _ in self.calls if api_name in (None, name))
@@ -0,0 +1,203 @@
+# tests/fakes/fake_salesforce.py
+
+import csv
+import io
+import itertools
+import json
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# --- Fake Salesforce Server ---
+# Local HTTP stand-in for the Bulk API 2.0 ingest endpoints used by
+# SalesforceBulkClient, for exercising bulk syncs without an org:
+#   server = FakeSalesforceServer({'Contact': {'a@example.com': {'LastName': 'A'}}})
+#   with server:
+#       client = SalesforceBulkClient(server.url, server.session_id)
+# Records live in 'records': {object: {external ID: fields}}. Upserts update
+# matching records and create the others, which fails without the object's
+# required fields ('required_fields'). A closed job reports 'InProgress' for
+# 'polls_until_complete' status requests before it completes. Every request
+# is counted in 'requests' by (method, endpoint kind).
+
+JOB_PATH = re.compile(r"^/services/data/v[\d.]+/jobs/ingest(?:/(?P<job_id>[^/]+)(?:/(?P<resource>[^/]+)/?)?)?$")
+
+class FakeSalesforceServer:
+
+    def __init__(self, records=None, required_fields=None, polls_until_complete=1,
+                 session_id='fake-session-id'):
+        self.records = records if records is not None else {}
+        self.required_fields = required_fields if required_fields is not None else {'Contact': ['LastName']}
+        self.polls_until_complete = polls_until_complete
+        self.session_id = session_id
+        self.jobs = {}
+        self.requests = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler_class())
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def request_count(self, method=None, kind=None):
+        """Number of requests received, optionally for one method and/or endpoint kind."""
+        return sum(
+            count for (m, k), count in self.requests.items()
+            if method in (None, m) and kind in (None, k)
+        )
+
+    # --- Job processing ---
+
+    def _create_job(self, spec):
+        job_id = f"750FAKE{next(self._ids):08d}"
+        self.jobs[job_id] = {
+            'info': {
+                'id': job_id,
+                'object': spec['object'],
+                'externalIdFieldName': spec.get('externalIdFieldName'),
+                'operation': spec['operation'],
+                'contentType': spec.get('contentType', 'CSV'),
+                'state': 'Open',
+            },
+            'data': b'',
+            'polls': 0,
+            'successful': [],
+            'failed': [],
+            'unprocessed': [],
+        }
+        return self.jobs[job_id]['info']
+
+    def _process(self, job):
+        info = job['info']
+        rows = list(csv.DictReader(io.StringIO(job['data'].decode('utf-8'))))
+        records = self.records.setdefault(info['object'], {})
+        external_id_field = info['externalIdFieldName']
+        for row in rows:
+            key = row.get(external_id_field)
+            if not key:
+                job['failed'].append(dict(row, sf__Id='', sf__Error=f"MISSING_ARGUMENT:{external_id_field} not specified:--"))
+            elif key in records:
+                records[key].update(row)
+                job['successful'].append(dict(row, sf__Id=records[key].setdefault('Id', f"003FAKE{next(self._ids):08d}"), sf__Created='false'))
+            else:
+                missing = [f for f in self.required_fields.get(info['object'], []) if not row.get(f)]
+                if missing:
+                    job['failed'].append(dict(row, sf__Id='', sf__Error=(
+                        f"REQUIRED_FIELD_MISSING:Required fields are missing: [{', '.join(missing)}]:{', '.join(missing)} --"
+                    )))
+                else:
+                    records[key] = dict(row, Id=f"003FAKE{next(self._ids):08d}")
+                    job['successful'].append(dict(row, sf__Id=records[key]['Id'], sf__Created='true'))
+        info['numberRecordsProcessed'] = len(rows)
+        info['numberRecordsFailed'] = len(job['failed'])
+        info['state'] = 'JobComplete'
+
+    def _results_csv(self, job, resource):
+        if resource == 'successfulResults':
+            rows, prefix = job['successful'], ['sf__Id', 'sf__Created']
+        elif resource == 'failedResults':
+            rows, prefix = job['failed'], ['sf__Id', 'sf__Error']
+        else:
+            rows, prefix = job['unprocessed'], []
+        data_fields = job['data'].decode('utf-8').split('\n', 1)[0].split(',') if job['data'] else []
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=prefix + data_fields, lineterminator='\n', extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(rows)
+        return buffer.getvalue().encode('utf-8')
+
+    def handle(self, method, path, body):
+        """Returns (status, content type, body bytes) for a request."""
+        match = JOB_PATH.match(path)
+        if not match:
+            return 404, 'application/json', b'[{"errorCode": "NOT_FOUND"}]'
+        job_id, resource = match.group('job_id'), match.group('resource')
+        kind = resource or ('job' if job_id else 'jobs')
+        with self._lock:
+            self.requests[(method, kind)] = self.requests.get((method, kind), 0) + 1
+            if job_id is None and method == 'POST':
+                return 200, 'application/json', json.dumps(self._create_job(json.loads(body))).encode('utf-8')
+            job = self.jobs.get(job_id)
+            if job is None:
+                return 404, 'application/json', b'[{"errorCode": "NOT_FOUND"}]'
+            info = job['info']
+            if resource == 'batches' and method == 'PUT':
+                if info['state'] != 'Open':
+                    return 409, 'application/json', b'[{"errorCode": "INVALIDJOBSTATE"}]'
+                job['data'] += body
+                return 201, 'text/plain', b''
+            if resource is None and method == 'PATCH':
+                state = json.loads(body)['state']
+                if state == 'Aborted':
+                    info['state'] = 'Aborted'
+                    rows = list(csv.DictReader(io.StringIO(job['data'].decode('utf-8'))))
+                    job['unprocessed'] = rows
+                else:
+                    info['state'] = 'UploadComplete'
+                return 200, 'application/json', json.dumps(info).encode('utf-8')
+            if resource is None and method == 'GET':
+                if info['state'] == 'UploadComplete':
+                    job['polls'] += 1
+                    if job['polls'] >= self.polls_until_complete:
+                        self._process(job)
+                    else:
+                        return 200, 'application/json', json.dumps(dict(info, state='InProgress')).encode('utf-8')
+                return 200, 'application/json', json.dumps(info).encode('utf-8')
+            if method == 'GET' and resource in ('successfulResults', 'failedResults', 'unprocessedrecords'):
+                return 200, 'text/csv', self._results_csv(job, resource)
+        return 405, 'application/json', b'[{"errorCode": "METHOD_NOT_ALLOWED"}]'
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def _read_body(self):
+                if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+                    chunks = []
+                    while True:
+                        size = int(self.rfile.readline().strip(), 16)
+                        if size == 0:
+                            self.rfile.readline()
+                            return b''.join(chunks)
+                        chunks.append(self.rfile.read(size))
+                        self.rfile.readline()
+                return self.rfile.read(int(self.headers.get('Content-Length') or 0))
+
+            def _dispatch(self):
+                body = self._read_body()
+                if self.headers.get('Authorization') != f"Bearer {server.session_id}":
+                    status, content_type, payload = 401, 'application/json', b'[{"errorCode": "INVALID_SESSION_ID"}]'
+                else:
+                    status, content_type, payload = server.handle(self.command, self.path, body)
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            do_GET = do_POST = do_PUT = do_PATCH = _dispatch
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
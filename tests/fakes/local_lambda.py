@@ -0,0 +1,25 @@
+# tests/fakes/local_lambda.py
+
+import io
+import json
+
+# --- Local Lambda Client ---
+# In-process stand-in for boto3's Lambda client, for running the DQ fan-out
+# offline: invoke() calls 'handler(event, None)' and returns an invoke-like
+# response.
+
+
+class LocalLambdaClient:
+
+    def __init__(self, handler):
+        self.handler = handler
+        self.events = []   # Payload of every invocation
+
+    def invoke(self, FunctionName, InvocationType='RequestResponse', Payload='{}'):
+        event = json.loads(Payload)
+        self.events.append(event)
+        result = self.handler(event, None)
+        return {
+            'StatusCode': 200,
+            'Payload': io.BytesIO(json.dumps(result).encode('utf-8')),
+        }
@@ -0,0 +1,87 @@
+import json
+
+import pytest
+
+from fakes.fake_s3 import FakeS3Backend, etag_of
+from utils.ledger import IngestionLedger, S3LedgerStore
+from utils.manifest import resolve_source_files
+
+BUCKET = 'test-bucket'
+
+
+class FakeGlue:
+
+    def __init__(self):
+        self.runs = []
+
+    def start_job_run(self, JobName, Arguments):
+        self.runs.append(Arguments)
+        return {'JobRunId': f'jr_{len(self.runs)}'}
+
+
+def s3_event(s3, keys):
+    return {'Records': [{
+        'eventTime': '2026-10-18T00:00:00Z',
+        's3': {'bucket': {'name': BUCKET}, 'object': {
+            'key': key, 'size': len(s3.objects[(BUCKET, key)]), 'eTag': etag_of(s3.objects[(BUCKET, key)]).strip('"'),
+        }},
+    } for key in keys]}
+
+
+@pytest.fixture
+def handler(load_lambda_function, monkeypatch):
+    module = load_lambda_function('csv-processor')
+    s3 = FakeS3Backend({
+        (BUCKET, 'csv/loaded.csv'): b'id\n1\n',
+        (BUCKET, 'csv/new-1.csv'): b'id\n2\n',
+        (BUCKET, 'csv/new-2.csv'): b'id\n3\n',
+    })
+    glue = FakeGlue()
+    monkeypatch.setattr(module, 's3', s3)
+    monkeypatch.setattr(module, 'glue', glue)
+    monkeypatch.setattr(module, 'LEDGER_S3_PATH', f's3://{BUCKET}/ledger/')
+    monkeypatch.setattr(module, 'LEDGER_TARGET_TABLE', 'public.orders')
+    monkeypatch.setenv('GLUE_JOB_NAME', 'csv-to-redshift')
+    ledger = IngestionLedger(S3LedgerStore(f's3://{BUCKET}/ledger/', s3))
+    ledger.record('public.orders', {'s3_path': f's3://{BUCKET}/csv/old-name.csv', 'etag': etag_of(b'id\n1\n')}, 'v1')
+    return module, s3, glue
+
+
+def test_already_loaded_files_are_archived_and_the_rest_loaded_in_one_run(handler):
+    module, s3, glue = handler
+    response = module.lambda_handler(s3_event(s3, ['csv/loaded.csv', 'csv/new-1.csv', 'csv/new-2.csv']), None)
+
+    assert response['skippedFiles'] == 1 and response['jobRunIds'] == ['jr_1']
+    assert list(glue.runs[0]) == ['--S3_MANIFEST_PATH']
+    assert (BUCKET, 'processed/loaded.csv') in s3.objects
+    assert (BUCKET, 'csv/loaded.csv') not in s3.objects
+    assert (BUCKET, 'csv/new-1.csv') in s3.objects
+
+
+def test_event_of_already_loaded_files_only_starts_no_run(handler):
+    module, s3, glue = handler
+    response = module.lambda_handler(s3_event(s3, ['csv/loaded.csv']), None)
+
+    assert response['skippedFiles'] == 1 and glue.runs == []
+    assert sorted(key for _, key in s3.objects if not key.startswith('ledger/')) == [
+        'csv/new-1.csv', 'csv/new-2.csv', 'processed/loaded.csv',
+    ]
+
+
+def test_sqs_batch_is_split_into_manifests_of_at_most_max_files(handler, monkeypatch):
+    module, s3, glue = handler
+    monkeypatch.setattr(module, 'LEDGER_S3_PATH', '')
+    monkeypatch.setattr(module, 'MAX_FILES_PER_BATCH', 2)
+    keys = ['csv/new-1.csv', 'csv/new-2.csv', 'csv/loaded.csv', 'csv/new-1.csv']   # new-1 notified twice
+    messages = [s3_event(s3, [key]) for key in keys] + [{'Event': 's3:TestEvent'}]
+    event = {'Records': [{'eventSource': 'aws:sqs', 'body': json.dumps(message)} for message in messages]}
+
+    response = module.lambda_handler(event, None)
+
+    assert response['jobRunIds'] == ['jr_1', 'jr_2']
+    batches = [resolve_source_files(manifest_path=run.get('--S3_MANIFEST_PATH', ''),
+                                    source_path=run.get('--S3_SOURCE_PATH', ''), s3_client=s3) for run in glue.runs]
+    assert [[f['s3_path'].split('/', 3)[3] for f in batch] for batch in batches] == \
+        [['csv/new-1.csv', 'csv/new-2.csv'], ['csv/loaded.csv']]
+    assert list(glue.runs[1]) == ['--S3_SOURCE_PATH']
+    assert batches[0][0]['size'] == 5 and batches[0][0]['etag']
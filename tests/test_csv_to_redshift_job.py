@@ -0,0 +1,36 @@
+import pytest
+
+
+@pytest.fixture(scope='module')
+def job(load_glue_job):
+    return load_glue_job('csv-to-redshift')
+
+
+@pytest.fixture(scope='module')
+def spark(job):
+    from pyspark.sql import SparkSession
+
+    session = SparkSession.builder.master('local[1]').appName('csv-to-redshift-tests').getOrCreate()
+    yield session
+    session.stop()
+
+
+def write_csv(tmp_path, name, text):
+    path = tmp_path / name
+    path.write_text(text)
+    return {'s3_path': str(path)}
+
+
+def test_batch_is_deduplicated_into_one_frame_with_the_latest_row_per_key(job, spark, tmp_path):
+    source_files = [
+        write_csv(tmp_path, 'first.csv', 'id,status\n1,new\n2,new\n2,paid\n'),
+        write_csv(tmp_path, 'second.csv', 'id,status,email\n1,shipped,a@example.com\n3,new,c@example.com\n'),
+    ]
+
+    rows = job.read_deduplicated_frame(spark, source_files, 'id').orderBy('id').collect()
+
+    assert [row.asDict() for row in rows] == [
+        {'id': '1', 'status': 'shipped', 'email': 'a@example.com'},   # The later file wins
+        {'id': '2', 'status': 'paid', 'email': None},                 # Within a file, the last row wins
+        {'id': '3', 'status': 'new', 'email': 'c@example.com'},
+    ]
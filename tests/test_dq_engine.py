@@ -0,0 +1,44 @@
+import io
+
+from fakes.fake_s3 import FakeS3Backend
+from rules.engine import check_csv_stream, check_csv_stream_vectorized, iter_csv_records, iter_text_lines, open_s3_csv
+from rules.quality_rules import get_batch_rules, get_python_rules
+
+
+def test_empty_object_checks_no_records_on_both_paths():
+    records, collector = check_csv_stream(io.BytesIO(b''), get_python_rules())
+    assert (records, collector.total) == (0, 0)
+
+    records, collector = check_csv_stream_vectorized(io.BytesIO(b''), get_batch_rules())
+    assert (records, collector.total, collector.details) == (0, 0, [])
+
+
+def test_vectorized_path_matches_per_record_path():
+    payload = b'id,product_category,price\n1,Toys,-1\n2,Books,10\n3,Electronics,abc\n'
+    records, collector = check_csv_stream(io.BytesIO(payload), get_python_rules())
+    batch_records, batch_collector = check_csv_stream_vectorized(io.BytesIO(payload), get_batch_rules())
+    assert batch_records == records == 3
+    assert batch_collector.counts_by_rule == collector.counts_by_rule
+
+
+def test_lines_split_across_read_blocks_decode_whole():
+    payload = 'id,name\n1,"Zoë\nMüller"\n2,Łukasz\n'.encode('utf-8')
+    lines = list(iter_text_lines(io.BytesIO(payload), block_size=3))
+    assert ''.join(lines) == payload.decode('utf-8')
+    assert [record['name'] for record in iter_csv_records(io.BytesIO(payload))] == ['Zoë\nMüller', 'Łukasz']
+
+
+def test_adjacent_byte_ranges_own_every_line_once():
+    header = b'id,name\n'
+    rows = [f'{i},näme-{i}\n'.encode('utf-8') for i in range(1, 6)]
+    payload = header + b''.join(rows)
+    s3 = FakeS3Backend({('test-bucket', 'data.csv'): payload})
+
+    # Every split point: at line starts, mid-line and inside multi-byte characters.
+    # plan_shards convention: a shard's 'end' is the next shard's 'start'.
+    for split in range(1, len(payload)):
+        ranges = [{'start': 0, 'end': split}, {'start': split, 'end': len(payload)}]
+        owned = [open_s3_csv(s3, 'test-bucket', 'data.csv', byte_range).read() for byte_range in ranges]
+
+        assert all(shard.startswith(header) for shard in owned)
+        assert b''.join(shard[len(header):] for shard in owned) == b''.join(rows), split
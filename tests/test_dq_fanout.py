@@ -0,0 +1,68 @@
+import pytest
+
+from fakes.fake_s3 import FakeS3Backend
+from fakes.local_lambda import LocalLambdaClient
+from rules.fanout import invoke_shards, merge_shard_results, plan_shards
+
+BUCKET = 'test-bucket'
+HEADER = b'id,product_category,price\n'
+
+
+def make_rows(count):
+    """Every third row has an invalid category, every fifth a non-positive price."""
+    return b''.join(
+        f"{i},{'Toys' if i % 3 == 0 else 'Books'},{-1 if i % 5 == 0 else 10}\n".encode()
+        for i in range(1, count + 1)
+    )
+
+
+@pytest.fixture
+def dq_lambda(load_lambda_function):
+    return load_lambda_function('data-quality-checker')
+
+
+@pytest.fixture
+def s3(dq_lambda, monkeypatch):
+    s3 = FakeS3Backend({(BUCKET, 'input/data.csv'): HEADER + make_rows(100)})
+    monkeypatch.setattr(dq_lambda, 's3_client', s3)
+    return s3
+
+
+def run_fanout(dq_lambda, s3, shard_size):
+    lambda_client = LocalLambdaClient(dq_lambda.lambda_handler)
+    shards = plan_shards(s3, f's3://{BUCKET}/input/', shard_size)
+    results = invoke_shards(lambda_client, 'data-quality-checker', shards, {'chunk_size': 7}, max_workers=4)
+    return shards, lambda_client, merge_shard_results(results)
+
+
+def test_small_object_is_a_single_shard(dq_lambda, s3):
+    shards, lambda_client, merged = run_fanout(dq_lambda, s3, shard_size=1024 ** 2)
+    assert len(shards) == 1 and 'byte_range' not in lambda_client.events[0]
+    assert merged['records_checked'] == 100
+    assert merged['error_counts_by_rule'] == {'check_product_category_valid': 33, 'check_price_positive': 20}
+    assert merged['shards_checked'] == 1
+
+
+@pytest.mark.parametrize('shard_size', [64, 100, 333])
+def test_byte_range_shards_check_every_record_once(dq_lambda, s3, shard_size):
+    size = len(s3.objects[(BUCKET, 'input/data.csv')])
+    _, single_client, single = run_fanout(dq_lambda, s3, shard_size=size)
+    shards, lambda_client, merged = run_fanout(dq_lambda, s3, shard_size=shard_size)
+
+    assert len(shards) == -(-size // shard_size) > 1
+    assert [event['byte_range'] for event in lambda_client.events] == [shard['byte_range'] for shard in shards]
+    for key in ('records_checked', 'error_count', 'error_counts_by_rule', 'status'):
+        assert merged[key] == single[key]
+
+
+def test_line_straddling_a_shard_boundary_is_checked_by_one_shard(dq_lambda, s3):
+    data = HEADER + b'1,Toys,10\n2,Books,-5\n'
+    s3.objects[(BUCKET, 'input/data.csv')] = data
+    boundary = data.index(b'2,Books') + 3   # Inside the second record
+    shards, _, merged = run_fanout(dq_lambda, s3, shard_size=boundary)
+
+    assert [shard['byte_range'] for shard in shards] == [
+        {'start': 0, 'end': boundary}, {'start': boundary, 'end': len(data)},
+    ]
+    assert merged['records_checked'] == 2
+    assert merged['error_counts_by_rule'] == {'check_product_category_valid': 1, 'check_price_positive': 1}
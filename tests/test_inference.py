@@ -0,0 +1,88 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import joblib
+import numpy as np
+import pytest
+from sklearn.cluster import KMeans
+
+import inference
+
+
+def test_recordio_encoding_does_not_depend_on_the_memory_order():
+    rows = np.arange(12, dtype=np.float64).reshape(3, 4)
+    body = inference.encode_recordio_protobuf(rows)
+
+    assert inference.encode_recordio_protobuf(np.asfortranarray(rows)) == body
+    assert inference.encode_recordio_protobuf(rows[:, ::-1][:, ::-1]) == body
+    np.testing.assert_array_equal(inference.decode_recordio_protobuf(body), rows)
+    # The general (record by record) decoder agrees with the fast path
+    np.testing.assert_array_equal(
+        np.stack([inference.decode_record(body, start, end) for start, end in inference.iter_recordio(body)]), rows
+    )
+
+
+def test_recordio_encodes_scalars_as_one_value_records():
+    body = inference.encode_recordio_protobuf(np.array([3, 1, 2]))
+    np.testing.assert_array_equal(inference.decode_recordio_protobuf(body), [[3], [1], [2]])
+
+
+@pytest.mark.parametrize('body, content_type', [
+    ('', inference.CSV),
+    ('\n', inference.CSV),
+    ('', inference.JSON),
+    ('[]', inference.JSON),
+    ('{"instances": []}', inference.JSON),
+    ('', 'application/jsonlines'),
+    ('\n\n', 'application/jsonlines'),
+    (b'', inference.RECORDIO_PROTOBUF),
+])
+def test_empty_request_bodies_are_rejected_with_a_clear_error(body, content_type):
+    with pytest.raises(ValueError, match='Empty'):
+        inference.input_fn(body, content_type)
+
+
+def test_numeric_payloads_decode_to_the_same_rows():
+    rows = [[1.0, 2.0], [3.0, 4.5]]
+    for body, content_type in [
+        ('1,2\n3,4.5\n', inference.CSV),
+        ('[[1, 2], [3, 4.5]]', inference.JSON),
+        ('{"instances": [{"features": [1, 2]}, {"features": [3, 4.5]}]}', inference.JSON),
+        ('[1, 2]\n[3, 4.5]\n', 'application/jsonlines'),
+        (inference.encode_npy(np.array(rows)), inference.NPY),
+        (inference.encode_recordio_protobuf(rows), inference.RECORDIO_PROTOBUF),
+    ]:
+        np.testing.assert_array_equal(inference.input_fn(body, content_type), rows)
+
+
+def test_model_is_memory_mapped_and_preloaded_once(tmp_path):
+    data = np.random.default_rng(0).normal(size=(200, 3))
+    trained = KMeans(n_clusters=4, n_init=1, random_state=0).fit(data)
+    joblib.dump(trained, tmp_path / inference.MODEL_FILE, compress=0)   # As train.py saves it
+
+    inference.preload_model(str(tmp_path))
+    model = inference.model_fn(str(tmp_path))
+
+    assert model is inference.model_fn(str(tmp_path))
+    assert isinstance(model.cluster_centers_, np.memmap) and model.cluster_centers_.mode == 'r'
+    np.testing.assert_array_equal(inference.predict_fn(data, model), trained.predict(data))
+
+
+def test_micro_batcher_groups_concurrent_requests_and_returns_each_its_rows():
+    calls = []
+
+    def predict(data):
+        calls.append(len(data))
+        if (data < 0).any():
+            raise ValueError('negative features')
+        return data.sum(axis=1)
+
+    batcher = inference.MicroBatcher(predict, max_rows=64, max_wait=0.05)
+    requests = [np.full((i % 3 + 1, 2), float(i)) for i in range(16)]
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        results = list(executor.map(batcher.predict, requests))
+
+    for request, result in zip(requests, results):
+        np.testing.assert_array_equal(result, request.sum(axis=1))
+    assert batcher.requests_served == 16 and batcher.batches < 16 and sum(calls) == 31
+    with pytest.raises(ValueError, match='negative'):
+        batcher.predict(np.array([[-1.0, 0.0]]))
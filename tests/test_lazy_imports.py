@@ -0,0 +1,33 @@
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_benchmark():
+    path = os.path.join(ROOT, 'benchmarks', 'lambda_import_benchmark.py')
+    spec = importlib.util.spec_from_file_location('lambda_import_benchmark', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+HANDLERS = load_benchmark().HANDLERS
+
+
+@pytest.mark.parametrize('handler', sorted(HANDLERS))
+def test_handler_import_leaves_heavy_modules_unloaded(handler):
+    # A fresh interpreter, like a cold start, with the shared layer on the path
+    env = dict(os.environ, PYTHONPATH=os.path.join(ROOT, 'lambda', 'shared', 'python'))
+    env.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+    lazy = HANDLERS[handler]['lazy']
+    result = subprocess.run(
+        [sys.executable, '-c', f'import sys, json, lambda_function; print(json.dumps([m for m in {lazy!r} if m in sys.modules]))'],
+        cwd=os.path.join(ROOT, 'lambda', handler), env=env, capture_output=True, text=True, check=True
+    )
+    assert json.loads(result.stdout.splitlines()[-1]) == []
@@ -0,0 +1,74 @@
+import pytest
+
+from fakes.fake_s3 import FakeS3Backend
+from utils.ledger import IngestionLedger, S3LedgerStore, describe_file, schema_version
+
+BUCKET = 'test-bucket'
+LEDGER_PATH = f's3://{BUCKET}/ledger/'
+TABLE = 'public.orders'
+COLUMNS = [('order_id', 'integer'), ('amount', 'numeric')]
+
+
+@pytest.fixture
+def s3():
+    return FakeS3Backend({
+        (BUCKET, 'csv/a.csv'): b'order_id,amount\n1,10\n',
+        (BUCKET, 'csv/a-copy.csv'): b'order_id,amount\n1,10\n',
+        (BUCKET, 'csv/b.csv'): b'order_id,amount\n2,20\n',
+    })
+
+
+def described(s3, key, method='etag'):
+    return describe_file(s3, {'s3_path': f's3://{BUCKET}/{key}'}, method)
+
+
+def test_recorded_files_are_partitioned_as_loaded_across_ledger_instances(s3):
+    version = schema_version(COLUMNS)
+    ledger = IngestionLedger(S3LedgerStore(LEDGER_PATH, s3))
+    ledger.record(TABLE, described(s3, 'csv/a.csv'), version)
+
+    # A later run (new ledger, same store): the re-upload of a.csv has the same ETag
+    ledger = IngestionLedger(S3LedgerStore(LEDGER_PATH, s3))
+    files = [described(s3, 'csv/a-copy.csv'), described(s3, 'csv/b.csv')]
+    to_load, duplicates = ledger.partition(TABLE, files, version)
+
+    assert [f['s3_path'] for f in to_load] == [f's3://{BUCKET}/csv/b.csv']
+    assert [f['s3_path'] for f in duplicates] == [f's3://{BUCKET}/csv/a-copy.csv']
+    assert (ledger.skipped_files, ledger.skipped_bytes) == (1, len(b'order_id,amount\n1,10\n'))
+    entry = ledger.find(TABLE, files[0])
+    assert entry['s3_path'] == f's3://{BUCKET}/csv/a.csv' and entry['schema_version'] == version
+    assert any(key.startswith('ledger/public.orders/etag-') for _, key in s3.objects)
+
+
+def test_identical_files_within_a_batch_are_loaded_once(s3):
+    ledger = IngestionLedger(S3LedgerStore(LEDGER_PATH, s3))
+    to_load, duplicates = ledger.partition(TABLE, [described(s3, 'csv/a.csv'), described(s3, 'csv/a-copy.csv')])
+    assert len(to_load) == len(duplicates) == 1
+
+
+def test_sha256_ids_match_contents_whatever_their_etag(s3):
+    # A multipart upload of the same bytes has another ETag
+    ledger = IngestionLedger(S3LedgerStore(LEDGER_PATH, s3), method='sha256')
+    ledger.record(TABLE, described(s3, 'csv/a.csv', 'sha256'), 'v1')
+    copy = dict(described(s3, 'csv/a-copy.csv', 'sha256'), etag='"0123456789abcdef-2"')
+
+    assert ledger.is_loaded(TABLE, copy, 'v1')
+    assert not IngestionLedger(S3LedgerStore(LEDGER_PATH, s3)).is_loaded(TABLE, copy, 'v1')   # ETag ledger
+    assert s3.api_call_count('get_object') >= 2   # The contents were hashed
+
+
+def test_entries_of_another_schema_version_allow_a_reload(s3):
+    ledger = IngestionLedger(S3LedgerStore(LEDGER_PATH, s3))
+    source_file = described(s3, 'csv/a.csv')
+    ledger.record(TABLE, source_file, schema_version(COLUMNS))
+
+    altered = schema_version(COLUMNS + [('email', 'character varying')])
+    assert altered != schema_version(COLUMNS)
+    assert ledger.partition(TABLE, [source_file], altered) == ([source_file], [])
+    assert ledger.is_loaded(TABLE, source_file)   # Any version
+    assert not ledger.is_loaded('public.customers', source_file)
+
+
+def test_unknown_content_id_method_is_rejected(s3):
+    with pytest.raises(ValueError):
+        IngestionLedger(S3LedgerStore(LEDGER_PATH, s3), method='md5')
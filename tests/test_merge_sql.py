@@ -0,0 +1,28 @@
+import pytest
+
+from utils.merge_sql import MERGE_STRATEGIES, build_merge_statements
+
+
+def test_merge_updates_every_column_but_the_primary_key():
+    [statement] = build_merge_statements('merge', 'orders', 'orders_staging', 'ID', ['id', 'amount', 'status'])
+
+    assert statement.startswith('MERGE INTO orders USING orders_staging')
+    assert 'UPDATE SET "amount" = orders_staging."amount", "status" = orders_staging."status"\n' in statement
+    assert 'INSERT ("id", "amount", "status") VALUES (orders_staging."id", ' in statement
+
+
+def test_merge_of_a_primary_key_only_table_falls_back_to_delete_join():
+    assert build_merge_statements('merge', 'tags', 'tags_staging', 'tag', ['tag']) == \
+        build_merge_statements('delete_join', 'tags', 'tags_staging', 'tag', ['tag'])
+
+
+@pytest.mark.parametrize('merge_strategy, delete_clause', [
+    ('delete_in', 'WHERE "id" IN (SELECT "id" FROM orders_staging)'),
+    ('delete_join', 'USING orders_staging'),
+])
+def test_delete_strategies_delete_then_insert(merge_strategy, delete_clause):
+    delete, insert = build_merge_statements(merge_strategy, 'orders', 'orders_staging', 'id', [])
+
+    assert delete.startswith('DELETE FROM orders') and delete_clause in delete
+    assert insert == 'INSERT INTO orders SELECT * FROM orders_staging;'
+    assert merge_strategy in MERGE_STRATEGIES
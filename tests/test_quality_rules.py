@@ -0,0 +1,13 @@
+from rules.quality_rules import get_rule_query, get_sql_rules
+
+
+def test_every_sql_rule_has_either_a_predicate_or_a_query():
+    for rule_name, rule_details in get_sql_rules().items():
+        assert bool(rule_details.get('predicate')) != bool(rule_details.get('query')), rule_name
+
+
+def test_row_rule_query_is_derived_from_its_predicate():
+    rules = get_sql_rules()
+    assert get_rule_query(rules['null_user_id_check']) == 'SELECT * FROM temp_data WHERE user_id IS NULL'
+    assert get_rule_query(rules['null_user_id_check'], 'batch') == 'SELECT * FROM batch WHERE user_id IS NULL'
+    assert get_rule_query(rules['duplicate_order_id_check']) == rules['duplicate_order_id_check']['query']
@@ -0,0 +1,86 @@
+import pytest
+
+from fakes.fake_redshift_data import FakeRedshiftDataBackend
+from utils.redshift_data import RedshiftDataClient
+
+
+def make_client(backend, **kwargs):
+    delays = []
+    client = RedshiftDataClient('cluster', 'dev', 'etl', client=backend, sleep=delays.append, **kwargs)
+    return client, delays
+
+
+def test_polling_backs_off_up_to_the_maximum_delay():
+    backend = FakeRedshiftDataBackend(polls_until_finished=6)
+    client, delays = make_client(backend, poll_initial_delay=0.1, poll_backoff=2.0, poll_max_delay=0.5)
+
+    assert client.execute('TRUNCATE TABLE staging')
+    assert delays == pytest.approx([0.1, 0.2, 0.4, 0.5, 0.5, 0.5])
+    assert backend.api_call_count('describe_statement') == 6
+    assert client.api_calls == backend.api_call_count() == 7
+
+
+def test_batch_runs_every_statement_in_one_request():
+    backend = FakeRedshiftDataBackend()
+    client, _ = make_client(backend)
+    sqls = ['BEGIN', 'DELETE FROM t USING s WHERE t.id = s.id', 'INSERT INTO t SELECT * FROM s']
+
+    assert client.execute_batch(sqls)
+    assert client.execute_batch([])
+    assert backend.executed == sqls
+    assert backend.api_call_count('batch_execute_statement') == 1
+
+
+def test_fetch_follows_result_pages_and_converts_fields():
+    rows = [[i, f'col_{i}', None if i % 2 else 1.5, i % 3 == 0] for i in range(25)]
+    backend = FakeRedshiftDataBackend(results={'FROM information_schema': rows}, page_size=10)
+    client, _ = make_client(backend)
+
+    assert client.fetch('SELECT * FROM information_schema.columns') == rows
+    assert backend.api_call_count('get_statement_result') == 3
+
+
+def test_get_table_columns_of_a_missing_table_is_empty():
+    backend = FakeRedshiftDataBackend(results={"table_name = 'orders'": [['id', 'integer'], ['email', 'varchar']]})
+    client, _ = make_client(backend)
+
+    assert client.get_table_columns('Orders') == [('id', 'integer'), ('email', 'varchar')]
+    assert client.get_table_columns('missing') == []
+
+
+def test_failed_statement_raises_its_error():
+    backend = FakeRedshiftDataBackend(failures={'COPY': 'Load into table failed'})
+    client, _ = make_client(backend)
+
+    with pytest.raises(Exception, match='Load into table failed'):
+        client.execute("COPY t FROM 's3://bucket/key'")
+
+
+def test_unfinished_statement_times_out():
+    backend = FakeRedshiftDataBackend(polls_until_finished=10 ** 6)
+    client, _ = make_client(backend, timeout=-1)
+
+    with pytest.raises(Exception, match='timeout'):
+        client.execute('VACUUM t')
+
+
+def test_concurrent_statements_share_one_backoff_schedule():
+    backend = FakeRedshiftDataBackend(results={'information_schema': [['id', 'integer']]}, polls_until_finished=3)
+    client, delays = make_client(backend, poll_initial_delay=0.1, poll_backoff=2.0)
+
+    statement_ids = [client.submit('CREATE TABLE s (LIKE t)'), client.submit('SELECT * FROM information_schema.columns')]
+    responses = client.wait_all(statement_ids)
+
+    assert [response['Id'] for response in responses] == statement_ids
+    assert delays == pytest.approx([0.1, 0.2, 0.4])
+    assert client.fetch_results(statement_ids[1]) == [['id', 'integer']]
+
+
+def test_execute_redshift_query_returns_the_execute_statement_response(monkeypatch):
+    from utils import redshift_helper
+
+    backend = FakeRedshiftDataBackend()
+    monkeypatch.setattr(redshift_helper, 'redshift_data', backend)
+
+    assert redshift_helper.execute_redshift_query('cluster', 'dev', 'etl', 'ANALYZE t') == {'Id': 'fake-1'}
+    assert redshift_helper.execute_redshift_query('cluster', 'dev', 'etl', 'ANALYZE t', wait=True)['Status'] == 'FINISHED'
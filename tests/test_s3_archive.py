@@ -0,0 +1,81 @@
+from fakes.fake_s3 import FakeS3Backend
+from utils.s3_archive import MAX_SINGLE_COPY_BYTES, S3Archiver, plan_parts
+
+BUCKET = 'test-bucket'
+GB = 1024 ** 3
+MB = 1024 ** 2
+
+
+def test_copy_above_5_gb_is_a_multipart_copy_of_contiguous_parts():
+    # The fake holds a small object: only the requests are checked here
+    s3 = FakeS3Backend({(BUCKET, 'incoming/big.csv'): b'x'})
+    size = 6 * GB
+    S3Archiver(s3).copy(BUCKET, 'incoming/big.csv', 'processed/big.csv', size=size)
+
+    parts = plan_parts(size)
+    assert s3.api_call_count('copy_object') == 0
+    assert s3.api_call_count('create_multipart_upload') == 1
+    assert s3.api_call_count('upload_part_copy') == len(parts) == 12
+    assert s3.api_call_count('complete_multipart_upload') == 1
+    assert parts[0][0] == 0 and parts[-1][1] == size - 1
+    assert all(last + 1 == first for (_, last), (first, _) in zip(parts, parts[1:]))
+
+
+def test_copy_at_5_gb_is_a_single_copy():
+    s3 = FakeS3Backend({(BUCKET, 'incoming/file.csv'): b'x'})
+    S3Archiver(s3).copy(BUCKET, 'incoming/file.csv', 'processed/file.csv', size=MAX_SINGLE_COPY_BYTES)
+    assert s3.api_call_count('copy_object') == 1
+    assert s3.api_call_count('create_multipart_upload') == 0
+
+
+def test_move_copies_large_objects_intact_in_parts():
+    # Scaled down: a 64 KB copy limit stands in for the 5 GB one
+    data = bytes(range(256)) * (MB // 256) * 11   # 11 MB: three 5 MB parts
+    s3 = FakeS3Backend({(BUCKET, 'incoming/big.csv'): data}, max_copy_size=64 * 1024)
+    archiver = S3Archiver(s3, multipart_threshold=64 * 1024, part_size=5 * MB)
+
+    moved, failed = archiver.move([f's3://{BUCKET}/incoming/big.csv'], 'processed')
+
+    assert (moved, failed) == ({f's3://{BUCKET}/incoming/big.csv': f's3://{BUCKET}/processed/big.csv'}, {})
+    assert s3.objects == {(BUCKET, 'processed/big.csv'): data}
+    assert s3.api_call_count('upload_part_copy') == 3
+
+
+def test_deletes_are_batched_by_1000_keys():
+    keys = [f'incoming/file-{i}.csv' for i in range(2500)]
+    s3 = FakeS3Backend({(BUCKET, key): b'id\n1\n' for key in keys})
+
+    moved, failed = S3Archiver(s3, max_workers=4).move([f's3://{BUCKET}/{key}' for key in keys], 'processed')
+
+    assert len(moved) == 2500 and failed == {}
+    assert s3.api_call_count('delete_objects') == 3
+    assert sorted(key for _, key in s3.objects) == sorted(f'processed/file-{i}.csv' for i in range(2500))
+
+
+def test_partial_failures_leave_the_sources_in_place():
+    s3 = FakeS3Backend(
+        {(BUCKET, f'incoming/file-{i}.csv'): b'id\n1\n' for i in range(3)},
+        fail_deletes={'incoming/file-1.csv'},
+    )
+    paths = [f's3://{BUCKET}/incoming/file-{i}.csv' for i in range(3)] + [f's3://{BUCKET}/incoming/missing.csv']
+
+    moved, failed = S3Archiver(s3).move(paths, 'processed')
+
+    assert moved == {f's3://{BUCKET}/incoming/file-0.csv': f's3://{BUCKET}/processed/file-0.csv',
+                     f's3://{BUCKET}/incoming/file-2.csv': f's3://{BUCKET}/processed/file-2.csv'}
+    assert failed[f's3://{BUCKET}/incoming/file-1.csv'].startswith('delete failed: AccessDenied')
+    assert failed[f's3://{BUCKET}/incoming/missing.csv'].startswith('copy failed: NoSuchKey')
+    # The failed delete keeps its source (and its copy); the failed copy deleted nothing
+    assert (BUCKET, 'incoming/file-1.csv') in s3.objects
+    assert (BUCKET, 'processed/file-1.csv') in s3.objects
+
+
+def test_failed_part_copy_aborts_the_multipart_upload():
+    s3 = FakeS3Backend()
+    archiver = S3Archiver(s3, multipart_threshold=0)
+    moved, failed = archiver.move([f's3://{BUCKET}/incoming/missing.csv'], 'processed', sizes={
+        f's3://{BUCKET}/incoming/missing.csv': 10 * MB,
+    })
+    assert moved == {} and list(failed) == [f's3://{BUCKET}/incoming/missing.csv']
+    assert s3.api_call_count('abort_multipart_upload') == 1
+    assert s3.api_call_count('complete_multipart_upload') == 0
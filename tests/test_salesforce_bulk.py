@@ -0,0 +1,94 @@
+import csv
+import io
+import time
+
+import pytest
+
+from fakes.fake_salesforce import FakeSalesforceServer
+from salesforce.client import SalesforceBulkClient, iter_job_bodies
+
+HEADER = ['Email', 'User_Segment__c']
+
+
+def segment_rows(count):
+    return [[f'user{i}@example.com', f'segment-{i % 4}'] for i in range(count)]
+
+
+def parse_bodies(bodies):
+    """Consumes each body (in order, as the client does) into (size, rows)."""
+    parsed = []
+    for body in bodies:
+        data = b''.join(body)
+        parsed.append((len(data), list(csv.reader(io.StringIO(data.decode('utf-8'))))))
+    return parsed
+
+
+def test_job_bodies_fit_the_size_limit_and_hold_every_row_once():
+    rows = segment_rows(500)
+    parsed = parse_bodies(iter_job_bodies(HEADER, rows, max_job_bytes=2048, block_bytes=256))
+
+    assert len(parsed) > 1
+    assert all(size <= 2048 and body_rows[0] == HEADER for size, body_rows in parsed)
+    assert [row for _, body_rows in parsed for row in body_rows[1:]] == rows
+
+
+def test_job_body_is_streamed_in_blocks():
+    body = next(iter_job_bodies(HEADER, segment_rows(100), block_bytes=256))
+    blocks = list(body)
+    assert len(blocks) > 1 and all(len(block) >= 256 for block in blocks[:-1])
+
+
+def test_no_rows_means_no_jobs():
+    assert list(iter_job_bodies(HEADER, iter([]))) == []
+
+
+@pytest.fixture
+def server():
+    existing = {f'user{i}@example.com': {'LastName': f'User {i}'} for i in range(0, 300, 2)}
+    with FakeSalesforceServer({'Contact': existing}, polls_until_complete=2) as server:
+        yield server
+
+
+def test_upsert_updates_existing_records_and_reports_failed_rows(server):
+    client = SalesforceBulkClient(server.url, server.session_id, max_job_bytes=4096, sleep=lambda _: None)
+    summary = client.upsert('Contact', 'Email', HEADER, iter(segment_rows(300)))
+
+    assert summary['jobs'] == server.request_count('POST', 'jobs') > 1
+    assert (summary['records_succeeded'], summary['records_created'], summary['records_failed']) == (150, 0, 150)
+    assert summary['failed_jobs'] == []
+    assert len(summary['errors']) == 150
+    assert summary['errors'][0]['external_id'] == 'user1@example.com'
+    assert summary['errors'][0]['error'].startswith('REQUIRED_FIELD_MISSING')
+    assert server.records['Contact']['user2@example.com']['User_Segment__c'] == 'segment-2'
+    assert summary['api_calls'] == sum(server.requests.values())
+
+
+def test_expired_session_is_refreshed_and_the_request_retried(server):
+    client = SalesforceBulkClient(server.url, 'expired-session', sleep=lambda _: None,
+                                  refresh_session=lambda: server.session_id)
+    summary = client.upsert('Contact', 'Email', HEADER, [['user0@example.com', 'segment-9']])
+
+    assert client.session_id == server.session_id
+    assert summary['records_succeeded'] == 1
+    assert server.records['Contact']['user0@example.com']['User_Segment__c'] == 'segment-9'
+
+
+def test_failed_request_raises_without_a_session_refresh(server):
+    client = SalesforceBulkClient(server.url, 'expired-session', sleep=lambda _: None)
+    with pytest.raises(Exception, match='401'):
+        client.create_upsert_job('Contact', 'Email')
+
+
+def test_wait_job_times_out_on_the_clock_not_on_the_requested_sleeps():
+    with FakeSalesforceServer(polls_until_complete=10 ** 6) as server:
+        # Each requested delay alone exceeds the timeout; the sleeps that actually happen do not
+        client = SalesforceBulkClient(server.url, server.session_id, poll_initial_delay=60, timeout=0.2,
+                                      sleep=lambda _: time.sleep(0.02))
+        job_id = client.create_upsert_job('Contact', 'Email')
+        client.upload_job_data(job_id, b'Email,User_Segment__c\na@example.com,segment-1\n')
+        client.set_job_state(job_id, 'UploadComplete')
+
+        with pytest.raises(Exception, match='did not finish within 0.2 seconds'):
+            client.wait_jobs([job_id, job_id])
+        assert client.api_calls == sum(server.requests.values())
+        assert server.request_count('GET') > 4
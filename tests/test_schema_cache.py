@@ -0,0 +1,56 @@
+from fakes.fake_s3 import FakeS3Backend
+from utils.schema_cache import S3SchemaStore, SchemaCache
+
+BUCKET = 'test-bucket'
+COLUMNS = [('order_id', 'integer'), ('amount', 'numeric')]
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_entries_expire_after_the_ttl():
+    clock = FakeClock()
+    cache = SchemaCache(ttl_seconds=60, clock=clock)
+    cache.put('Public.Orders', COLUMNS)
+
+    clock.now += 59
+    assert cache.get('public.orders') == COLUMNS
+    clock.now += 1
+    assert cache.get('public.orders') is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_invalidate_after_alter_drops_every_layer():
+    s3 = FakeS3Backend()
+    cache = SchemaCache(S3SchemaStore(f's3://{BUCKET}/schema-cache/', s3))
+    cache.put('public.orders', COLUMNS)
+    assert (BUCKET, 'schema-cache/public.orders.json') in s3.objects
+
+    # ALTER TABLE ... ADD COLUMN email: the job invalidates, then reloads and caches the new schema
+    cache.invalidate('public.orders')
+    assert cache.get('public.orders') is None
+    assert (BUCKET, 'schema-cache/public.orders.json') not in s3.objects
+    cache.put('public.orders', COLUMNS + [('email', 'character varying')])
+    assert cache.get('public.orders')[-1] == ('email', 'character varying')
+
+
+def test_s3_store_shares_entries_between_runs():
+    s3, clock = FakeS3Backend(), FakeClock()
+    SchemaCache(S3SchemaStore(f's3://{BUCKET}/schema-cache', s3), clock=clock).put('public.orders', COLUMNS)
+
+    next_run = SchemaCache(S3SchemaStore(f's3://{BUCKET}/schema-cache', s3), ttl_seconds=60, clock=clock)
+    assert next_run.get('public.orders') == COLUMNS
+    assert next_run.get('public.customers') is None
+    assert s3.api_call_count('get_object') == 2
+    assert next_run.get('public.orders') == COLUMNS   # From the in-process layer
+    assert s3.api_call_count('get_object') == 2
+
+    clock.now += 61   # Expired in the store too
+    assert SchemaCache(S3SchemaStore(f's3://{BUCKET}/schema-cache', s3), ttl_seconds=60, clock=clock).get(
+        'public.orders') is None
@@ -0,0 +1,32 @@
+from fakes.fake_s3 import FakeS3Backend
+from utils.schema_detector import detect_schema_from_s3_ranges
+
+BUCKET = 'test-bucket'
+
+
+def make_csv(rows):
+    return b'id,price,name\n' + b''.join(f'{i},{i % 97}.25,"user {i}"\n'.encode() for i in range(1, rows + 1))
+
+
+def test_large_file_is_detected_from_a_few_ranges():
+    data = make_csv(20000)
+    s3 = FakeS3Backend({(BUCKET, 'big.csv'): data})
+
+    result = detect_schema_from_s3_ranges(BUCKET, 'big.csv', head_bytes=4096, range_bytes=2048, sample_ranges=2, s3=s3)
+
+    assert [(column['name'], column['type']) for column in result['columns']] == \
+        [('id', 'int64'), ('price', 'float64'), ('name', 'object')]
+    assert all(column['confidence'] == 1.0 for column in result['columns'])
+    assert not result['exact'] and result['file_size'] == len(data)
+    assert result['bytes_read'] == 4096 + 2 * 2048
+    assert s3.api_call_count('get_object') == 3
+    assert abs(result['estimated_row_count'] - 20000) / 20000 < 0.1
+
+
+def test_small_file_is_read_whole_and_counted_exactly():
+    s3 = FakeS3Backend({(BUCKET, 'small.csv'): make_csv(10)})
+
+    result = detect_schema_from_s3_ranges(BUCKET, 'small.csv', s3=s3)
+
+    assert result['exact'] and result['estimated_row_count'] == result['sampled_rows'] == 10
+    assert s3.api_call_count('get_object') == 1
@@ -0,0 +1,50 @@
+import pandas as pd
+
+from fakes.fake_s3 import FakeS3Backend
+from salesforce.segment_sync import read_snapshot, sync_changed_segments, update_snapshot, write_snapshot
+
+SNAPSHOT_PATH = 's3://test-bucket/salesforce/segments.csv.gz'
+
+
+class RecordingClient:
+    """Stands in for SalesforceClient: records the rows sent, every row succeeds."""
+
+    def __init__(self):
+        self.sent = []
+
+    def bulk_update_segments(self, rows, external_id_field, max_error_details):
+        self.sent.extend(rows)
+        return {'records_failed': 0, 'records_unprocessed': 0, 'api_calls': 3, 'failed_jobs': [], 'errors': []}
+
+
+def seed_snapshot(s3, pairs):
+    synced = pd.DataFrame(pairs, columns=['key', 'segment'])
+    write_snapshot(s3, SNAPSHOT_PATH, update_snapshot(read_snapshot(s3, SNAPSHOT_PATH), synced))
+
+
+def test_keys_repeated_across_chunks_are_counted_and_sent_once():
+    s3, client = FakeS3Backend(), RecordingClient()
+    seed_snapshot(s3, [('a@x.com', '1'), ('b@x.com', '2'), ('c@x.com', '3')])
+    segments = [
+        ('a@x.com', '9'), ('b@x.com', '2'),   # chunk 1: a changed, b unchanged
+        ('a@x.com', '1'), ('d@x.com', '4'),   # chunk 2: a back to its synced segment, d new
+        ('b@x.com', '5'), ('d@x.com', '4'),   # chunk 3: b changed, d repeated
+    ]
+
+    metrics = sync_changed_segments(client, segments, SNAPSHOT_PATH, s3=s3, chunk_size=2)
+
+    assert sorted(client.sent) == [('b@x.com', '5'), ('d@x.com', '4')]
+    assert {name: metrics[name] for name in ('rows_total', 'rows_new', 'rows_changed', 'rows_unchanged')} == \
+        {'rows_total': 3, 'rows_new': 1, 'rows_changed': 1, 'rows_unchanged': 1}
+    assert metrics['rows_sent'] == 2 and metrics['change_rate'] == round(2 / 3, 4)
+    assert read_snapshot(s3, SNAPSHOT_PATH).values.tolist() == \
+        [['a@x.com', '1'], ['b@x.com', '5'], ['c@x.com', '3'], ['d@x.com', '4']]
+
+
+def test_no_changes_sends_nothing():
+    s3 = FakeS3Backend()
+    seed_snapshot(s3, [('a@x.com', '1')])
+
+    metrics = sync_changed_segments(lambda: None, [('a@x.com', '1')], SNAPSHOT_PATH, s3=s3)
+
+    assert metrics['rows_sent'] == 0 and metrics['rows_unchanged'] == 1 and metrics['change_rate'] == 0.0
@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+
+from shards import ShardReader
+
+
+def write_shards(channel_dir):
+    """Two Parquet shards of 7 and 5 rows (one with a missing value), plus files that are not shards."""
+    (channel_dir / 'part=1').mkdir(parents=True)
+    pd.DataFrame({'user_id': range(7), 'age': np.arange(7, dtype='int64'), 'spend': np.arange(7) * 1.5,
+                  'country': ['de'] * 7}).to_parquet(channel_dir / 'part=1' / 'a.parquet')
+    pd.DataFrame({'user_id': range(7, 12), 'age': [7, 8, None, 10, 11],
+                  'spend': np.arange(7, 12) * 1.5, 'country': ['fr'] * 5}).to_parquet(channel_dir / 'b.parquet')
+    (channel_dir / '_SUCCESS').write_text('')
+    (channel_dir / '.tmp').mkdir()
+    (channel_dir / '.tmp' / 'c.parquet').write_bytes(b'partial')
+
+
+def test_reader_streams_numeric_features_of_every_shard_in_fixed_batches(tmp_path):
+    write_shards(tmp_path)
+    reader = ShardReader(str(tmp_path), batch_size=4)
+
+    batches = list(reader.iter_batches())
+
+    assert reader.columns == ['age', 'spend']
+    assert [len(batch) for batch in batches] == [4, 4, 3] and batches[0].dtype == np.float32
+    assert reader.skipped_rows == 1
+    # Shards are read in path order: b.parquet, then part=1/a.parquet
+    np.testing.assert_array_equal(np.concatenate(batches)[:, 0], [7, 8, 10, 11, 0, 1, 2, 3, 4, 5, 6])
+    # Every epoch is a full pass
+    np.testing.assert_array_equal(reader.read_all(epoch=1), np.concatenate(batches))
+    assert reader.skipped_rows == 1
+
+
+def test_headerless_csv_shards_hold_only_features(tmp_path):
+    (tmp_path / 'train.csv').write_text('1,2\n3,4\n5,6\n')
+    reader = ShardReader(str(tmp_path), batch_size=2, dtype=np.float64)
+
+    assert [batch.tolist() for batch in reader.iter_batches()] == [[[1, 2], [3, 4]], [[5, 6]]]
@@ -0,0 +1,44 @@
+import pytest
+
+from fakes.fake_s3 import FakeS3Backend
+from salesforce.transform_output import iter_transform_output
+
+BUCKET = 'test-bucket'
+OUTPUT_PATH = f's3://{BUCKET}/sagemaker/output/'
+INPUT_PATH = f's3://{BUCKET}/sagemaker/input/'
+
+
+def test_joined_parts_yield_the_pairs_of_every_part_in_order():
+    s3 = FakeS3Backend({
+        (BUCKET, 'sagemaker/output/part-1.csv.out'): b'a@x.com,34,1\r\nb@x.com,51,0\r\n',
+        (BUCKET, 'sagemaker/output/part-2.csv.out'): b'c@x.com,"19",2\n\n',
+        (BUCKET, 'sagemaker/output/_SUCCESS'): b'',
+    })
+
+    pairs = list(iter_transform_output(s3, OUTPUT_PATH, max_workers=2))
+
+    assert sorted(pairs) == [('a@x.com', '1'), ('b@x.com', '0'), ('c@x.com', '2')]
+    assert [pair for pair in pairs if pair[0] in ('a@x.com', 'b@x.com')] == [('a@x.com', '1'), ('b@x.com', '0')]
+
+
+def test_aligned_parts_are_matched_line_by_line_with_their_input():
+    s3 = FakeS3Backend({
+        (BUCKET, 'sagemaker/input/day=1/users.csv'): b'email,age\na@x.com,34\nb@x.com,51\nc@x.com,19\n',
+        # Predictions as JSON mini-batch arrays and as scalar lines
+        (BUCKET, 'sagemaker/output/day=1/users.csv.out'): b'[[1], [0]]\n2\n',
+    })
+
+    pairs = list(iter_transform_output(s3, OUTPUT_PATH, layout='aligned', s3_input_path=INPUT_PATH,
+                                       input_has_header=True))
+
+    assert pairs == [('a@x.com', 1), ('b@x.com', 0), ('c@x.com', '2')]
+
+
+def test_aligned_part_with_a_missing_prediction_fails():
+    s3 = FakeS3Backend({
+        (BUCKET, 'sagemaker/input/users.csv'): b'a@x.com,34\nb@x.com,51\n',
+        (BUCKET, 'sagemaker/output/users.csv.out'): b'1\n',
+    })
+
+    with pytest.raises(ValueError, match='different numbers of records'):
+        list(iter_transform_output(s3, OUTPUT_PATH, layout='aligned', s3_input_path=INPUT_PATH))
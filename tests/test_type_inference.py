@@ -0,0 +1,44 @@
+import io
+
+import pandas as pd
+import pytest
+
+from utils.type_inference import TypeInferrer, classify_values, infer_types
+
+
+def merged_type(*chunks):
+    stats = classify_values(pd.Series(chunks[0]))
+    for chunk in chunks[1:]:
+        stats.merge(classify_values(pd.Series(chunk)))
+    return stats.redshift_type()
+
+
+@pytest.mark.parametrize('chunks', [
+    (['1', '2'], ['99999999999999999999']),
+    (['99999999999999999999'], ['1', '2']),
+])
+def test_unbounded_integer_chunk_widens_the_merge_in_either_order(chunks):
+    assert merged_type(*chunks) == 'DECIMAL(20,0)'
+
+
+def test_integer_ranges_widen_across_chunks():
+    assert merged_type(['1', '-2'], ['300']) == 'SMALLINT'
+    assert merged_type(['1'], ['40000']) == 'INTEGER'
+    assert merged_type(['-3000000000'], ['1']) == 'BIGINT'
+    assert merged_type(['1'], ['1.25']) == 'DECIMAL(3,2)'
+    assert merged_type(['1'], ['2026-01-01']) == 'VARCHAR(16)'
+
+
+def test_chunked_inference_matches_a_single_chunk():
+    csv = 'id,amount,day\n' + ''.join(
+        f"{i},{i * 10 ** 18 if i == 7 else i}.5,2026-01-{i % 28 + 1:02d}\n" for i in range(1, 50)
+    )
+    whole = infer_types(io.StringIO(csv), chunk_size=1000).redshift_types()
+    chunked = infer_types(io.StringIO(csv), chunk_size=5).redshift_types()
+    assert chunked == whole == {'id': 'SMALLINT', 'amount': 'DECIMAL(20,1)', 'day': 'DATE'}
+
+
+def test_inferrers_of_several_files_merge():
+    first = TypeInferrer().update(pd.DataFrame({'id': ['1', '2']}))
+    second = TypeInferrer().update(pd.DataFrame({'id': ['12345678901234567890123']}))
+    assert first.merge(second).redshift_types() == {'id': 'DECIMAL(23,0)'}
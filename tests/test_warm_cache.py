@@ -0,0 +1,56 @@
+import json
+
+from warm_cache import SecretCache, WarmCache
+
+
+class FakeSecretsManager:
+
+    def __init__(self):
+        self.version = 1
+        self.calls = 0
+
+    def get_secret_value(self, SecretId):
+        self.calls += 1
+        return {'SecretString': json.dumps({'password': f'pw-{self.version}'}), 'VersionId': f'v{self.version}'}
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_secret_is_cached_until_its_ttl_and_forced_refreshes_are_throttled():
+    client, clock = FakeSecretsManager(), FakeClock()
+    cache = SecretCache(ttl_seconds=300, client=client, min_refresh_seconds=10, clock=clock)
+
+    assert cache.get('sf') == {'password': 'pw-1'}
+    client.version = 2
+    clock.now = 5
+    assert cache.get('sf', refresh=True) == {'password': 'pw-1'}   # Within min_refresh_seconds
+    clock.now = 20
+    assert cache.get('sf') == {'password': 'pw-1'}
+    assert cache.get('sf', refresh=True) == {'password': 'pw-2'}
+    clock.now = 400
+    assert cache.get('sf') == {'password': 'pw-2'}
+    assert client.calls == cache.fetches == 3
+
+
+def test_warm_cache_builds_each_key_once_per_ttl():
+    clock = FakeClock()
+    cache = WarmCache(ttl_seconds=60, clock=clock)
+    built = []
+
+    def factory():
+        built.append(clock.now)
+        return len(built)
+
+    assert [cache.get('session', factory) for _ in range(3)] == [1, 1, 1]
+    clock.now = 61
+    assert cache.get('session', factory) == 2
+    cache.invalidate('session')
+    assert cache.get('session', factory) == 3
+    assert (cache.hits, cache.misses) == (2, 3)
@@ -0,0 +1,114 @@
+import os
+import tarfile
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.cluster import KMeans
+
+from features import TRANSFORMER_FILE, UserFeatureTransformer
+from preprocessing import write_features
+from shards import ShardReader
+from warm_start import MODEL_FILE, load_previous_artifact, sample_batches, try_warm_start
+
+
+def user_records(count, categories, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'user_id': np.arange(count),
+        'age': rng.integers(18, 80, count),
+        'gender': rng.choice(['F', 'M'], count),
+        'total_spend': rng.gamma(2.0, 150.0, count),
+        'last_purchase_date': pd.Timestamp('2026-01-01') + pd.to_timedelta(rng.integers(0, 300, count), unit='D'),
+        'product_category': rng.choice(categories, count),
+    })
+
+
+def write_channel(channel_dir, records, transformer):
+    """Writes a feature channel like preprocessing.py does: shards plus transformer.joblib."""
+    os.makedirs(channel_dir)
+    input_path = f'{channel_dir}-records.parquet'
+    records.to_parquet(input_path)
+    write_features(transformer, input_path, os.path.join(channel_dir, 'part-00000.parquet'), batch_size=500)
+    joblib.dump(transformer, os.path.join(channel_dir, TRANSFORMER_FILE))
+    return ShardReader(channel_dir)
+
+
+def fit_transformer(records):
+    return UserFeatureTransformer(as_of='2026-12-01').partial_fit(records).finalize()
+
+
+@pytest.fixture
+def previous_model(tmp_path):
+    """A previous model.tar.gz (model and transformer), trained on books/toys users."""
+    records = user_records(2000, ['books', 'toys'])
+    transformer = fit_transformer(records)
+    reader = write_channel(str(tmp_path / 'previous-features'), records, transformer)
+    model = KMeans(n_clusters=3, n_init=3, random_state=0).fit(np.concatenate(list(reader.iter_batches())))
+    model_dir = tmp_path / 'previous-model'
+    model_dir.mkdir()
+    joblib.dump(model, tmp_path / MODEL_FILE)
+    joblib.dump(transformer, tmp_path / TRANSFORMER_FILE)
+    with tarfile.open(model_dir / 'model.tar.gz', 'w:gz') as archive:
+        archive.add(tmp_path / MODEL_FILE, arcname=MODEL_FILE)
+        archive.add(tmp_path / TRANSFORMER_FILE, arcname=TRANSFORMER_FILE)
+    return str(model_dir), transformer
+
+
+def test_warm_start_reuses_the_previous_feature_space(tmp_path, previous_model):
+    model_dir, _ = previous_model
+    # preprocessing.py --previous-model-path: this week's users, in last week's feature space
+    transformer = load_previous_artifact(model_dir, TRANSFORMER_FILE)
+    reader = write_channel(str(tmp_path / 'features'), user_records(2000, ['books', 'toys'], seed=1), transformer)
+
+    model, previous, report = try_warm_start(model_dir, reader, n_clusters=3, sample_fraction=0.5,
+                                             drift_threshold=10.0, random_state=0,
+                                             feature_names=transformer.feature_names)
+
+    assert report['mode'] == 'warm' and model is not None
+    assert model.cluster_centers_.shape == previous.cluster_centers_.shape
+
+
+def test_same_feature_count_in_another_feature_space_falls_back(tmp_path, previous_model):
+    model_dir, previous_transformer = previous_model
+    # Refitted on users of other categories: as many features, different meaning
+    transformer = fit_transformer(user_records(2000, ['garden', 'sports'], seed=1))
+    reader = write_channel(str(tmp_path / 'features'), user_records(2000, ['garden', 'sports'], seed=1), transformer)
+    assert len(reader.columns) == len(previous_transformer.feature_names)
+
+    model, previous, report = try_warm_start(model_dir, reader, n_clusters=3, drift_threshold=10.0,
+                                             feature_names=transformer.feature_names)
+
+    assert model is None and previous is not None
+    assert report['mode'] == 'full' and report['training_passes'] == 0
+    assert 'product_category=garden' in report['reason']
+
+
+def test_data_without_a_transformer_does_not_warm_start_a_preprocessed_model(tmp_path, previous_model):
+    model_dir, previous_transformer = previous_model
+    channel_dir = tmp_path / 'features'
+    channel_dir.mkdir()
+    columns = previous_transformer.feature_names
+    pd.DataFrame(np.zeros((10, len(columns))), columns=[f'f{i}' for i in range(len(columns))]).to_parquet(
+        channel_dir / 'part-00000.parquet')
+
+    model, _, report = try_warm_start(model_dir, ShardReader(str(channel_dir)), n_clusters=3)
+
+    assert model is None and report['reason'].startswith('previous model was trained on the features')
+
+
+def test_warm_start_fits_every_changed_row_plus_a_sample_of_the_rest(tmp_path, previous_model):
+    model_dir, transformer = previous_model
+    reader = write_channel(str(tmp_path / 'features'), user_records(2000, ['books', 'toys'], seed=1), transformer)
+    changed_reader = write_channel(str(tmp_path / 'changed'), user_records(150, ['books', 'toys'], seed=2),
+                                   transformer)
+
+    model, _, report = try_warm_start(model_dir, reader, changed_reader, n_clusters=3, sample_fraction=0.1,
+                                      drift_threshold=10.0, random_state=0, feature_names=transformer.feature_names)
+
+    assert report['mode'] == 'warm' and report['training_passes'] == 1
+    assert report['changed_rows'] == 150
+    assert 140 <= report['sampled_rows'] <= 260   # ~10% of 2000 rows
+    sampled = sum(len(batch) for batch in sample_batches(reader, 0.1, random_state=0))
+    assert report['sampled_rows'] == sampled      # The same seed draws the same sample